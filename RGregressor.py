@@ -1,193 +1,141 @@
-import glob, os
-import pandas as pd
-import numpy as np
-from sklearn.model_selection import train_test_split
-from sklearn.ensemble import RandomForestRegressor
+# RGregressor.py
+"""
+Single-train delay lookup GUI.
+
+A thin front-end over supervised_model's shared predictor: the saved model
+(registry version or delay_model.pkl, see train_model.py) and the dataset
+index are loaded once, in the background at start-up, and every lookup goes
+through the same fallback chain as main_gui.py and prediction_server.py.
+"""
+import threading
 import tkinter as tk
 from tkinter import messagebox
-import warnings
 
-warnings.filterwarnings("ignore")
+from supervised_model import predictor
 
+_load_errors = []
 
-CSV_FOLDER = r"C:\DATA\Joseph Jisso\SIH\SL_Logistic Regression\Train_Route"  
-
-files = glob.glob(os.path.join(CSV_FOLDER, "*.csv"))
-
-print("Found CSV files:", len(files))
-
-if len(files) == 0:
-
-    raise SystemExit("No CSV files found in folder: " + CSV_FOLDER)
-
-
-# load and concatenate
-
-df_list = []
-
-for f in files:
-
-    tmp = pd.read_csv(f, engine='python', skip_blank_lines=True)
-
-    train_no = os.path.splitext(os.path.basename(f))[0]
-
-    tmp['TrainNo'] = str(train_no).strip().upper()
-
-    df_list.append(tmp)
-
-df = pd.concat(df_list, ignore_index=True)
-
-
-df.columns = [c.strip() for c in df.columns]
-
-df = df.rename(columns={
-    "Average_Delay(min)": "avg_delay",
-    "Right Time (0-15 min's)": "p_on_time",
-    "Slight Delay (15-60 min's)": "p_slight",
-    "Significant Delay (>1 Hour)": "p_significant",
-    "Cancelled/Unknown": "p_cancelled",
-
-}, errors='ignore')
-
-for col in ['TrainNo', 'Station', 'Station_Name']:
-
-    if col in df.columns:
-
-        df[col] = df[col].astype(str).str.strip().str.upper()
-
-
-feature_cols = ['p_on_time', 'p_slight', 'p_significant', 'p_cancelled']
-
-X = df[feature_cols].fillna(0).astype(float)
-
-y = df['avg_delay'].astype(float)
-
-X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
-
-model = RandomForestRegressor(n_estimators=100, random_state=42)
-
-model.fit(X_train, y_train)
-
-print("Model trained. Test R2:", model.score(X_test, y_test))
-
-
-
-def predict_delay(train_no, station_code, station_name=None):
 
+def describe_prediction(train_no, station_code, station_name=None) -> str:
+    """One delay prediction, worded for the result dialog by the fallback tier that answered."""
+    delays, tiers = predictor.predict_delays([(train_no, station_code, station_name)])
+    pred, tier = float(delays[0]), tiers[0]
     train_no = str(train_no).strip().upper()
-
     station_code = str(station_code).strip().upper()
+    station_name = str(station_name).strip().upper() if station_name else None
 
-    if station_name:
-
-        station_name = str(station_name).strip().upper()
-
-
-    match = df[(df['TrainNo'] == train_no) & (df['Station'] == station_code)]
-
-    if not match.empty:
-
-        X_row = match[feature_cols].iloc[0].values.reshape(1, -1)
-
-        pred = float(model.predict(X_row)[0])
-
+    if tier == "exact":
         return f"{train_no} → {station_code}: {pred:.2f} mins"
+    if tier == "name":
+        return f"{train_no} → ({station_code}, {station_name}): {pred:.2f} mins"
+    if tier == "fuzzy":
+        return f"{train_no} → closest match to {station_name or station_code}: {pred:.2f} mins"
+    if tier == "train_avg":
+        return f"{train_no} → avg across train: {pred:.2f} mins"
+    if tier == "station_avg":
+        return f"{station_code} → avg across station: {pred:.2f} mins"
+    return f"Global avg fallback: {pred:.2f} mins"
+
 
+# GUI
 
-    if station_name:
+def on_predict():
 
-        match2 = df[(df['TrainNo'] == train_no) & (df['Station_Name'] == station_name)]
+    train_no = entry_train.get()
 
-        if not match2.empty:
+    station_code = entry_station.get()
 
-            X_row = match2[feature_cols].iloc[0].values.reshape(1, -1)
+    station_name = entry_name.get()
 
-            pred = float(model.predict(X_row)[0])
+    if not train_no or not station_code:
 
-            return f"{train_no} → ({station_code}, {station_name}): {pred:.2f} mins"
+        messagebox.showwarning("Input Error", "Train Number and Station Code are required!")
 
+        return
 
-    train_rows = df[df['TrainNo'] == train_no]
+    try:
 
-    if not train_rows.empty:
+        result = describe_prediction(train_no, station_code, station_name if station_name else None)
 
-        X_avg = train_rows[feature_cols].mean().values.reshape(1, -1)
+    except Exception as e:
 
-        pred = float(model.predict(X_avg)[0])
+        messagebox.showerror("Prediction Error", str(e))
 
-        return f"{train_no} → avg across train: {pred:.2f} mins"
+        return
 
+    messagebox.showinfo("Prediction Result", result)
 
-    station_rows = df[df['Station'] == station_code]
 
-    if not station_rows.empty:
+def load_in_background():
 
-        X_avg = station_rows[feature_cols].mean().values.reshape(1, -1)
+    try:
 
-        pred = float(model.predict(X_avg)[0])
+        predictor.ensure_loaded()
 
-        return f"{station_code} → avg across station: {pred:.2f} mins"
+    except Exception as e:
 
+        _load_errors.append(e)
 
-    X_mean = X.mean().values.reshape(1, -1)
 
-    pred = float(model.predict(X_mean)[0])
+def poll_loaded():
 
-    return f"Global avg fallback: {pred:.2f} mins"
+    if _load_errors:
 
+        lbl_status.configure(text=f"Could not load the model: {_load_errors[0]}", fg="red")
 
+    elif predictor.loaded:
 
-# GUI
+        lbl_status.configure(text=f"Ready ({predictor.df['TrainNo'].nunique()} trains)")
 
-def on_predict():
+        btn_predict.configure(state=tk.NORMAL)
 
-    train_no = entry_train.get()
+    else:
 
-    station_code = entry_station.get()
+        root.after(200, poll_loaded)
 
-    station_name = entry_name.get()
 
-    if not train_no or not station_code:
+if __name__ == "__main__":
 
-        messagebox.showwarning("Input Error", "Train Number and Station Code are required!")
+    # Load dataset + model off the Tk thread; the window is usable meanwhile
 
-        return
+    threading.Thread(target=load_in_background, daemon=True).start()
 
-    result = predict_delay(train_no, station_code, station_name if station_name else None)
+    root = tk.Tk()
 
-    messagebox.showinfo("Prediction Result", result)
+    root.title("Train Delay Predictor")
 
 
+    tk.Label(root, text="Train Number:").grid(row=0, column=0, padx=5, pady=5, sticky="e")
 
-root = tk.Tk()
+    entry_train = tk.Entry(root, width=30)
 
-root.title("Train Delay Predictor")
+    entry_train.grid(row=0, column=1, padx=5, pady=5)
 
 
-tk.Label(root, text="Train Number:").grid(row=0, column=0, padx=5, pady=5, sticky="e")
+    tk.Label(root, text="Station Code:").grid(row=1, column=0, padx=5, pady=5, sticky="e")
 
-entry_train = tk.Entry(root, width=30)
+    entry_station = tk.Entry(root, width=30)
 
-entry_train.grid(row=0, column=1, padx=5, pady=5)
+    entry_station.grid(row=1, column=1, padx=5, pady=5)
 
 
-tk.Label(root, text="Station Code:").grid(row=1, column=0, padx=5, pady=5, sticky="e")
+    tk.Label(root, text="Station Name (optional):").grid(row=2, column=0, padx=5, pady=5, sticky="e")
 
-entry_station = tk.Entry(root, width=30)
+    entry_name = tk.Entry(root, width=30)
 
-entry_station.grid(row=1, column=1, padx=5, pady=5)
+    entry_name.grid(row=2, column=1, padx=5, pady=5)
 
 
-tk.Label(root, text="Station Name (optional):").grid(row=2, column=0, padx=5, pady=5, sticky="e")
+    btn_predict = tk.Button(root, text="Predict Delay", command=on_predict, state=tk.DISABLED)
 
-entry_name = tk.Entry(root, width=30)
+    btn_predict.grid(row=3, column=0, columnspan=2, pady=10)
 
-entry_name.grid(row=2, column=1, padx=5, pady=5)
 
+    lbl_status = tk.Label(root, text="Loading model…", fg="gray")
 
-btn_predict = tk.Button(root, text="Predict Delay", command=on_predict)
+    lbl_status.grid(row=4, column=0, columnspan=2, pady=(0, 8))
 
-btn_predict.grid(row=3, column=0, columnspan=2, pady=10)
 
+    root.after(200, poll_loaded)
 
-root.mainloop()
\ No newline at end of file
+    root.mainloop()
@@ -0,0 +1,386 @@
+# benchmark.py
+"""
+Benchmarks for the hot paths, on synthetic route data.
+
+    python benchmark.py                                # 100 and 1000 trains
+    python benchmark.py --trains 100 10000 100000 --out bench.json
+    python benchmark.py --baseline bench_baseline.json  # exit 1 on regressions
+
+For every scale this generates route CSVs in the real column format, then
+times in fresh processes:
+
+    cold_build    import + ingest + train + export (no caches)
+    cold_cached   import + load from the dataset/model caches
+    ingest        ingest.load_routes over the CSVs
+    predict       single predict_delay latency (p50/p99), mixed fallback tiers
+    batch         predict_delays latency and rows/s per batch size
+    rl            get_action latency, get_actions rows/s
+    decide        the GUI decide loop (main_gui.run_batch) against a local
+                  stub weather server
+
+Peak RSS is recorded per process. Results are JSON; with --baseline, time
+and memory metrics more than --tolerance worse than the baseline are listed
+and the exit code is 1.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+HEADER = ("Station,Station_Name,Average_Delay(min),Right Time (0-15 min's),"
+          "Slight Delay (15-60 min's),Significant Delay (>1 Hour),Cancelled/Unknown")
+RESULT_PREFIX = "BENCH_RESULT "
+CITIES = ["Delhi", "Mumbai", "Kolkata", "Chennai", "Bangalore", "Hyderabad", "Pune", "Patna"]
+
+
+# ------------------------
+# Synthetic data
+# ------------------------
+def _station_codes(n: int, rng: random.Random):
+    letters = "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+    codes = set()
+    while len(codes) < n:
+        codes.add("".join(rng.choice(letters) for _ in range(rng.randint(2, 5))))
+    return sorted(codes)
+
+
+def generate_routes(out_dir: str, n_trains: int, seed: int = 0, min_stops: int = 8,
+                    max_stops: int = 40) -> int:
+    """
+    Write n_trains route CSVs (one per train, same header as the real data)
+    into out_dir. Delay builds up along each route, plus a per-station
+    congestion effect. Returns the number of rows written.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    rng = random.Random(seed)
+    nrng = np.random.default_rng(seed)
+    n_stations = min(8000, 50 + 3 * n_trains)
+    codes = _station_codes(n_stations, rng)
+    names = [f"STATION {i} " for i in range(n_stations)]
+    congestion = nrng.gamma(1.5, 8.0, n_stations)
+    train_nos = rng.sample(range(1, max(100000, 2 * n_trains)), n_trains)
+
+    rows = 0
+    for tn in train_nos:
+        n = rng.randint(min_stops, max_stops)
+        idx = (rng.randrange(n_stations) + np.cumsum(nrng.integers(1, 6, n))) % n_stations
+        delay = np.maximum(0, np.round(np.cumsum(nrng.normal(2.0, 4.0, n)) + congestion[idx]))
+        on_time = np.clip(100 - 0.8 * delay + nrng.normal(0, 5, n), 0, 100)
+        cancelled = np.minimum(nrng.uniform(0, 3, n), 100 - on_time)
+        rest = 100 - on_time - cancelled
+        sig_share = np.clip(delay / 120.0, 0, 1)
+        significant = rest * sig_share
+        slight = rest - significant
+        lines = [HEADER]
+        for i, j in enumerate(idx):
+            lines.append(f"{codes[j]},{names[j]},{int(delay[i])},{on_time[i]:.2f},"
+                         f"{slight[i]:.2f},{significant[i]:.2f},{cancelled[i]:.2f}")
+        with open(os.path.join(out_dir, "%05d.csv" % tn), "w", encoding="utf-8", newline="") as fh:
+            fh.write("\r\n".join(lines) + "\r\n")
+        rows += n
+    return rows
+
+
+# ------------------------
+# Stub weather provider
+# ------------------------
+class StubWeather:
+    """Local OpenWeather-shaped HTTP server with a fixed response latency."""
+
+    def __init__(self, latency: float = 0.0):
+        latency_s = latency
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                time.sleep(latency_s)
+                body = json.dumps({"weather": [{"main": "Rain"}], "visibility": 4000}).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/data/2.5/weather"
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+# ------------------------
+# Measurement helpers
+# ------------------------
+def peak_rss_mb():
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024.0 * 1024.0) if sys.platform == "darwin" else peak / 1024.0, 1)
+
+
+def latency_stats(samples_s, unit: str = "us") -> dict:
+    scale = {"us": 1e6, "ms": 1e3}[unit]
+    a = np.asarray(samples_s) * scale
+    return {
+        f"p50_{unit}": round(float(np.percentile(a, 50)), 2),
+        f"p99_{unit}": round(float(np.percentile(a, 99)), 2),
+        f"mean_{unit}": round(float(a.mean()), 2),
+        "n": len(a),
+    }
+
+
+def _timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    out = fn(*args, **kwargs)
+    return out, time.perf_counter() - start
+
+
+# ------------------------
+# Stages (run inside a child process, configured through the environment)
+# ------------------------
+def stage_cold() -> dict:
+    start = time.perf_counter()
+    from supervised_model import predictor
+    predictor.load()
+    return {"seconds": round(time.perf_counter() - start, 4), "peak_rss_mb": peak_rss_mb()}
+
+
+def stage_hot(samples: int, seed: int) -> dict:
+    import ingest
+    from rl_agent import SimpleRLAgent
+    from supervised_model import predictor
+
+    out = {}
+    routes = os.environ["RAILOPTIMUS_CSV_FOLDER"]
+    df, secs = _timed(ingest.load_routes, routes)
+    out["ingest"] = {"seconds": round(secs, 4), "rows": len(df), "rows_per_s": round(len(df) / secs, 1)}
+    del df
+
+    _, secs = _timed(predictor.load)
+    out["load_cached_s"] = round(secs, 4)
+
+    # Query mix: mostly exact hits, plus train/station/global fallbacks
+    rng = random.Random(seed)
+    live = predictor.df
+    trains = live["TrainNo"].astype(str).to_numpy()
+    stations = live["Station"].astype(str).to_numpy()
+    keys = []
+    for _ in range(samples):
+        i = rng.randrange(len(live))
+        r = rng.random()
+        if r < 0.8:
+            keys.append((trains[i], stations[i]))
+        elif r < 0.9:
+            keys.append((trains[i], "ZZZZZ"))
+        elif r < 0.97:
+            keys.append(("00000X", stations[i]))
+        else:
+            keys.append(("00000X", ""))
+
+    times = []
+    for tn, st in keys:
+        t = time.perf_counter()
+        predictor.predict_delay(tn, st)
+        times.append(time.perf_counter() - t)
+    out["predict"] = latency_stats(times)
+
+    out["batch"] = {}
+    for size, reps in [(64, 50), (512, 20), (4096, 5), (65536, 2)]:
+        batch = [keys[rng.randrange(len(keys))] for _ in range(size)]
+        times = []
+        for _ in range(reps):
+            _, secs = _timed(predictor.predict_delays, batch)
+            times.append(secs)
+        stats = latency_stats(times, "ms")
+        stats["rows_per_s"] = round(size / float(np.percentile(times, 50)), 1)
+        out["batch"][str(size)] = stats
+
+    agent = SimpleRLAgent()
+    weathers = ["Clear", "Clouds", "Rain", "Fog"]
+    states = [(rng.uniform(0, 300), rng.uniform(0, 10), rng.uniform(0, 160), rng.choice(weathers))
+              for _ in range(samples)]
+    times = []
+    for s in states:
+        t = time.perf_counter()
+        agent.get_action(*s)
+        times.append(time.perf_counter() - t)
+    out["rl"] = latency_stats(times)
+    n = 100_000
+    cols = (np.random.default_rng(seed).uniform(0, 300, n), np.full(n, 5.0), np.full(n, 80.0), "Rain")
+    _, secs = _timed(agent.get_actions, *cols)
+    out["rl"]["batch_rows_per_s"] = round(n / secs, 1)
+
+    out["decide"] = _decide_loop(keys, rng)
+    out["peak_rss_mb"] = peak_rss_mb()
+    return out
+
+
+def _decide_loop(keys, rng, loops: int = 20, per_loop: int = 50) -> dict:
+    """Drive main_gui's worker pipeline exactly as the Predict button does, minus Tk."""
+    import main_gui
+    from weather_api import get_client
+
+    def one_loop():
+        pairs = [keys[rng.randrange(len(keys))] for _ in range(per_loop)]
+        cities = [rng.choice(CITIES) for _ in pairs]
+        job = main_gui.start_batch(pairs, cities, [80.0] * len(pairs), None)
+        while True:
+            job_id, kind, _payload = main_gui._results.get()
+            if job_id == job and kind == "done":
+                return
+
+    get_client().clear()
+    _, first = _timed(one_loop)
+    times = [_timed(one_loop)[1] for _ in range(loops)]
+    stats = latency_stats(times, "ms")
+    stats["first_loop_ms"] = round(first * 1e3, 2)
+    stats["trains_per_loop"] = per_loop
+    return stats
+
+
+# ------------------------
+# Orchestration
+# ------------------------
+def _run_child(stage: str, env: dict, args) -> dict:
+    cmd = [sys.executable, os.path.abspath(__file__), "--stage", stage,
+           "--samples", str(args.samples), "--seed", str(args.seed)]
+    proc = subprocess.run(cmd, env=env, capture_output=True, text=True,
+                          cwd=os.path.dirname(os.path.abspath(__file__)))
+    for line in reversed(proc.stdout.splitlines()):
+        if line.startswith(RESULT_PREFIX):
+            return json.loads(line[len(RESULT_PREFIX):])
+    raise RuntimeError(f"benchmark stage {stage!r} failed:\n{proc.stdout}\n{proc.stderr}")
+
+
+def run_scale(n_trains: int, args, weather_url: str) -> dict:
+    workdir = tempfile.mkdtemp(prefix=f"railbench_{n_trains}_")
+    try:
+        routes = os.path.join(workdir, "routes")
+        rows, gen_s = _timed(generate_routes, routes, n_trains, args.seed)
+        env = dict(
+            os.environ,
+            RAILOPTIMUS_CSV_FOLDER=routes,
+            RAILOPTIMUS_DATA_FILE=os.path.join(workdir, "dataset.feather"),
+            RAILOPTIMUS_MODEL_FILE=os.path.join(workdir, "delay_model.pkl"),
+            RAILOPTIMUS_MODEL_REGISTRY=os.path.join(workdir, "registry"),
+            RAILOPTIMUS_RL_MODEL_FILE=os.path.join(workdir, "rl_agent_model.pkl"),
+            OPENWEATHER_URL=weather_url,
+            OPENWEATHER_API_KEY="bench",
+        )
+        result = {"trains": n_trains, "rows": rows, "generate_s": round(gen_s, 3)}
+        print(f"[benchmark] {n_trains:,} trains / {rows:,} rows: cold build...", file=sys.stderr)
+        result["cold_build"] = _run_child("cold", env, args)
+        result["cold_cached"] = _run_child("cold", env, args)
+        print(f"[benchmark] {n_trains:,} trains: hot paths...", file=sys.stderr)
+        result.update(_run_child("hot", env, args))
+        return result
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def _flatten(d: dict, prefix: str = "") -> dict:
+    out = {}
+    for k, v in d.items():
+        key = f"{prefix}{k}"
+        if isinstance(v, dict):
+            out.update(_flatten(v, key + "."))
+        elif isinstance(v, (int, float)) and not isinstance(v, bool):
+            out[key] = v
+    return out
+
+
+def compare(current: dict, baseline: dict, tolerance: float) -> list:
+    """Metrics worse than baseline by more than `tolerance` (a fraction)."""
+    cur, base = _flatten(current.get("scales", {})), _flatten(baseline.get("scales", {}))
+    regressions = []
+    for key, old in base.items():
+        new = cur.get(key)
+        if new is None or not old:
+            continue
+        leaf = key.rsplit(".", 1)[-1]
+        if leaf.endswith("per_s"):
+            worse = new < old * (1 - tolerance)
+        elif leaf.endswith(("_s", "_ms", "_us", "_mb")) or leaf == "seconds":
+            worse = new > old * (1 + tolerance)
+        else:
+            continue
+        if worse:
+            regressions.append({"metric": key, "baseline": old, "current": new,
+                                "change": round(new / old - 1, 3)})
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="RailOptimus benchmarks")
+    parser.add_argument("--trains", type=int, nargs="+", default=[100, 1000],
+                        help="scales to run (number of trains)")
+    parser.add_argument("--samples", type=int, default=2000, help="single-call samples per stage")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--weather-latency-ms", type=float, default=20.0)
+    parser.add_argument("--out", help="write JSON here (default: stdout)")
+    parser.add_argument("--baseline", help="compare against this earlier JSON result")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown (default 20%%)")
+    parser.add_argument("--stage", choices=["cold", "hot"], help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.stage:
+        res = stage_cold() if args.stage == "cold" else stage_hot(args.samples, args.seed)
+        print(RESULT_PREFIX + json.dumps(res))
+        return 0
+
+    report = {
+        "meta": {
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "samples": args.samples,
+            "seed": args.seed,
+            "weather_latency_ms": args.weather_latency_ms,
+        },
+        "scales": {},
+    }
+    with StubWeather(args.weather_latency_ms / 1000.0) as stub:
+        for n in args.trains:
+            report["scales"][str(n)] = run_scale(n, args, stub.url)
+
+    status = 0
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as fh:
+            report["regressions"] = compare(report, json.load(fh), args.tolerance)
+        for r in report["regressions"]:
+            print(f"[benchmark] REGRESSION {r['metric']}: {r['baseline']} -> {r['current']} "
+                  f"({r['change']:+.0%})", file=sys.stderr)
+        status = 1 if report["regressions"] else 0
+
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as fh:
+            fh.write(text + "\n")
+    else:
+        print(text)
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,226 @@
+# bulk_score.py
+"""
+Score a whole timetable offline: stream CSV/Parquet rows in, stream delay
+predictions and speed actions out.
+
+    python bulk_score.py timetable.csv scored.csv --workers 4
+    python bulk_score.py timetable.parquet scored.parquet --chunksize 500000
+
+Input columns (header case and spacing are ignored):
+    train_no / TrainNo          required
+    station_code / Station      required
+    station_name / Station_Name optional
+    speed, visibility, weather  optional (default 80 km/h, 10 km, "Clear")
+Every other column (e.g. hour) is passed through unchanged. Output adds
+predicted_delay, delay_tier and action; when the agent plans on a delay
+quantile (RAILOPTIMUS_RL_DELAY_QUANTILE) also that quantile, e.g. delay_p90.
+
+At most `workers * 2` chunks are in memory at once; results are written in
+input order as soon as they are ready.
+"""
+import argparse
+import gc
+import multiprocessing
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from supervised_model import predictor, quantile_label
+
+CHUNKSIZE = 200_000
+DEFAULT_SPEED = 80.0
+DEFAULT_VISIBILITY = 10.0
+DEFAULT_WEATHER = "Clear"
+
+# Normalized input header -> internal name
+INPUT_COLUMNS = {
+    "train_no": "TrainNo", "trainno": "TrainNo", "train": "TrainNo",
+    "station_code": "Station", "station": "Station",
+    "station_name": "Station_Name",
+    "speed": "speed", "visibility": "visibility", "weather": "weather",
+}
+
+_agent = None
+
+
+def _get_agent():
+    global _agent
+    if _agent is None:
+        from rl_agent import SimpleRLAgent
+        _agent = SimpleRLAgent()
+    return _agent
+
+
+def _is_parquet(path: str) -> bool:
+    return path.lower().endswith((".parquet", ".pq"))
+
+
+def _column_map(columns) -> dict:
+    mapping = {}
+    for col in columns:
+        key = str(col).strip().lower().replace(" ", "_")
+        target = INPUT_COLUMNS.get(key)
+        if target and target not in mapping.values():
+            mapping[col] = target
+    return mapping
+
+
+# ------------------------
+# Streaming input / output
+# ------------------------
+def iter_chunks(path: str, chunksize: int = CHUNKSIZE):
+    """Yield the input file as DataFrames of at most `chunksize` rows."""
+    if _is_parquet(path):
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunksize):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(path, chunksize=chunksize, dtype=str, keep_default_na=False,
+                               na_values=[""])
+
+
+class ChunkWriter:
+    """Appends scored chunks to a CSV or Parquet file."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._parquet = None
+        self._wrote_header = False
+
+    def write(self, df: pd.DataFrame):
+        if _is_parquet(self.path):
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            if self._parquet is None:
+                self._parquet = pq.ParquetWriter(self.path, table.schema)
+            self._parquet.write_table(table.cast(self._parquet.schema))
+        else:
+            df.to_csv(self.path, mode="a" if self._wrote_header else "w",
+                      header=not self._wrote_header, index=False)
+            self._wrote_header = True
+
+    def close(self):
+        if self._parquet is not None:
+            self._parquet.close()
+
+
+# ------------------------
+# Scoring
+# ------------------------
+def score_chunk(chunk: pd.DataFrame) -> pd.DataFrame:
+    """Predict delays and decide actions for every row of one chunk."""
+    cols = chunk.rename(columns=_column_map(chunk.columns))
+    missing = {"TrainNo", "Station"} - set(cols.columns)
+    if missing:
+        raise ValueError(f"Input is missing column(s): {', '.join(sorted(missing))}")
+
+    names = cols["Station_Name"].to_numpy(dtype=object) if "Station_Name" in cols else None
+    keys = (cols["TrainNo"].to_numpy(dtype=object), cols["Station"].to_numpy(dtype=object), names)
+    agent = _get_agent()
+    q = agent.delay_quantile
+    if q is None:
+        delays, tiers = predictor.predict_columns(*keys)
+        planned = delays
+    else:
+        intervals, tiers = predictor.predict_interval_columns(*keys, quantiles=(q,))
+        delays, planned = intervals["delay"], agent.planning_delay(intervals)
+
+    def numeric(name, default):
+        if name not in cols:
+            return np.full(len(cols), default)
+        values = pd.to_numeric(cols[name], errors="coerce").to_numpy(dtype=float)
+        # Same rule as the GUI: missing or negative -> default
+        return np.where(np.isnan(values) | (values < 0), default, values)
+
+    weather = (cols["weather"].fillna(DEFAULT_WEATHER).astype(str).to_numpy()
+               if "weather" in cols else DEFAULT_WEATHER)
+    actions = agent.get_actions(
+        planned, numeric("visibility", DEFAULT_VISIBILITY), numeric("speed", DEFAULT_SPEED), weather,
+    )
+
+    out = chunk.copy()
+    out["predicted_delay"] = delays
+    if q is not None:
+        out["delay_" + quantile_label(q)] = planned
+    out["delay_tier"] = tiers.astype(str)
+    out["action"] = actions.astype(str)
+    return out
+
+
+def warm_up():
+    """Load dataset, model and agent in this process so forked workers share them."""
+    predictor.load()
+    _get_agent()
+    # Keep the collector from touching (and so copying) the loaded objects in workers
+    gc.freeze()
+
+
+def score_file(in_path: str, out_path: str, workers: int = 1, chunksize: int = CHUNKSIZE,
+               progress=None) -> dict:
+    """
+    Stream in_path through score_chunk into out_path. Returns a summary dict
+    with rows, seconds and rows_per_s.
+    """
+    warm_up()
+    start = time.perf_counter()
+    rows = 0
+    writer = ChunkWriter(out_path)
+    try:
+        if workers <= 1:
+            for chunk in iter_chunks(in_path, chunksize):
+                writer.write(score_chunk(chunk))
+                rows += len(chunk)
+                if progress:
+                    progress(rows)
+        else:
+            method = "fork" if "fork" in multiprocessing.get_all_start_methods() else None
+            with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context(method)) as pool:
+                pending = deque()
+                for chunk in iter_chunks(in_path, chunksize):
+                    pending.append(pool.submit(score_chunk, chunk))
+                    # Bounded in-flight work keeps memory flat on huge inputs
+                    while len(pending) >= workers * 2:
+                        scored = pending.popleft().result()
+                        writer.write(scored)
+                        rows += len(scored)
+                        if progress:
+                            progress(rows)
+                while pending:
+                    scored = pending.popleft().result()
+                    writer.write(scored)
+                    rows += len(scored)
+                    if progress:
+                        progress(rows)
+    finally:
+        writer.close()
+    seconds = time.perf_counter() - start
+    return {"rows": rows, "seconds": seconds, "rows_per_s": rows / seconds if seconds else 0.0}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk delay prediction and speed-action scoring")
+    parser.add_argument("input", help="timetable CSV or Parquet file")
+    parser.add_argument("output", help="output CSV or Parquet file")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="worker processes (0 = one per CPU, default %(default)s)")
+    parser.add_argument("--chunksize", type=int, default=CHUNKSIZE, help="rows per chunk")
+    args = parser.parse_args(argv)
+
+    workers = args.workers or os.cpu_count() or 1
+    summary = score_file(
+        args.input, args.output, workers, args.chunksize,
+        progress=lambda n: print(f"\r{n:,} rows scored", end="", file=sys.stderr),
+    )
+    print(file=sys.stderr)
+    print(f"Scored {summary['rows']:,} rows in {summary['seconds']:.2f}s "
+          f"({summary['rows_per_s']:,.0f} rows/s) -> {args.output}")
+
+
+if __name__ == "__main__":
+    main()
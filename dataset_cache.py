@@ -0,0 +1,265 @@
+# dataset_cache.py
+import hashlib
+import json
+import os
+import zipfile
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+from ingest import KEY_COLS, Source, iter_sources, load_sources, train_no_of, unique_by_train
+
+try:
+    import pyarrow.feather as feather
+except ImportError:
+    feather = None
+
+# Uncompressed Feather can be memory-mapped; without pyarrow fall back to a pickle
+DEFAULT_CACHE_FILE = "train_dataset.feather" if feather is not None else "train_dataset.pkl"
+
+MANIFEST_VERSION = 1
+
+# Percentages (0-100, two decimals) fit float32, which is also the precision
+# the model predicts in; the delay target stays float64
+FLOAT32_COLS = ["p_on_time", "p_slight", "p_significant", "p_cancelled"]
+
+
+def source_key(source: Source) -> str:
+    path, member = source
+    path = os.path.abspath(path)
+    return path if member is None else f"{path}!{member}"
+
+
+def _file_hash(path: str) -> str:
+    h = hashlib.sha1()
+    with open(path, "rb") as fh:
+        for block in iter(lambda: fh.read(1 << 20), b""):
+            h.update(block)
+    return "sha1:" + h.hexdigest()
+
+
+def _signature(source: Source, previous: dict, zips: dict) -> dict:
+    path, member = source
+    if member is not None:
+        zf = zips.get(path)
+        if zf is None:
+            zf = zips[path] = zipfile.ZipFile(path)
+        info = zf.getinfo(member)
+        sig = {
+            "size": info.file_size,
+            "mtime": "%04d-%02d-%02dT%02d:%02d:%02d" % info.date_time,
+            "hash": "crc32:%08x" % info.CRC,
+        }
+    else:
+        st = os.stat(path)
+        sig = {"size": st.st_size, "mtime": st.st_mtime_ns}
+        old = previous.get(source_key(source))
+        if old and old.get("size") == sig["size"] and old.get("mtime") == sig["mtime"]:
+            sig["hash"] = old["hash"]
+        else:
+            sig["hash"] = _file_hash(path)
+    sig["train"] = train_no_of(source)
+    sig["path"] = path
+    sig["member"] = member
+    return sig
+
+
+def scan_sources(paths, previous: Optional[dict] = None) -> Dict[str, dict]:
+    """
+    Signature of every route source under `paths`: train number, size,
+    mtime and content hash. ZIP members use their stored CRC32; plain files
+    are only re-hashed when size or mtime differ from `previous`.
+    """
+    previous = previous or {}
+    zips = {}
+    try:
+        return {
+            source_key(src): _signature(src, previous, zips)
+            for src in unique_by_train(iter_sources(paths))
+        }
+    finally:
+        for zf in zips.values():
+            zf.close()
+
+
+# ------------------------
+# Frame storage
+# ------------------------
+def compact(df: pd.DataFrame) -> pd.DataFrame:
+    """Categorical-encode the key columns (they repeat on every row) and narrow the percentages."""
+    for col in KEY_COLS:
+        if col in df.columns and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype("category")
+    for col in FLOAT32_COLS:
+        if col in df.columns and df[col].dtype != "float32":
+            df[col] = df[col].astype("float32")
+    return df
+
+
+def read_frame(path: str) -> pd.DataFrame:
+    if path.endswith(".feather"):
+        table = feather.read_table(path, memory_map=True)
+        return table.to_pandas(split_blocks=True)
+    if path.endswith(".parquet"):
+        return pd.read_parquet(path, memory_map=True)
+    return pd.read_pickle(path)
+
+
+def write_frame(df: pd.DataFrame, path: str):
+    tmp = path + ".tmp"
+    df = df.reset_index(drop=True)
+    if path.endswith(".feather"):
+        feather.write_feather(df, tmp, compression="uncompressed")
+    elif path.endswith(".parquet"):
+        df.to_parquet(tmp, index=False)
+    else:
+        df.to_pickle(tmp)
+    os.replace(tmp, path)
+
+
+# ------------------------
+# Derived tables (features, rollups) cached next to the dataset
+# ------------------------
+def derived_file(cache_file: str, name: str) -> str:
+    """e.g. train_dataset.feather -> train_dataset.<name>.feather"""
+    root, ext = os.path.splitext(cache_file)
+    return f"{root}.{name}{ext}"
+
+
+def dataset_key(df: pd.DataFrame) -> str:
+    """Content hash of the raw route columns; derived tables are valid while it holds."""
+    from model_registry import dataset_hash
+    cols = [c for c in ["TrainNo", "Station", "Station_Name", "avg_delay", "p_on_time", "p_slight",
+                        "p_significant", "p_cancelled"] if c in df.columns]
+    return dataset_hash(df, cols)
+
+
+def read_derived(path: str, key: str) -> Optional[pd.DataFrame]:
+    """The table at `path` if it was written for `key`, else None."""
+    try:
+        with open(path + ".json", "r", encoding="utf-8") as fh:
+            if json.load(fh).get("key") != key:
+                return None
+        return read_frame(path)
+    except (OSError, ValueError):
+        return None
+
+
+def write_derived(df: pd.DataFrame, path: str, key: str):
+    try:
+        write_frame(df, path)
+        with open(path + ".json", "w", encoding="utf-8") as fh:
+            json.dump({"key": key}, fh)
+    except OSError as e:
+        print(f"[dataset_cache] Could not write {path}:", e)
+
+
+class DatasetCache:
+    """
+    Columnar on-disk copy of the merged route dataset plus a manifest of the
+    source files it was built from. load() re-ingests only the routes whose
+    source changed, was added or was removed since the last run.
+
+    Routes upserted from files outside `sources` are pinned in the manifest:
+    load() cannot see those files, so it keeps their rows until a route for
+    the same train under `sources` changes.
+    """
+
+    def __init__(self, cache_file: str = DEFAULT_CACHE_FILE, sources=None):
+        self.cache_file = cache_file
+        self.manifest_file = cache_file + ".manifest.json"
+        self.sources = sources
+
+    def read_manifest(self) -> dict:
+        try:
+            with open(self.manifest_file, "r", encoding="utf-8") as fh:
+                manifest = json.load(fh)
+        except (OSError, ValueError):
+            return {}
+        if manifest.get("version") != MANIFEST_VERSION:
+            return {}
+        return manifest.get("sources", {})
+
+    def write_manifest(self, entries: Dict[str, dict]):
+        tmp = self.manifest_file + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as fh:
+            json.dump({"version": MANIFEST_VERSION, "sources": entries}, fh, indent=1, sort_keys=True)
+        os.replace(tmp, self.manifest_file)
+
+    def save(self, df: pd.DataFrame, entries: Dict[str, dict]):
+        write_frame(compact(df), self.cache_file)
+        self.write_manifest(entries)
+
+    def save_upsert(self, df: pd.DataFrame, source: Optional[Source] = None):
+        """
+        Persist a dataset edited in place. If the edit came from `source`,
+        record its signature so the next load() does not re-ingest it.
+        """
+        entries = self.read_manifest()
+        if source is not None:
+            zips = {}
+            try:
+                sig = _signature(source, entries, zips)
+            finally:
+                for zf in zips.values():
+                    zf.close()
+            if not self._scanned(source):
+                sig["pinned"] = True
+            entries[source_key(source)] = sig
+        self.save(df, entries)
+
+    def _scanned(self, source: Source) -> bool:
+        """True if load() finds `source` under self.sources (a listed file/ZIP or one in a listed folder)."""
+        roots = self.sources or []
+        if isinstance(roots, str):
+            roots = [p for p in roots.split(os.pathsep) if p]
+        path = os.path.abspath(source[0])
+        return any(path == r or (os.path.isdir(r) and os.path.dirname(path) == r)
+                   for r in map(os.path.abspath, roots))
+
+    def load(self, workers: int = None) -> pd.DataFrame:
+        previous = self.read_manifest()
+        have_cache = os.path.isfile(self.cache_file) and bool(previous)
+        current = scan_sources(self.sources, previous) if self.sources else {}
+
+        if have_cache and not current:
+            # Route files not reachable from here: serve the cache as-is
+            return compact(read_frame(self.cache_file))
+        if not current:
+            raise SystemExit("❌ No CSV files found in: " + str(self.sources))
+
+        # Upserted from outside the sources: not removed just because the scan misses them
+        pinned = {k: sig for k, sig in previous.items() if sig.get("pinned") and k not in current}
+        if have_cache:
+            changed = [k for k, sig in current.items() if previous.get(k, {}).get("hash") != sig["hash"]
+                       or previous[k].get("train") != sig["train"]]
+            removed = [k for k in previous if k not in current and k not in pinned]
+            df = compact(read_frame(self.cache_file))
+            if not changed and not removed:
+                if any(previous[k] != current[k] for k in current):
+                    self.write_manifest({**current, **pinned})  # only mtimes moved
+                return df
+
+            stale = {previous[k]["train"] for k in removed}
+            stale |= {previous[k]["train"] for k in changed if k in previous}
+            stale |= {current[k]["train"] for k in changed}
+            # A dropped train may still be served by another, unchanged source
+            changed += [k for k, sig in current.items() if sig["train"] in stale and k not in changed]
+            print(f"[dataset_cache] Re-ingesting {len(changed)} changed route(s), dropping {len(removed)}")
+            keep = df[~df["TrainNo"].isin(stale)]
+            # A changed route under the sources replaces a pinned upsert of the same train
+            pinned = {k: sig for k, sig in pinned.items() if sig["train"] not in stale}
+        else:
+            changed = list(current)
+            keep = None
+            pinned = {}
+
+        fresh = load_sources(self._sources_for(current, changed), workers)
+        df = fresh if keep is None else pd.concat([keep, fresh], ignore_index=True)
+        df = compact(df)
+        self.save(df, {**current, **pinned})
+        return df
+
+    @staticmethod
+    def _sources_for(entries: Dict[str, dict], keys: List[str]) -> List[Source]:
+        return [(entries[k]["path"], entries[k]["member"]) for k in keys]
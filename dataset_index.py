@@ -0,0 +1,486 @@
+# dataset_index.py
+from typing import Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from station_resolver import MIN_SCORE, StationResolver
+
+# Fallback tiers, in the order predict_delay tries them
+TIER_EXACT = "exact"
+TIER_NAME = "name"
+TIER_FUZZY = "fuzzy"
+TIER_TRAIN_AVG = "train_avg"
+TIER_STATION_AVG = "station_avg"
+TIER_GLOBAL = "global"
+
+TIERS = [TIER_EXACT, TIER_NAME, TIER_FUZZY, TIER_TRAIN_AVG, TIER_STATION_AVG, TIER_GLOBAL]
+
+# Station candidates tried against a train's route by the fuzzy tier
+FUZZY_CANDIDATES = 8
+
+KEY_COLS = ["TrainNo", "Station", "Station_Name"]
+
+
+def _pack(train_codes, other_codes) -> np.ndarray:
+    """One int64 key per (train code, station or name code) pair."""
+    return (np.asarray(train_codes, dtype=np.int64) << 32) | np.asarray(other_codes, dtype=np.int64)
+
+
+class _KeyTable:
+    """Sorted packed keys -> position of the first row with that key (what .iloc[0] would pick)."""
+
+    def __init__(self, keys: np.ndarray, positions: np.ndarray):
+        order = np.argsort(keys, kind="stable")
+        keys, positions = keys[order], positions[order]
+        first = np.ones(len(keys), dtype=bool)
+        first[1:] = keys[1:] != keys[:-1]
+        self.keys = keys[first]
+        self.pos = positions[first]
+
+    def get(self, key: int) -> int:
+        # The method form skips np.searchsorted's dispatch, which dominates one lookup
+        i = self.keys.searchsorted(key)
+        if i < len(self.keys) and self.keys[i] == key:
+            return int(self.pos[i])
+        return -1
+
+    def get_many(self, keys: np.ndarray) -> np.ndarray:
+        if not len(self.keys):
+            return np.full(len(keys), -1, dtype=np.int64)
+        i = np.minimum(np.searchsorted(self.keys, keys), len(self.keys) - 1)
+        return np.where(self.keys[i] == keys, self.pos[i], -1)
+
+    def drop_train(self, train_code: int):
+        keep = (self.keys >> 32) != train_code
+        self.keys, self.pos = self.keys[keep], self.pos[keep]
+
+    def merge(self, keys: np.ndarray, positions: np.ndarray):
+        merged = _KeyTable(np.concatenate([self.keys, keys]), np.concatenate([self.pos, positions]))
+        self.keys, self.pos = merged.keys, merged.pos
+
+
+class DatasetIndex:
+    """
+    Lookup tables built once from the route dataset so that every
+    predict_delay fallback tier is an array lookup instead of a DataFrame scan.
+
+    Everything is held in flat NumPy arrays so a network-sized dataset stays
+    small and forked workers keep sharing its pages:
+    - train numbers, station codes and names are categorical; the categories
+      are the shared dictionaries and rows only carry integer codes
+    - features are one float32 matrix (the precision the model predicts in)
+    - (train, station) lookups are binary searches over sorted int64 keys
+    - per-train and per-station sums are arrays indexed by code
+    - free-text station input goes through a StationResolver over the
+      codes and names (`stations`) when the exact keys miss
+
+    Trains can be replaced or removed in place (upsert_train / remove_train).
+    Replaced rows stay in `df` but are marked dead in `live`; live_frame()
+    returns the current dataset.
+    """
+
+    def __init__(self, df: pd.DataFrame, feature_cols, drop_cols=()):
+        self.feature_cols = list(feature_cols)
+        df = df.reset_index(drop=True)
+        # Keep each train's rows contiguous so a train is a (start, length) slice
+        order = pd.factorize(df["TrainNo"])[0]
+        if len(order) and np.count_nonzero(np.diff(order)) + 1 != order.max() + 1:
+            df = df.iloc[np.argsort(order, kind="stable")].reset_index(drop=True)
+
+        self.X = df[self.feature_cols].fillna(0).to_numpy(dtype=np.float32)
+        # Derived columns live only in X
+        df = df.drop(columns=[c for c in drop_cols if c in df.columns and c not in KEY_COLS])
+        for col in KEY_COLS:
+            if col in df.columns and not isinstance(df[col].dtype, pd.CategoricalDtype):
+                df[col] = df[col].astype("category")
+        self.df = df
+        self.live = np.ones(len(df), dtype=bool)
+        self._index_categories()
+
+        trains = self._codes("TrainNo")
+        n_trains = len(df["TrainNo"].cat.categories)
+        starts = np.flatnonzero(np.r_[True, trains[1:] != trains[:-1]]) if len(trains) else np.empty(0, np.int64)
+        self.train_start = np.zeros(n_trains, dtype=np.int64)
+        self.train_len = np.zeros(n_trains, dtype=np.int64)
+        self.train_sum = np.zeros((n_trains, len(self.feature_cols)))
+        if len(starts):
+            self.train_start[trains[starts]] = starts
+            self.train_len[trains[starts]] = np.diff(np.r_[starts, len(trains)])
+            self.train_sum[trains[starts]] = np.add.reduceat(self.X, starts, axis=0, dtype=np.float64)
+
+        positions = np.arange(len(df), dtype=np.int64)
+        self.by_station = self._key_table("Station", trains, positions)
+        self.by_name = self._key_table("Station_Name", trains, positions)
+
+        # Station and global means are kept as running sums so a train
+        # can be added or removed without rescanning everything
+        n_stations = len(df["Station"].cat.categories)
+        self.station_sum, self.station_count = self._station_sums(self._codes("Station"), self.X, n_stations)
+        self.global_sum = self.X.sum(axis=0, dtype=np.float64)
+        self.global_count = len(self.X)
+        self.global_mean = self._global_mean()
+        self.stations = self._station_resolver()
+
+    def _global_mean(self) -> np.ndarray:
+        if self.global_count == 0:
+            return np.zeros(len(self.feature_cols))
+        return self.global_sum / self.global_count
+
+    # ------------------------
+    # Codes
+    # ------------------------
+    def _index_categories(self):
+        """Key dictionaries as lookup tables; rebuilt whenever _encode grows them."""
+        self._categories = {col: self.df[col].cat.categories for col in KEY_COLS if col in self.df.columns}
+        self._category_values = {col: cats.to_numpy(dtype=object) for col, cats in self._categories.items()}
+        self._category_codes = {col: dict(zip(values, range(len(values))))
+                                for col, values in self._category_values.items()}
+
+    def _codes(self, col: str) -> np.ndarray:
+        return self.df[col].cat.codes.to_numpy()
+
+    def _code(self, col: str, value) -> int:
+        """Category code of one key, -1 if unseen."""
+        codes = self._category_codes.get(col)
+        if not value or codes is None:
+            return -1
+        return codes.get(value, -1)
+
+    def _code_many(self, col: str, values) -> np.ndarray:
+        cats = self._categories.get(col)
+        if cats is None:
+            return np.full(len(values), -1, dtype=np.int64)
+        return cats.get_indexer(pd.Index(values, dtype=object))
+
+    def _key_table(self, col: str, trains: np.ndarray, positions: np.ndarray) -> _KeyTable:
+        if col not in self.df.columns:
+            return _KeyTable(np.empty(0, np.int64), np.empty(0, np.int64))
+        codes = self._codes(col)[positions]
+        ok = codes >= 0
+        return _KeyTable(_pack(trains[ok], codes[ok]), positions[ok])
+
+    def _station_resolver(self) -> StationResolver:
+        """Resolver over the live (code, name) pairs, weighted by how many rows use each."""
+        stations = self._codes("Station")[self.live]
+        names = (self._codes("Station_Name")[self.live] if "Station_Name" in self.df.columns
+                 else np.full(len(stations), -1))
+        ok = stations >= 0
+        pairs, counts = np.unique(_pack(stations[ok], names[ok] + 1), return_counts=True)
+        names = (pairs & 0xFFFFFFFF) - 1
+        name_cats = self._category_values.get("Station_Name", np.empty(0, dtype=object))
+        resolver = StationResolver(
+            self._category_values["Station"][pairs >> 32],
+            np.where(names >= 0, name_cats[np.maximum(names, 0)] if len(name_cats) else None, None),
+            counts,
+        )
+        # Resolver id -> Station code here
+        self._resolved_codes = self._code_many("Station", resolver.codes)
+        return resolver
+
+    def _fuzzy_codes(self, text) -> np.ndarray:
+        """
+        Station codes of the resolver's candidates for `text`, best first.
+        A real station code only stands for itself and its aliases, never
+        for whatever else it happens to prefix.
+        """
+        if not text:
+            return np.empty(0, dtype=np.int64)
+        if self._code("Station", text) >= 0:
+            ids = self.stations.aliases(text)
+        else:
+            ids = self.stations.ranked(text, FUZZY_CANDIDATES, MIN_SCORE)
+        codes = self._resolved_codes[ids]
+        return codes[codes >= 0]
+
+    def _fuzzy_stop(self, t: int, text) -> int:
+        """Row of train code `t` at the best-ranked candidate station for `text`, or -1."""
+        codes = self._fuzzy_codes(text)
+        pos = self.by_station.get_many(_pack(np.full(len(codes), t), codes))
+        pos = pos[pos >= 0]
+        return int(pos[0]) if len(pos) else -1
+
+    def _fuzzy_stops(self, trains: np.ndarray, texts: np.ndarray) -> np.ndarray:
+        """Vectorized _fuzzy_stop: the resolver runs once per distinct text."""
+        labels, uniq = pd.factorize(np.asarray(texts, dtype=object))
+        cands = [self._fuzzy_codes(u) for u in uniq] + [np.empty(0, dtype=np.int64)]
+        lens = np.array([len(c) for c in cands], dtype=np.int64)
+        offsets = np.cumsum(lens) - lens
+        # One (row, candidate) pair per candidate of each row's text, best first
+        n = lens[labels]
+        rows = np.repeat(np.arange(len(texts)), n)
+        within = np.arange(len(rows)) - np.repeat(np.cumsum(n) - n, n)
+        codes = np.concatenate(cands)[np.repeat(offsets[labels], n) + within]
+        pos = self.by_station.get_many(_pack(np.asarray(trains)[rows], codes))
+        hit = pos >= 0
+        out = np.full(len(texts), -1, dtype=np.int64)
+        first_rows, first = np.unique(rows[hit], return_index=True)
+        out[first_rows] = pos[hit][first]
+        return out
+
+    def _fuzzy_station(self, text) -> int:
+        """Station code the resolver picks for `text`, or -1."""
+        ids = self.stations.ranked(text, 1, MIN_SCORE) if text else ()
+        return int(self._resolved_codes[ids[0]]) if len(ids) else -1
+
+    @staticmethod
+    def _station_sums(stations: np.ndarray, X: np.ndarray, size: int):
+        ok = stations >= 0
+        stations, X = stations[ok], X[ok]
+        sums = np.zeros((size, X.shape[1]))
+        for j in range(X.shape[1]):
+            sums[:, j] = np.bincount(stations, weights=X[:, j], minlength=size)
+        return sums, np.bincount(stations, minlength=size)
+
+    def rows_of(self, train_no: str) -> Optional[np.ndarray]:
+        """Row positions of a live train in route order, or None."""
+        t = self._code("TrainNo", train_no)
+        if t < 0 or self.train_len[t] == 0:
+            return None
+        return np.arange(self.train_start[t], self.train_start[t] + self.train_len[t])
+
+    def find_stop(self, rows: np.ndarray, key: str) -> np.ndarray:
+        """
+        Offsets into `rows` whose station code or name equals `key`; failing
+        that, the stops of the best-ranked fuzzy station match on the route.
+        """
+        hit = np.zeros(len(rows), dtype=bool)
+        for col in ("Station", "Station_Name"):
+            code = self._code(col, key)
+            if code >= 0:
+                hit |= self._codes(col)[rows] == code
+        if not hit.any():
+            stations = self._codes("Station")[rows]
+            for code in self._fuzzy_codes(key):
+                hit = stations == code
+                if hit.any():
+                    break
+        return np.flatnonzero(hit)
+
+    def values(self, col: str, rows: np.ndarray) -> np.ndarray:
+        """Strings of `col` at the given row positions (only those rows are decoded)."""
+        codes = self._codes(col)[rows]
+        cats = self._category_values[col]
+        return np.where(codes >= 0, cats[np.maximum(codes, 0)] if len(cats) else None, None)
+
+    # ------------------------
+    # Lookups
+    # ------------------------
+    def resolve(self, train_no: str, station_code: str,
+                station_name: Optional[str] = None) -> Tuple[np.ndarray, str]:
+        """
+        Returns (feature_vector, tier) following the
+        exact -> name -> fuzzy -> train-avg -> station-avg -> global fallback
+        chain. Inputs are expected already stripped and uppercased. The
+        fuzzy tier picks the train's stop at the best-ranked station the
+        resolver finds for the code or name (for a known code, only its
+        aliases); station-avg also accepts a resolved station.
+        """
+        t = self._code("TrainNo", train_no)
+        s = self._code("Station", station_code)
+        if t >= 0:
+            if s >= 0:
+                pos = self.by_station.get((t << 32) | s)
+                if pos >= 0:
+                    return self.X[pos], TIER_EXACT
+
+            n = self._code("Station_Name", station_name)
+            if n >= 0:
+                pos = self.by_name.get((t << 32) | n)
+                if pos >= 0:
+                    return self.X[pos], TIER_NAME
+
+            for text in (station_code, station_name):
+                pos = self._fuzzy_stop(t, text)
+                if pos >= 0:
+                    return self.X[pos], TIER_FUZZY
+
+            if self.train_len[t]:
+                return self.train_sum[t] / self.train_len[t], TIER_TRAIN_AVG
+
+        if s < 0:
+            s = self._fuzzy_station(station_code)
+        if s < 0:
+            s = self._fuzzy_station(station_name)
+        if s >= 0 and self.station_count[s]:
+            return self.station_sum[s] / self.station_count[s], TIER_STATION_AVG
+
+        return self.global_mean, TIER_GLOBAL
+
+    def resolve_frame(self, train_nos, station_codes, station_names=None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Vectorized resolve() for many keys: strings are mapped to codes once,
+        then each fallback tier is one array lookup over the rows still
+        unresolved. Inputs are equal-length arrays, already stripped and
+        uppercased (missing names as None/""). Returns (feature matrix,
+        array of tier names).
+        """
+        n = len(train_nos)
+        X = np.broadcast_to(self.global_mean, (n, len(self.feature_cols))).copy()
+        tiers = np.full(n, TIER_GLOBAL, dtype=object)
+        t = self._code_many("TrainNo", train_nos)
+        s = self._code_many("Station", station_codes)
+        todo = np.ones(n, dtype=bool)
+
+        def lookup(table, codes, tier):
+            ask = todo & (t >= 0) & (codes >= 0)
+            pos = np.full(n, -1, dtype=np.int64)
+            pos[ask] = table.get_many(_pack(t[ask], codes[ask]))
+            hit = pos >= 0
+            X[hit] = self.X[pos[hit]]
+            tiers[hit] = tier
+            todo[hit] = False
+
+        def mean(sums, counts, codes, tier):
+            c = np.maximum(codes, 0)
+            hit = todo & (codes >= 0) & (counts[c] > 0)
+            X[hit] = sums[c[hit]] / counts[c[hit], None]
+            tiers[hit] = tier
+            todo[hit] = False
+
+        lookup(self.by_station, s, TIER_EXACT)
+        if station_names is not None:
+            lookup(self.by_name, self._code_many("Station_Name", station_names), TIER_NAME)
+
+        # Fuzzy matches on the code text, then the name text
+        for texts in (station_codes, station_names):
+            if texts is None:
+                continue
+            ask = np.flatnonzero(todo & (t >= 0))
+            pos = self._fuzzy_stops(t[ask], np.asarray(texts, dtype=object)[ask])
+            hit = pos >= 0
+            X[ask[hit]] = self.X[pos[hit]]
+            tiers[ask[hit]] = TIER_FUZZY
+            todo[ask[hit]] = False
+
+        mean(self.train_sum, self.train_len, t, TIER_TRAIN_AVG)
+        s = s.copy()
+        for texts in (station_codes, station_names):
+            if texts is None:
+                continue
+            ask = np.flatnonzero(todo & (s < 0))
+            labels, uniq = pd.factorize(np.asarray(texts, dtype=object)[ask])
+            s[ask] = np.array([self._fuzzy_station(u) for u in uniq] + [-1], dtype=np.int64)[labels]
+        mean(self.station_sum, self.station_count, s, TIER_STATION_AVG)
+        return X, tiers
+
+    def row(self, train_no: str, station_code: str) -> Optional[dict]:
+        """Raw dataset row for train+station, or None."""
+        t, s = self._code("TrainNo", train_no), self._code("Station", station_code)
+        pos = self.by_station.get((t << 32) | s) if t >= 0 and s >= 0 else -1
+        if pos < 0:
+            return None
+        # float32 columns read back as their shortest decimal (3.6, not 3.5999999)
+        row = {}
+        for col in self.df.columns:
+            v = self.df[col].iat[pos]
+            row[col] = float(str(v)) if isinstance(v, np.float32) else v.item() if isinstance(v, np.generic) else v
+        return row
+
+    # ------------------------
+    # Incremental updates
+    # ------------------------
+    def remove_train(self, train_no: str) -> int:
+        """Drop a train from every lookup table. Returns the number of rows removed."""
+        rows = self.rows_of(train_no)
+        if rows is None:
+            return 0
+        t = self._code("TrainNo", train_no)
+        self.live[rows] = False
+        self.train_len[t] = 0
+        self.train_sum[t] = 0.0
+        self.by_station.drop_train(t)
+        self.by_name.drop_train(t)
+
+        X = self.X[rows]
+        sums, counts = self._station_sums(self._codes("Station")[rows], X, len(self.station_count))
+        self.station_sum -= sums
+        self.station_count -= counts
+        self.global_sum = self.global_sum - X.sum(axis=0, dtype=np.float64)
+        self.global_count -= len(rows)
+        self.global_mean = self._global_mean()
+        return len(rows)
+
+    def _encode(self, rows: pd.DataFrame) -> pd.DataFrame:
+        """Add unseen keys of `rows` to the shared dictionaries and encode `rows` with them."""
+        grown = False
+        for col in KEY_COLS:
+            if col not in self.df.columns:
+                continue
+            values = rows[col].to_numpy(dtype=object) if col in rows.columns else np.full(len(rows), None)
+            new = pd.Index(pd.unique(values[pd.notna(values)])).difference(self._categories[col])
+            if len(new):
+                self.df[col] = self.df[col].cat.add_categories(new)
+                grown = True
+            rows[col] = pd.Categorical(values, dtype=self.df[col].dtype)
+        if grown:
+            self._index_categories()
+
+        # Per-code arrays grow with the dictionaries
+        grow = len(self._categories["TrainNo"]) - len(self.train_len)
+        if grow > 0:
+            self.train_start = np.r_[self.train_start, np.zeros(grow, np.int64)]
+            self.train_len = np.r_[self.train_len, np.zeros(grow, np.int64)]
+            self.train_sum = np.vstack([self.train_sum, np.zeros((grow, len(self.feature_cols)))])
+        grow = len(self._categories["Station"]) - len(self.station_count)
+        if grow > 0:
+            self.station_count = np.r_[self.station_count, np.zeros(grow, np.int64)]
+            self.station_sum = np.vstack([self.station_sum, np.zeros((grow, len(self.feature_cols)))])
+        return rows
+
+    def upsert_train(self, train_no: str, rows: pd.DataFrame) -> int:
+        """
+        Replace (or add) every row of `train_no` with `rows`. Keys in `rows`
+        must already be normalized. Returns the number of rows removed.
+        """
+        removed = self.remove_train(train_no)
+        rows = rows.reset_index(drop=True).copy()
+        rows["TrainNo"] = train_no
+        if rows.empty:
+            return removed
+
+        offset = len(self.df)
+        X_new = rows[self.feature_cols].fillna(0).to_numpy(dtype=np.float32)
+        rows = self._encode(rows)
+        cols = self.df.columns.intersection(rows.columns)
+        rows = rows[cols].astype({c: self.df[c].dtype for c in cols})
+        self.df = pd.concat([self.df, rows], ignore_index=True)
+        self.X = np.vstack([self.X, X_new])
+        self.live = np.concatenate([self.live, np.ones(len(rows), dtype=bool)])
+
+        t = self._code("TrainNo", train_no)
+        positions = np.arange(offset, offset + len(rows), dtype=np.int64)
+        trains = np.full(len(rows), t, dtype=np.int64)
+        for table, col in ((self.by_station, "Station"), (self.by_name, "Station_Name")):
+            if col in self.df.columns:
+                codes = self._codes(col)[offset:]
+                ok = codes >= 0
+                table.merge(_pack(trains[ok], codes[ok]), positions[ok])
+        self.train_start[t] = offset
+        self.train_len[t] = len(rows)
+        self.train_sum[t] = X_new.sum(axis=0, dtype=np.float64)
+
+        sums, counts = self._station_sums(self._codes("Station")[offset:], X_new, len(self.station_count))
+        self.station_sum += sums
+        self.station_count += counts
+        self.global_sum = self.global_sum + X_new.sum(axis=0, dtype=np.float64)
+        self.global_count += len(rows)
+        self.global_mean = self._global_mean()
+
+        # New stations (or new names for known ones) need a fresh resolver
+        names = (self.values("Station_Name", positions) if "Station_Name" in self.df.columns
+                 else np.full(len(rows), None))
+        if not all(self.stations.knows(c, n)
+                   for c, n in zip(self.values("Station", positions), names) if c is not None):
+            self.stations = self._station_resolver()
+        return removed
+
+    def live_frame(self) -> pd.DataFrame:
+        """The dataset as it stands after upserts/removals."""
+        if self.live.all():
+            return self.df
+        return self.df[self.live].reset_index(drop=True)
+
+    def live_X(self) -> np.ndarray:
+        """Feature rows of live_frame(), in the same order."""
+        return self.X if self.live.all() else self.X[self.live]
@@ -0,0 +1,59 @@
+# dataset_refresh.py
+"""
+Add, replace or remove single trains in the live dataset without a full
+re-ingest and retrain.
+
+    python dataset_refresh.py upsert 12951.csv [more.csv | routes.zip ...]
+    python dataset_refresh.py remove 12951 [12952 ...]
+    python dataset_refresh.py refit
+
+The route folder/archives (RAILOPTIMUS_CSV_FOLDER) stay the source of truth.
+A route upserted from a file outside them is pinned in the dataset cache's
+manifest: later loads keep its rows (they cannot re-read the file) until a
+route for the same train in the folder changes, which then replaces them.
+Copy the file into the folder to make it part of full re-ingests.
+"""
+import argparse
+
+from ingest import iter_sources, read_route, train_no_of
+from supervised_model import DelayPredictor, REFIT_THRESHOLD
+
+
+def _report(result: dict):
+    line = (f"{result['train']}: -{result['rows_removed']} +{result['rows_added']} rows, "
+            f"drift {result['drift']:.1%}")
+    if result["refit"]:
+        line += f", refit ({result['refit']})"
+    print(line)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Incremental route dataset refresh")
+    parser.add_argument("--threshold", type=float, default=REFIT_THRESHOLD,
+                        help="refit once this fraction of rows changed (default %(default)s)")
+    parser.add_argument("--no-refit", action="store_true", help="only update the dataset")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p_up = sub.add_parser("upsert", help="add or replace trains from route CSVs / ZIPs")
+    p_up.add_argument("paths", nargs="+")
+    p_rm = sub.add_parser("remove", help="remove trains by number")
+    p_rm.add_argument("trains", nargs="+")
+    sub.add_parser("refit", help="refit now if drift exceeds the threshold")
+    args = parser.parse_args(argv)
+
+    predictor = DelayPredictor().load()
+
+    if args.cmd == "upsert":
+        for src in iter_sources(args.paths):
+            result = predictor.upsert_train(train_no_of(src), read_route(src), refit=False, source=src)
+            _report(result)
+    elif args.cmd == "remove":
+        for train_no in args.trains:
+            _report(predictor.remove_train(train_no, refit=False))
+
+    if not args.no_refit:
+        how = predictor.refit_if_drifted(threshold=args.threshold)
+        print(f"Drift {predictor.drift():.1%}: " + (f"refit ({how})" if how else "no refit needed"))
+
+
+if __name__ == "__main__":
+    main()
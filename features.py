@@ -0,0 +1,145 @@
+# features.py
+"""
+Feature engineering on the route dataset.
+
+Each route CSV is an ordered stop list, and delay builds up along it. On top
+of the four percentage columns this adds, per row and with vectorized
+groupby operations only:
+
+    stop_index, n_stops, route_frac      position along the route
+    prev_*                               the previous stop's values (lag 1)
+    upstream_mean_delay, upstream_max_delay, upstream_on_time
+                                         everything before this stop
+    station_te, station_trains           target-encoded station statistics
+
+Serving looks the precomputed rows up through DatasetIndex, so inference
+costs O(1) per row. The feature frame is cached next to the dataset cache and
+reused while the dataset is unchanged.
+
+Weather and speed are not features: the route data carries no history of
+either, so the model cannot learn from them. They stay inputs to the RL policy.
+"""
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+FEATURE_VERSION = 1
+
+BASE_FEATURES = ["p_on_time", "p_slight", "p_significant", "p_cancelled"]
+TARGET = "avg_delay"
+
+ROUTE_FEATURES = [
+    "stop_index", "n_stops", "route_frac",
+    "prev_avg_delay", "prev_p_on_time", "prev_p_significant",
+    "upstream_mean_delay", "upstream_max_delay", "upstream_on_time",
+    "station_te", "station_trains",
+]
+
+ALL_FEATURES = BASE_FEATURES + ROUTE_FEATURES
+
+# Route features pooled across trains: they depend on which trains are in
+# the dataset, so train_model.py refits them inside every CV fold
+STATION_FEATURES = ["station_te", "station_trains"]
+
+# Pseudo-count pulling rarely served stations toward the global mean
+TE_SMOOTHING = 5.0
+
+
+def station_stats(df: pd.DataFrame) -> pd.DataFrame:
+    """Per-station sum and count of the target, plus distinct trains served."""
+    stations = df["Station"].to_numpy()
+    y = df[TARGET].astype(float).fillna(0).to_numpy()
+    grouped = pd.DataFrame({"y": y, "train": df["TrainNo"].to_numpy()}).groupby(stations, sort=False)
+    return pd.DataFrame({
+        "sum": grouped["y"].sum(),
+        "count": grouped["y"].size(),
+        "trains": grouped["train"].nunique(),
+    })
+
+
+def add_features(df: pd.DataFrame, stats: Optional[pd.DataFrame] = None) -> pd.DataFrame:
+    """
+    Return a copy of df with ROUTE_FEATURES added. Rows must be in route
+    order within each train (as ingest produces them).
+
+    Station target encoding is leave-one-out when `stats` is None (computed
+    from df itself, so a row never sees its own target). Pass the stats of the
+    existing dataset when featurizing new rows for an incremental upsert.
+    """
+    out = df.copy()
+    trains = out["TrainNo"].to_numpy()
+    y = out[TARGET].astype(float).fillna(0).to_numpy()
+    on_time = out["p_on_time"].astype(float).fillna(0).to_numpy()
+    frame = pd.DataFrame({"y": y, "on_time": on_time,
+                          "p_sig": out["p_significant"].astype(float).fillna(0).to_numpy()})
+    g = frame.groupby(trains, sort=False)
+
+    # Position along the route
+    stop_index = g.cumcount().to_numpy()
+    n_stops = g["y"].transform("size").to_numpy()
+    out["stop_index"] = stop_index.astype(float)
+    out["n_stops"] = n_stops.astype(float)
+    out["route_frac"] = np.where(n_stops > 1, stop_index / np.maximum(n_stops - 1, 1), 0.0)
+
+    # Lag 1 and everything upstream (0 at the origin)
+    prev = g.shift(1)
+    out["prev_avg_delay"] = prev["y"].fillna(0).to_numpy()
+    out["prev_p_on_time"] = prev["on_time"].fillna(0).to_numpy()
+    out["prev_p_significant"] = prev["p_sig"].fillna(0).to_numpy()
+    upstream_n = np.maximum(stop_index, 1)
+    out["upstream_mean_delay"] = (g["y"].cumsum().to_numpy() - y) / upstream_n
+    out["upstream_on_time"] = (g["on_time"].cumsum().to_numpy() - on_time) / upstream_n
+    out["upstream_max_delay"] = g["y"].cummax().groupby(trains, sort=False).shift(1).fillna(0).to_numpy()
+
+    out["station_te"], out["station_trains"] = station_features(out, stats)
+    # Stored at the precision the model predicts in
+    out[ROUTE_FEATURES] = out[ROUTE_FEATURES].astype(np.float32)
+    return out
+
+
+def station_features(df: pd.DataFrame, stats: Optional[pd.DataFrame] = None):
+    """
+    (station_te, station_trains) for the rows of df: the smoothed station
+    mean of the target and the number of trains serving the station.
+    Leave-one-out over df itself when `stats` is None, else looked up in
+    `stats` (station_stats of other rows).
+    """
+    y = df[TARGET].astype(float).fillna(0).to_numpy()
+    loo = stats is None
+    if loo:
+        stats = station_stats(df)
+    prior = stats["sum"].sum() / max(stats["count"].sum(), 1)
+    idx = stats.index.get_indexer(df["Station"].to_numpy())
+    found = idx >= 0
+    st_sum = np.where(found, stats["sum"].to_numpy()[idx], 0.0)
+    st_count = np.where(found, stats["count"].to_numpy()[idx], 0)
+    if loo:
+        st_sum, st_count = st_sum - y, st_count - 1
+    te = (st_sum + TE_SMOOTHING * prior) / (st_count + TE_SMOOTHING)
+    return te, np.where(found, stats["trains"].to_numpy()[idx], 0).astype(float)
+
+
+# ------------------------
+# Cache
+# ------------------------
+def load_features(df: pd.DataFrame, cache_file: Optional[str] = None, key: Optional[str] = None) -> pd.DataFrame:
+    """
+    add_features(df), reusing `cache_file` when it was built from the same
+    dataset (dataset_cache.dataset_key, or `key` if given) and FEATURE_VERSION.
+    """
+    from dataset_cache import dataset_key, read_derived, write_derived
+
+    if cache_file is None:
+        return add_features(df)
+    key = f"v{FEATURE_VERSION}:{key or dataset_key(df)}"
+    cached = read_derived(cache_file, key)
+    if cached is not None and len(cached) == len(df):
+        out = df.copy()
+        for col in ROUTE_FEATURES:
+            out[col] = cached[col].to_numpy()
+        return out
+
+    out = add_features(df)
+    write_derived(out[ROUTE_FEATURES], cache_file, key)
+    return out
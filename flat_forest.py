@@ -0,0 +1,185 @@
+# flat_forest.py
+"""
+Flattened, NumPy-only copy of a fitted sklearn forest/tree regressor.
+
+All trees are concatenated into contiguous node arrays (feature, threshold,
+left, right, value) with child indices made absolute, and saved as plain
+.npy files so they can be memory-mapped. Prediction walks every row through
+every tree at once, one depth level per step.
+
+    python flat_forest.py delay_model.pkl delay_model.flat
+"""
+import json
+import os
+import sys
+
+import numpy as np
+
+ARRAYS = ["feature", "threshold", "left", "right", "value", "roots"]
+FORMAT_VERSION = 1
+
+
+def source_signature(path: str) -> dict:
+    st = os.stat(path)
+    return {"size": st.st_size, "mtime": st.st_mtime_ns}
+
+
+class FlatForest:
+    def __init__(self, feature, threshold, left, right, value, roots, max_depth: int,
+                 n_features: int, meta: dict = None):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.value = value
+        self.roots = roots
+        self.max_depth = int(max_depth)
+        self.n_features = int(n_features)
+        self.n_estimators = len(roots)
+        self.meta = meta or {}
+
+    @classmethod
+    def from_model(cls, model) -> "FlatForest":
+        trees = getattr(model, "estimators_", None) or [model]
+        feature, threshold, left, right, value, roots = [], [], [], [], [], []
+        offset = 0
+        max_depth = 0
+        for est in trees:
+            t = est.tree_
+            n = t.node_count
+            idx = np.arange(offset, offset + n, dtype=np.int32)
+            leaf = t.children_left < 0
+            # Leaves point at themselves so extra steps are no-ops
+            feature.append(np.where(leaf, 0, t.feature).astype(np.int32))
+            threshold.append(np.where(leaf, np.inf, t.threshold).astype(np.float64))
+            left.append(np.where(leaf, idx, t.children_left + offset).astype(np.int32))
+            right.append(np.where(leaf, idx, t.children_right + offset).astype(np.int32))
+            value.append(t.value[:, 0, 0].astype(np.float64))
+            roots.append(offset)
+            offset += n
+            max_depth = max(max_depth, t.max_depth)
+        return cls(
+            np.concatenate(feature), np.concatenate(threshold),
+            np.concatenate(left), np.concatenate(right),
+            np.concatenate(value), np.asarray(roots, dtype=np.int32),
+            max_depth, model.n_features_in_,
+        )
+
+    # ------------------------
+    # Persistence
+    # ------------------------
+    def save(self, out_dir: str, source: str = None):
+        os.makedirs(out_dir, exist_ok=True)
+        for name in ARRAYS:
+            np.save(os.path.join(out_dir, name + ".npy"), np.ascontiguousarray(getattr(self, name)))
+        meta = {
+            "version": FORMAT_VERSION,
+            "max_depth": self.max_depth,
+            "n_features": self.n_features,
+            "n_estimators": self.n_estimators,
+        }
+        if source:
+            meta["source"] = source_signature(source)
+        with open(os.path.join(out_dir, "meta.json"), "w", encoding="utf-8") as fh:
+            json.dump(meta, fh)
+        self.meta = meta
+
+    @classmethod
+    def load(cls, out_dir: str, mmap: bool = True) -> "FlatForest":
+        with open(os.path.join(out_dir, "meta.json"), "r", encoding="utf-8") as fh:
+            meta = json.load(fh)
+        if meta.get("version") != FORMAT_VERSION:
+            raise ValueError(f"Unsupported flat forest version in {out_dir}")
+        mode = "r" if mmap else None
+        arrays = {n: np.load(os.path.join(out_dir, n + ".npy"), mmap_mode=mode) for n in ARRAYS}
+        return cls(max_depth=meta["max_depth"], n_features=meta["n_features"], meta=meta, **arrays)
+
+    @staticmethod
+    def is_fresh(out_dir: str, source: str) -> bool:
+        """True if out_dir holds an export of the current `source` model file."""
+        try:
+            with open(os.path.join(out_dir, "meta.json"), "r", encoding="utf-8") as fh:
+                meta = json.load(fh)
+            return meta.get("version") == FORMAT_VERSION and meta.get("source") == source_signature(source)
+        except (OSError, ValueError):
+            return False
+
+    # ------------------------
+    # Evaluation
+    # ------------------------
+    def leaves(self, X) -> np.ndarray:
+        """Leaf node index reached by every row in every tree, shape (n_rows, n_trees)."""
+        # sklearn compares float32 inputs against float64 thresholds
+        X = np.asarray(X, dtype=np.float32).astype(np.float64)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        n_rows, n_trees = len(X), self.n_estimators
+        feature, threshold = np.asarray(self.feature), np.asarray(self.threshold)
+        left, right = np.asarray(self.left), np.asarray(self.right)
+
+        node = np.tile(np.asarray(self.roots), n_rows)
+        base = np.repeat(np.arange(n_rows) * X.shape[1], n_trees)
+        x = X.ravel()
+        # Only (row, tree) pairs not yet at a leaf are advanced each step
+        active = np.arange(len(node))
+        for _ in range(self.max_depth):
+            nd = node[active]
+            go_left = x[base[active] + feature[nd]] <= threshold[nd]
+            nxt = np.where(go_left, left[nd], right[nd])
+            node[active] = nxt
+            active = active[nxt != nd]
+            if not len(active):
+                break
+        return node.reshape(n_rows, n_trees)
+
+    def predict_trees(self, X) -> np.ndarray:
+        """Per-tree predictions, shape (n_rows, n_trees)."""
+        return self.value[self.leaves(X)]
+
+    def predict(self, X) -> np.ndarray:
+        return self.predict_trees(X).mean(axis=1)
+
+
+class LookupTable:
+    """
+    Fixed-size grid of forest predictions over bounded inputs (the model's
+    features are percentages in [0, 100]). Rows are snapped to the nearest
+    grid point, so results are approximate: use a finer step for accuracy,
+    a coarser one for a smaller table.
+    """
+
+    def __init__(self, table: np.ndarray, lo: float, step: float):
+        self.table = table
+        self.lo = float(lo)
+        self.step = float(step)
+        self.size = table.shape[0]
+
+    @classmethod
+    def build(cls, forest, n_features: int, lo: float = 0.0, hi: float = 100.0,
+              step: float = 5.0, chunk: int = 65536) -> "LookupTable":
+        axis = np.arange(lo, hi + step / 2, step)
+        size = len(axis)
+        grid = np.indices((size,) * n_features).reshape(n_features, -1).T
+        flat = np.empty(len(grid), dtype=np.float32)
+        for i in range(0, len(grid), chunk):
+            flat[i:i + chunk] = forest.predict(axis[grid[i:i + chunk]])
+        return cls(flat.reshape((size,) * n_features), lo, step)
+
+    def predict(self, X) -> np.ndarray:
+        X = np.atleast_2d(np.asarray(X, dtype=np.float64))
+        idx = np.clip(np.rint((X - self.lo) / self.step), 0, self.size - 1).astype(np.intp)
+        return self.table[tuple(idx.T)].astype(np.float64)
+
+
+def export_forest(model_file: str, out_dir: str = None) -> str:
+    """Flatten the pickled model in model_file into out_dir (default: <model>.flat)."""
+    import joblib
+
+    out_dir = out_dir or os.path.splitext(model_file)[0] + ".flat"
+    FlatForest.from_model(joblib.load(model_file)).save(out_dir, source=model_file)
+    return out_dir
+
+
+if __name__ == "__main__":
+    model_path = sys.argv[1] if len(sys.argv) > 1 else "delay_model.pkl"
+    print("Exported to", export_forest(model_path, sys.argv[2] if len(sys.argv) > 2 else None))
@@ -0,0 +1,426 @@
+# fleet_sim.py
+"""
+Offline fleet simulation: the predict -> weather -> RL decision loop for
+every train at once, over simulated days.
+
+    python fleet_sim.py --services 10000 --ticks 1000 --workers 4
+    python fleet_sim.py --policy schedule               # baseline: timetable speed
+    python fleet_sim.py --save-weather trace.csv        # keep the synthetic weather
+    python fleet_sim.py --weather trace.csv             # replay it
+
+The route data has stops and historical delays but no distances or
+timetables, so those are synthesized:
+- a service runs one route; each segment between stops gets a length drawn
+  from SEGMENT_KM and is scheduled at SCHEDULED_SPEED
+- fleet state (stop, position on the segment, speed, delay) is NumPy
+  arrays, and every tick advances all running services at once
+- the model's per-stop delays are predicted once per route (predict_routes,
+  or the agent's delay quantile via predict_interval_columns). Each tick the
+  delay expected at the next stop is that baseline plus the service's
+  current excess, carried with DELAY_RECOVERY
+- weather comes from a WeatherTrace (a synthetic Markov chain per zone, or
+  a replayed CSV); stations map to zones by hash
+- the policy turns (planned delay, visibility, speed, weather) into
+  decrease / maintain / increase; speed moves by SPEED_STEP within the cap
+  the weather allows
+- a service loses time running slower than schedule and follows the
+  route's historical delay profile between stops: gains are scaled by the
+  weather and by noise that depends only on (service, tick), so results do
+  not depend on the number of workers
+
+Services are sharded by route across forked worker processes. Each shard
+returns KPI sums, which are merged: on-time % at stops and at destination,
+total and mean delay, and the actions taken.
+"""
+import argparse
+import gc
+import json
+import multiprocessing
+import os
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import metrics
+from supervised_model import DELAY_RECOVERY, predictor, quantile_label
+
+TICK_MIN = 5.0
+SCHEDULED_SPEED = 60.0      # km/h the synthetic timetable assumes
+SEGMENT_KM = (20.0, 80.0)   # distance between consecutive stops
+SPEED_STEP = 10.0           # km/h per increase/decrease action
+MIN_SPEED = 20.0
+ON_TIME_MIN = 15.0          # "right time" in the route data is 0-15 min
+ZONES = 32
+DEPART_WINDOW_MIN = 360.0   # services depart spread over the first 6 hours
+
+# Per weather code (SimpleRLAgent.weather_map order)
+WEATHERS = ["clear", "clouds", "rain", "fog"]
+WEATHER_SPEED_CAP = np.array([130.0, 130.0, 100.0, 60.0])
+WEATHER_DELAY_FACTOR = np.array([1.0, 1.1, 1.3, 1.6])
+WEATHER_VISIBILITY = np.array([10.0, 8.0, 4.0, 1.0])  # typical km
+# Speed cap from visibility: VIS_SPEED_BASE + VIS_SPEED_PER_KM * km
+VIS_SPEED_BASE = 30.0
+VIS_SPEED_PER_KM = 20.0
+
+# Synthetic weather: per-tick transition probabilities between WEATHERS
+WEATHER_TRANSITIONS = np.array([
+    [0.970, 0.020, 0.008, 0.002],
+    [0.030, 0.940, 0.025, 0.005],
+    [0.010, 0.040, 0.940, 0.010],
+    [0.020, 0.020, 0.010, 0.950],
+])
+WEATHER_START = np.array([0.60, 0.25, 0.10, 0.05])
+
+ACTIONS = ["decrease", "maintain", "increase"]
+
+
+# ------------------------
+# Weather
+# ------------------------
+class WeatherTrace:
+    """Weather code and visibility (km) per tick and zone; replays cyclically past its end."""
+
+    def __init__(self, weather: np.ndarray, visibility: np.ndarray):
+        self.weather = np.asarray(weather, dtype=np.int8)
+        self.visibility = np.asarray(visibility, dtype=np.float32)
+        self.ticks, self.zones = self.weather.shape
+
+    @classmethod
+    def synthetic(cls, ticks: int, zones: int = ZONES, seed: int = 0) -> "WeatherTrace":
+        rng = np.random.default_rng(seed)
+        cumulative = WEATHER_TRANSITIONS.cumsum(axis=1)
+        weather = np.empty((ticks, zones), dtype=np.int8)
+        state = rng.choice(len(WEATHERS), size=zones, p=WEATHER_START)
+        for t in range(ticks):
+            weather[t] = state
+            state = (rng.random((zones, 1)) < cumulative[state]).argmax(axis=1)
+        visibility = WEATHER_VISIBILITY[weather] * rng.uniform(0.6, 1.0, size=weather.shape)
+        return cls(weather, np.clip(visibility, 0.1, 10.0))
+
+    @classmethod
+    def load(cls, path: str) -> "WeatherTrace":
+        """CSV with tick, zone, weather (name or code) and visibility columns."""
+        df = pd.read_csv(path)
+        codes = df["weather"]
+        if not pd.api.types.is_numeric_dtype(codes):
+            codes = codes.str.strip().str.lower().map({w: i for i, w in enumerate(WEATHERS)}).fillna(0)
+        ticks, zones = int(df["tick"].max()) + 1, int(df["zone"].max()) + 1
+        weather = np.zeros((ticks, zones), dtype=np.int8)
+        visibility = np.full((ticks, zones), WEATHER_VISIBILITY[0], dtype=np.float32)
+        weather[df["tick"], df["zone"]] = codes.astype(int)
+        visibility[df["tick"], df["zone"]] = df["visibility"].astype(float)
+        return cls(weather, visibility)
+
+    def save(self, path: str):
+        tick, zone = np.indices(self.weather.shape)
+        pd.DataFrame({
+            "tick": tick.ravel(), "zone": zone.ravel(),
+            "weather": np.asarray(WEATHERS)[self.weather.ravel()],
+            "visibility": self.visibility.ravel().round(2),
+        }).to_csv(path, index=False)
+
+    def at(self, tick: int, zones: np.ndarray):
+        t = tick % self.ticks
+        return self.weather[t, zones], self.visibility[t, zones]
+
+
+def station_zone(stations, zones: int) -> np.ndarray:
+    """Stable station -> weather zone mapping."""
+    codes = {s: zlib.crc32(str(s).encode("utf-8")) % zones for s in pd.unique(np.asarray(stations))}
+    return np.array([codes[s] for s in stations], dtype=np.int64)
+
+
+# ------------------------
+# Fleet
+# ------------------------
+class Fleet:
+    """
+    Static description of the simulated services: which route each runs and
+    when it departs, plus one row per route stop (predicted and planning
+    delay, weather zone, km to the next stop).
+    """
+
+    def __init__(self, route_of, depart_tick, stop_start, n_stops, pred, plan, zone, seg_km, trains):
+        self.route_of = route_of
+        self.depart_tick = depart_tick
+        self.stop_start = stop_start
+        self.n_stops = n_stops
+        self.pred = pred
+        self.plan = plan
+        self.zone = zone
+        self.seg_km = seg_km
+        self.trains = trains
+
+    def __len__(self):
+        return len(self.route_of)
+
+    @classmethod
+    def build(cls, services: int = None, seed: int = 0, zones: int = ZONES, tick_min: float = TICK_MIN,
+              depart_window: float = DEPART_WINDOW_MIN, quantile: float = None) -> "Fleet":
+        """
+        One service per train in the dataset, or `services` of them drawn
+        from its routes (with repeats when there are more services than routes).
+        """
+        predictor.ensure_loaded()
+        rng = np.random.default_rng(seed)
+        trains = pd.unique(predictor.df["TrainNo"].astype(str).to_numpy())
+        if services is None:
+            route_of = np.arange(len(trains))
+        else:
+            route_of = np.sort(rng.choice(len(trains), size=services, replace=services > len(trains)))
+            trains_used = np.unique(route_of)
+            trains, route_of = trains[trains_used], np.searchsorted(trains_used, route_of)
+
+        with metrics.timer("sim_predict"):
+            stops = predictor.predict_routes(list(trains))
+            pred = stops["predicted_delay"].to_numpy(dtype=float)
+            plan = pred
+            if quantile is not None:
+                out, _ = predictor.predict_interval_columns(
+                    stops["TrainNo"].to_numpy(dtype=object), stops["Station"].to_numpy(dtype=object),
+                    quantiles=(quantile,),
+                )
+                plan = out[quantile_label(quantile)]
+        n_stops = stops.groupby("TrainNo", sort=False).size().reindex(trains).to_numpy()
+        stop_start = np.concatenate([[0], np.cumsum(n_stops)[:-1]])
+        depart = rng.uniform(0, depart_window / tick_min, size=len(route_of)).astype(np.int64)
+        return cls(
+            route_of=route_of, depart_tick=depart, stop_start=stop_start, n_stops=n_stops,
+            pred=pred, plan=plan, zone=station_zone(stops["Station"].to_numpy(dtype=object), zones),
+            seg_km=rng.uniform(*SEGMENT_KM, size=len(stops)), trains=trains,
+        )
+
+
+# ------------------------
+# Policies
+# ------------------------
+def make_policy(name: str = "rl"):
+    """(planned_delay, visibility, speed, weather_codes) -> array of action names."""
+    if name == "rl":
+        from rl_agent import SimpleRLAgent
+        return SimpleRLAgent().get_actions
+    if name == "schedule":
+        # Baseline: get back to timetable speed whenever the weather allows
+        return lambda delays, visibility, speed, weather: np.where(
+            speed < SCHEDULED_SPEED, "increase", np.where(speed > SCHEDULED_SPEED, "decrease", "maintain"))
+    raise ValueError(f"Unknown policy: {name}")
+
+
+# ------------------------
+# Simulation
+# ------------------------
+_GOLDEN = np.uint64(0x9E3779B97F4A7C15)
+_MIX1 = np.uint64(0xBF58476D1CE4E5B9)
+_MIX2 = np.uint64(0x94D049BB133111EB)
+
+
+def _noise(services: np.ndarray, tick: int, seed: int) -> np.ndarray:
+    """Exponential(1) noise that depends only on (service, tick, seed) (splitmix64 hash)."""
+    z = (services.astype(np.uint64) << np.uint64(24)) ^ np.uint64(tick) ^ (np.uint64(seed) << np.uint64(48))
+    z = z * _GOLDEN
+    z = (z ^ (z >> np.uint64(30))) * _MIX1
+    z = (z ^ (z >> np.uint64(27))) * _MIX2
+    z ^= z >> np.uint64(31)
+    u = (z >> np.uint64(11)).astype(np.float64) * (1.0 / (1 << 53))
+    return -np.log1p(-u)
+
+
+def run_shard(fleet: Fleet, services: np.ndarray, trace: WeatherTrace, policy, ticks: int,
+              tick_min: float = TICK_MIN, seed: int = 0) -> dict:
+    """Simulate `services` (indices into fleet) for `ticks`; returns KPI sums."""
+    n = len(services)
+    route = fleet.route_of[services]
+    first = fleet.stop_start[route]
+    last = first + fleet.n_stops[route] - 1
+    depart = fleet.depart_tick[services]
+    cur = first.copy()              # stop table row of the last stop left
+    pos = np.zeros(n)               # km past it
+    speed = np.full(n, SCHEDULED_SPEED)
+    delay = np.zeros(n)
+    done = cur >= last              # single-stop routes have nowhere to go
+    sums = dict.fromkeys(["arrivals", "on_time_arrivals", "arrival_delay", "finished",
+                          "final_on_time", "final_delay", "running_delay", "speed_ticks",
+                          "speed_sum"], 0.0)
+    actions = dict.fromkeys(ACTIONS, 0)
+    hours = tick_min / 60.0
+
+    for t in range(ticks):
+        idx = np.flatnonzero((depart <= t) & ~done)
+        if not len(idx):
+            if done.all():
+                break
+            continue
+        with metrics.timer("sim_tick"):
+            c = cur[idx]
+            weather, visibility = trace.at(t, fleet.zone[c])
+
+            # Delay expected at the next stop: its baseline plus today's excess
+            planned = np.maximum(fleet.plan[c + 1] + (delay[idx] - fleet.pred[c]) * DELAY_RECOVERY, 0.0)
+            act = np.asarray(policy(planned, visibility, speed[idx], weather))
+            step = np.where(act == "increase", SPEED_STEP, np.where(act == "decrease", -SPEED_STEP, 0.0))
+            for a in ACTIONS:
+                actions[a] += int(np.count_nonzero(act == a))
+            cap = np.minimum(WEATHER_SPEED_CAP[weather], VIS_SPEED_BASE + VIS_SPEED_PER_KM * visibility)
+            v = np.clip(speed[idx] + step, MIN_SPEED, np.maximum(cap, MIN_SPEED))
+            speed[idx] = v
+            sums["speed_sum"] += float(v.sum())
+            sums["speed_ticks"] += len(idx)
+
+            # Time lost against the schedule, plus the route's historical
+            # delay change over the distance covered (gains scaled by the
+            # weather and noise, recoveries as recorded)
+            dist = v * hours
+            change = fleet.pred[c + 1] - fleet.pred[c]
+            change = (np.maximum(change, 0.0) * WEATHER_DELAY_FACTOR[weather] * _noise(services[idx], t, seed)
+                      + np.minimum(change, 0.0))
+            growth = change * np.minimum(dist / fleet.seg_km[c], 1.0)
+            delay[idx] = np.maximum(delay[idx] + tick_min * (1.0 - v / SCHEDULED_SPEED) + growth, 0.0)
+            pos[idx] += dist
+
+            # Arrivals (more than one stop per tick on short segments)
+            moving = idx
+            while len(moving):
+                arrived = moving[pos[moving] >= fleet.seg_km[cur[moving]]]
+                if not len(arrived):
+                    break
+                pos[arrived] -= fleet.seg_km[cur[arrived]]
+                cur[arrived] += 1
+                d = delay[arrived]
+                sums["arrivals"] += len(arrived)
+                sums["on_time_arrivals"] += int(np.count_nonzero(d <= ON_TIME_MIN))
+                sums["arrival_delay"] += float(d.sum())
+                end = cur[arrived] >= last[arrived]
+                finished = arrived[end]
+                done[finished] = True
+                sums["finished"] += len(finished)
+                sums["final_on_time"] += int(np.count_nonzero(delay[finished] <= ON_TIME_MIN))
+                sums["final_delay"] += float(delay[finished].sum())
+                moving = arrived[~end]
+
+    running = (depart < ticks) & ~done
+    sums["running"] = int(np.count_nonzero(running))
+    sums["running_delay"] = float(delay[running].sum())
+    sums["services"] = n
+    sums["departed"] = int(np.count_nonzero(depart < ticks))
+    sums["actions"] = actions
+    return sums
+
+
+def merge(parts) -> dict:
+    """Sum shard results."""
+    total = {}
+    for part in parts:
+        for k, v in part.items():
+            if isinstance(v, dict):
+                sub = total.setdefault(k, {})
+                for a, n in v.items():
+                    sub[a] = sub.get(a, 0) + n
+            else:
+                total[k] = total.get(k, 0) + v
+    return total
+
+
+def kpis(total: dict) -> dict:
+    def pct(a, b):
+        return round(100.0 * a / b, 2) if b else 0.0
+
+    def mean(a, b):
+        return round(a / b, 2) if b else 0.0
+
+    return {
+        "services": int(total["services"]),
+        "departed": int(total["departed"]),
+        "finished": int(total["finished"]),
+        "running": int(total["running"]),
+        "stop_arrivals": int(total["arrivals"]),
+        "on_time_pct": pct(total["on_time_arrivals"], total["arrivals"]),
+        "destination_on_time_pct": pct(total["final_on_time"], total["finished"]),
+        "total_delay_min": round(total["final_delay"] + total["running_delay"], 1),
+        "mean_arrival_delay_min": mean(total["arrival_delay"], total["arrivals"]),
+        "mean_final_delay_min": mean(total["final_delay"], total["finished"]),
+        "mean_speed_kmh": mean(total["speed_sum"], total["speed_ticks"]),
+        "actions": total["actions"],
+    }
+
+
+# Set in the parent before forking; workers read it instead of unpickling a copy
+_SHARED = {}
+
+
+def _run_shared(services: np.ndarray) -> dict:
+    s = _SHARED
+    return run_shard(s["fleet"], services, s["trace"], s["policy"], s["ticks"], s["tick_min"], s["seed"])
+
+
+def simulate(fleet: Fleet, trace: WeatherTrace, policy="rl", ticks: int = 1000, workers: int = 1,
+             tick_min: float = TICK_MIN, seed: int = 0) -> dict:
+    """
+    Run the whole fleet, sharded by route over `workers` processes.
+    Returns kpis() plus timing.
+    """
+    policy = make_policy(policy) if isinstance(policy, str) else policy
+    order = np.argsort(fleet.route_of, kind="stable")
+    shards = [s for s in np.array_split(order, max(workers, 1)) if len(s)]
+    start = time.perf_counter()
+    if workers <= 1 or "fork" not in multiprocessing.get_all_start_methods():
+        parts = [run_shard(fleet, s, trace, policy, ticks, tick_min, seed) for s in shards]
+    else:
+        _SHARED.update(fleet=fleet, trace=trace, policy=policy, ticks=ticks, tick_min=tick_min, seed=seed)
+        gc.freeze()
+        try:
+            with ProcessPoolExecutor(len(shards), mp_context=multiprocessing.get_context("fork")) as pool:
+                parts = list(pool.map(_run_shared, shards))
+        finally:
+            _SHARED.clear()
+    seconds = time.perf_counter() - start
+    result = kpis(merge(parts))
+    result.update(ticks=ticks, tick_min=tick_min, shards=len(shards), seconds=round(seconds, 3),
+                  service_ticks_per_s=round(len(fleet) * ticks / seconds, 1) if seconds else 0.0)
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Vectorized fleet simulation of the speed policy")
+    parser.add_argument("--services", type=int, default=None,
+                        help="services to simulate, drawn from the dataset's routes (default: one per train)")
+    parser.add_argument("--ticks", type=int, default=1000)
+    parser.add_argument("--tick-min", type=float, default=TICK_MIN, help="minutes per tick")
+    parser.add_argument("--workers", type=int, default=1, help="processes (0 = one per CPU)")
+    parser.add_argument("--policy", choices=["rl", "schedule"], default="rl")
+    parser.add_argument("--quantile", type=float, default=None,
+                        help="plan on this delay quantile (default: the agent's delay_quantile, else the mean)")
+    parser.add_argument("--weather", default=None, help="weather trace CSV to replay (default: synthetic)")
+    parser.add_argument("--save-weather", default=None, help="write the weather trace used to this CSV")
+    parser.add_argument("--zones", type=int, default=ZONES)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default=None, help="also write the KPIs as JSON")
+    args = parser.parse_args(argv)
+
+    quantile = args.quantile
+    if quantile is None and args.policy == "rl":
+        from rl_agent import RL_DELAY_QUANTILE
+        quantile = RL_DELAY_QUANTILE
+    trace = (WeatherTrace.load(args.weather) if args.weather
+             else WeatherTrace.synthetic(args.ticks, args.zones, args.seed))
+    if args.save_weather:
+        trace.save(args.save_weather)
+    fleet = Fleet.build(args.services, args.seed, trace.zones, args.tick_min, quantile=quantile)
+    result = simulate(fleet, trace, args.policy, args.ticks, args.workers or os.cpu_count() or 1,
+                      args.tick_min, args.seed)
+    result.update(policy=args.policy, quantile=quantile, seed=args.seed)
+
+    print(f"[fleet_sim] {result['services']:,} services x {args.ticks:,} ticks "
+          f"in {result['seconds']:.1f}s ({result['service_ticks_per_s']:,.0f} service-ticks/s)")
+    print(f"[fleet_sim] on-time {result['on_time_pct']:.1f}% at stops, "
+          f"{result['destination_on_time_pct']:.1f}% at destination; "
+          f"total delay {result['total_delay_min']:,.0f} min; actions {result['actions']}")
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as fh:
+            json.dump(result, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
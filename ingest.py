@@ -0,0 +1,205 @@
+# ingest.py
+import glob, os
+import io
+import re
+import unicodedata
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+import pandas as pd
+
+try:
+    import pyarrow  # noqa: F401
+    CSV_ENGINE = "pyarrow"
+except ImportError:
+    CSV_ENGINE = "c"
+
+KEY_COLS = ["TrainNo", "Station", "Station_Name"]
+
+# Canonical column names, keyed by the normalized (ascii, lowercase) header
+COLUMN_MAP = {
+    "station": "Station",
+    "station_name": "Station_Name",
+    "average_delay(min)": "avg_delay",
+    "right time (0-15 min's)": "p_on_time",
+    "slight delay (15-60 min's)": "p_slight",
+    "significant delay (>1 hour)": "p_significant",
+    "cancelled/unknown": "p_cancelled",
+}
+
+DTYPES = {
+    "Station": str,
+    "Station_Name": str,
+    "avg_delay": "float64",
+    "p_on_time": "float64",
+    "p_slight": "float64",
+    "p_significant": "float64",
+    "p_cancelled": "float64",
+}
+
+# Files per worker task; small enough to balance, large enough to amortize IPC
+BATCH_SIZE = 64
+
+_PUNCT = str.maketrans({
+    "\u2010": "-", "\u2011": "-", "\u2012": "-", "\u2013": "-",
+    "\u2014": "-", "\u2015": "-", "\u2212": "-",
+    "\u2018": "'", "\u2019": "'", "\u201b": "'", "\u2032": "'", "`": "'",
+    "\ufeff": "",
+})
+
+# A source is (path, member): member is None for plain files, else the name inside a ZIP
+Source = Tuple[str, Optional[str]]
+
+
+def normalize_header(col: str) -> str:
+    """Map a raw CSV header (en-dashes, curly quotes, stray spaces) to its canonical name."""
+    s = unicodedata.normalize("NFKC", str(col)).translate(_PUNCT)
+    s = re.sub(r"\s+", " ", s).strip()
+    return COLUMN_MAP.get(s.lower(), s)
+
+
+# ------------------------
+# Discovering route files
+# ------------------------
+def iter_sources(paths) -> Iterator[Source]:
+    """
+    Yield route CSV sources from directories, ZIP archives or single CSV files.
+    `paths` may be one path, a list, or an os.pathsep separated string.
+    """
+    if isinstance(paths, str):
+        paths = [p for p in paths.split(os.pathsep) if p]
+    for path in paths:
+        if os.path.isdir(path):
+            for f in sorted(glob.glob(os.path.join(path, "*.csv"))):
+                yield f, None
+            for z in sorted(glob.glob(os.path.join(path, "*.zip"))):
+                yield from _zip_members(z)
+        elif zipfile.is_zipfile(path):
+            yield from _zip_members(path)
+        elif os.path.isfile(path):
+            yield path, None
+
+
+def _zip_members(path: str) -> Iterator[Source]:
+    with zipfile.ZipFile(path) as zf:
+        for name in sorted(zf.namelist()):
+            if name.lower().endswith(".csv") and not name.startswith("__MACOSX"):
+                yield path, name
+
+
+def train_no_of(source: Source) -> str:
+    path, member = source
+    name = member if member is not None else path
+    return os.path.splitext(os.path.basename(name))[0].strip().upper()
+
+
+# ------------------------
+# Parsing
+# ------------------------
+def _parse(raw: bytes) -> pd.DataFrame:
+    first, _, _ = raw.partition(b"\n")
+    header = first.decode("utf-8-sig", errors="replace").rstrip("\r").split(",")
+    names = [normalize_header(c) for c in header]
+    dtype = {c: DTYPES[c] for c in names if c in DTYPES}
+    return pd.read_csv(
+        io.BytesIO(raw), engine=CSV_ENGINE, header=0, names=names, dtype=dtype,
+    )
+
+
+def _frame(raw: bytes, source: Source) -> pd.DataFrame:
+    tmp = _parse(raw)
+    tmp["TrainNo"] = train_no_of(source)
+    return tmp
+
+
+def read_route(source: Source) -> pd.DataFrame:
+    """Read a single route CSV (file or ZIP member) into a DataFrame with canonical columns."""
+    path, member = source
+    if member is None:
+        with open(path, "rb") as fh:
+            return _frame(fh.read(), source)
+    with zipfile.ZipFile(path) as zf:
+        return _frame(zf.read(member), source)
+
+
+def _normalize_keys(df: pd.DataFrame) -> pd.DataFrame:
+    for col in KEY_COLS:
+        if col in df.columns:
+            df[col] = df[col].astype(str).str.strip().str.upper()
+    return df
+
+
+def _read_batch(sources: List[Source]) -> pd.DataFrame:
+    # Group ZIP members so each archive is opened once per batch
+    frames = []
+    open_zips = {}
+    try:
+        for path, member in sources:
+            if member is None:
+                frames.append(read_route((path, None)))
+                continue
+            zf = open_zips.get(path)
+            if zf is None:
+                zf = open_zips[path] = zipfile.ZipFile(path)
+            frames.append(_frame(zf.read(member), (path, member)))
+    finally:
+        for zf in open_zips.values():
+            zf.close()
+    if not frames:
+        return pd.DataFrame()
+    return _normalize_keys(pd.concat(frames, ignore_index=True))
+
+
+def unique_by_train(sources: Iterable[Source]) -> List[Source]:
+    # The same train can ship in several archives; the first source wins
+    seen = set()
+    out = []
+    for src in sources:
+        tn = train_no_of(src)
+        if tn not in seen:
+            seen.add(tn)
+            out.append(src)
+    return out
+
+
+def iter_frames(sources: List[Source], workers: int = None,
+                batch_size: int = BATCH_SIZE) -> Iterator[pd.DataFrame]:
+    """
+    Stream route data for the given sources as DataFrames, one per batch of
+    files, parsed on a process pool. Small inputs are parsed in-process.
+    """
+    batches = [sources[i:i + batch_size] for i in range(0, len(sources), batch_size)]
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = min(workers, len(batches))
+
+    if workers <= 1:
+        for b in batches:
+            yield _read_batch(b)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        yield from pool.map(_read_batch, batches)
+
+
+def iter_route_frames(paths, workers: int = None, batch_size: int = BATCH_SIZE) -> Iterator[pd.DataFrame]:
+    """Stream every route CSV under `paths` (one train per file, first source wins)."""
+    sources = unique_by_train(iter_sources(paths))
+    return iter_frames(sources, workers, batch_size)
+
+
+def load_sources(sources: List[Source], workers: int = None) -> pd.DataFrame:
+    """Read the given sources into one DataFrame with canonical columns."""
+    frames = [f for f in iter_frames(sources, workers) if not f.empty]
+    if not frames:
+        return pd.DataFrame(columns=list(DTYPES) + ["TrainNo"])
+    return pd.concat(frames, ignore_index=True)
+
+
+def load_routes(paths, workers: int = None) -> pd.DataFrame:
+    """Read every route CSV under `paths` into one DataFrame with canonical columns."""
+    frames = [f for f in iter_route_frames(paths, workers) if not f.empty]
+    if not frames:
+        raise SystemExit("❌ No CSV files found in: " + str(paths))
+    return pd.concat(frames, ignore_index=True)
@@ -1,10 +1,25 @@
+import queue
+import threading
 import tkinter as tk
-from tkinter import messagebox, scrolledtext
-from supervised_model import predict_delay, get_train_station_row
+from concurrent.futures import ThreadPoolExecutor
+from tkinter import messagebox, scrolledtext, ttk
+import metrics
+from supervised_model import QUANTILES, predictor, quantile_label
+from prediction_cache import CachedAgent, CachedPredictor
+from station_resolver import MIN_SCORE
 from weather_api import get_weather
 from rl_agent import SimpleRLAgent
 
-agent = SimpleRLAgent()
+# Repeated train/station lookups and RL states are served from memory
+cached_predictor = CachedPredictor(predictor)
+_agent = None
+
+def get_agent() -> CachedAgent:
+    """RL agent is built on first use so importing this module stays cheap."""
+    global _agent
+    if _agent is None:
+        _agent = CachedAgent(SimpleRLAgent())
+    return _agent
 
 # ------------------------
 # Helpers
@@ -52,7 +67,107 @@ def parse_speeds(speed_field: str, num_trains: int):
     return tokens[:num_trains]
 
 # ------------------------
-# Predict button
+# Decision pipeline (runs off the Tk thread)
+# ------------------------
+# One batch orchestrator at a time; weather lookups for a batch run concurrently
+_batch_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="decide")
+_weather_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="weather-job")
+_results = queue.Queue()
+_job = {"id": 0, "cancel": threading.Event()}
+
+def format_decision(train_no, station_code, city, speed, weather, predicted_delay, interval=None):
+    """
+    Text block for one train, as shown in the output box. `interval` is the
+    train's predict_intervals row (delay, std, pNN...), if available.
+    """
+    lines = []
+    # Validate speed
+    if speed < 0:
+        lines.append(f"⚠️ Invalid speed for {train_no}, using default 80 km/h")
+        speed = 80.0
+
+    weather_desc, visibility_km, ok = weather
+    header = f"Train: {train_no}    City: {city}    Weather: {weather_desc}    Visibility: {visibility_km:.2f} km"
+    if not ok:
+        header += "   (weather fallback)"
+    lines.append(header)
+
+    try:
+        row = cached_predictor.get_train_station_row(train_no, station_code) if station_code else None
+
+        agent = get_agent()
+        planned = agent.planning_delay(interval) if interval else predicted_delay
+        action = agent.get_action(planned, visibility_km, speed, weather_desc)
+
+        band = ""
+        if interval:
+            band = "  (" + ", ".join(f"{quantile_label(q)} {interval[quantile_label(q)]:.2f}"
+                                     for q in QUANTILES) + ")"
+        lines.append(f"  Predicted Delay: {predicted_delay:.2f} mins{band}")
+        if row:
+            info = []
+            for key in ["p_on_time", "p_slight", "p_significant", "p_cancelled"]:
+                if key in row:
+                    info.append(f"{key}={row.get(key)}")
+            if info:
+                lines.append("  Probabilities: " + ", ".join(info))
+        lines.append(f"  Current Speed: {speed:.1f} km/h")
+        lines.append(f"  Action (RL): {action}")
+    except Exception as e:
+        lines.append(f"⚠️ Error for {train_no}:{station_code} -> {e}")
+    lines.append("-"*70)
+    return "\n".join(lines) + "\n"
+
+def run_batch(job_id, cancel, pairs, cities, speeds, station_name):
+    """Worker: score all pairs, then stream one text block per train into _results."""
+    with metrics.timer("decide_batch"):
+        total = len(pairs)
+        # Fetch every city's weather concurrently (the client coalesces duplicates)
+        weather_futs = [_weather_pool.submit(get_weather, c) for c in cities]
+        try:
+            # A free-text station name stands in for a missing code as its best match
+            if station_name and not all(st for _, st in pairs):
+                hits = cached_predictor.resolve_station(station_name, 1)
+                code = hits[0]["code"] if hits and hits[0]["score"] >= MIN_SCORE else ""
+                pairs = [(tr, st or code) for tr, st in pairs]
+
+            # Score every pair in one pass over the trees: mean, the
+            # QUANTILES band and the quantile the agent plans on
+            q = get_agent().delay_quantile
+            quantiles = QUANTILES + ((q,) if q is not None and q not in QUANTILES else ())
+            try:
+                intervals, _tiers = cached_predictor.predict_intervals(
+                    [(tr, st, station_name) for tr, st in pairs], quantiles)
+            except Exception as e:
+                _results.put((job_id, "text", f"⚠️ Prediction error -> {e}\n"))
+                return
+
+            for i, (train_no, station_code) in enumerate(pairs):
+                if cancel.is_set():
+                    _results.put((job_id, "text", f"⏹ Cancelled after {i} of {total} trains\n"))
+                    return
+                with metrics.timer("weather_wait"):
+                    weather = weather_futs[i].result()
+                interval = {k: float(v[i]) for k, v in intervals.items()}
+                block = format_decision(train_no, station_code, cities[i], speeds[i],
+                                        weather, interval["delay"], interval)
+                _results.put((job_id, "text", block))
+                _results.put((job_id, "progress", i + 1))
+        finally:
+            for f in weather_futs:
+                f.cancel()
+            _results.put((job_id, "done", total))
+
+def start_batch(pairs, cities, speeds, station_name):
+    """Cancel any running batch and start a new one; returns its job id."""
+    _job["cancel"].set()
+    _job["id"] += 1
+    _job["cancel"] = threading.Event()
+    _batch_pool.submit(run_batch, _job["id"], _job["cancel"], pairs, cities, speeds, station_name)
+    return _job["id"]
+
+# ------------------------
+# Predict / Cancel buttons
 # ------------------------
 def on_predict():
     trains_raw = entry_train.get()
@@ -69,80 +184,94 @@ def on_predict():
 
     # Clear output
     txt_output.delete(1.0, tk.END)
+    progress.configure(maximum=len(pairs), value=0)
+    lbl_status.configure(text=f"0 / {len(pairs)}")
+    btn_cancel.configure(state=tk.NORMAL)
 
-    for i, (train_no, station_code) in enumerate(pairs):
-        city = cities[i]
-        speed = speeds[i]
+    start_batch(pairs, cities, speeds, station_name if station_name else None)
 
-        # Validate speed
-        if speed < 0:
-            txt_output.insert(tk.END, f"⚠️ Invalid speed for {train_no}, using default 80 km/h\n")
-            speed = 80.0
+def on_cancel():
+    _job["cancel"].set()
 
-        weather_desc, visibility_km, ok = get_weather(city)
-        header = f"Train: {train_no}    City: {city}    Weather: {weather_desc}    Visibility: {visibility_km:.2f} km"
-        if not ok:
-            header += "   (weather fallback)"
-        txt_output.insert(tk.END, header + "\n")
+def on_name_typed(event=None):
+    """Show the best station matches for the name field while typing (once the data is loaded)."""
+    text = entry_name.get().strip()
+    if not text or not predictor.loaded:
+        lbl_name_hint.configure(text="")
+        return
+    hits = cached_predictor.resolve_station(text, 3)
+    lbl_name_hint.configure(text="→ " + ", ".join(f"{h['code']} ({h['name'] or '?'})" for h in hits)
+                            if hits else "no matching station")
 
-        try:
-            if not station_code:
-                predicted_delay = predict_delay(train_no, "", station_name if station_name else None)
-            else:
-                predicted_delay = predict_delay(train_no, station_code, station_name if station_name else None)
-
-            row = get_train_station_row(train_no, station_code) if station_code else None
-
-            action = agent.get_action(predicted_delay, visibility_km, speed, weather_desc)
-
-            txt_output.insert(tk.END, f"  Predicted Delay: {predicted_delay:.2f} mins\n")
-            if row:
-                info = []
-                for key in ["p_on_time", "p_slight", "p_significant", "p_cancelled"]:
-                    if key in row:
-                        info.append(f"{key}={row.get(key)}")
-                if info:
-                    txt_output.insert(tk.END, "  Probabilities: " + ", ".join(info) + "\n")
-            txt_output.insert(tk.END, f"  Current Speed: {speed:.1f} km/h\n")
-            txt_output.insert(tk.END, f"  Action (RL): {action}\n")
-            txt_output.insert(tk.END, "-"*70 + "\n")
-        except Exception as e:
-            txt_output.insert(tk.END, f"⚠️ Error for {train_no}:{station_code} -> {e}\n")
-            txt_output.insert(tk.END, "-"*70 + "\n")
+def poll_results():
+    """Drain finished results into the output box; re-arms itself with root.after."""
+    try:
+        while True:
+            job_id, kind, payload = _results.get_nowait()
+            if job_id != _job["id"]:
+                continue  # from a batch that was replaced
+            if kind == "text":
+                txt_output.insert(tk.END, payload)
+                txt_output.see(tk.END)
+            elif kind == "progress":
+                progress.configure(value=payload)
+                lbl_status.configure(text=f"{payload} / {int(progress.cget('maximum'))}")
+            elif kind == "done":
+                btn_cancel.configure(state=tk.DISABLED)
+    except queue.Empty:
+        pass
+    root.after(50, poll_results)
 
 # ------------------------
 # GUI layout
 # ------------------------
-root = tk.Tk()
-root.title("Train Delay Predictor + Decision System")
+if __name__ == "__main__":
+    # Load dataset + model on the batch thread right away, so the first
+    # Predict (queued behind it) does not pay for it
+    _batch_pool.submit(predictor.ensure_loaded)
+
+    root = tk.Tk()
+    root.title("Train Delay Predictor + Decision System")
+
+    tk.Label(root, text="Train(s) [comma separated, e.g., 12951:NDLS,12952:MB]:").grid(row=0, column=0, sticky="e", padx=5, pady=4)
+    entry_train = tk.Entry(root, width=60)
+    entry_train.grid(row=0, column=1, padx=5, pady=4)
+    entry_train.insert(0, "12951:NDLS,12952:MB")
+
+    tk.Label(root, text="Station Code (optional):").grid(row=1, column=0, sticky="e", padx=5, pady=4)
+    entry_station = tk.Entry(root, width=25)
+    entry_station.grid(row=1, column=1, sticky="w", padx=5, pady=4)
 
-tk.Label(root, text="Train(s) [comma separated, e.g., 12951:NDLS,12952:MB]:").grid(row=0, column=0, sticky="e", padx=5, pady=4)
-entry_train = tk.Entry(root, width=60)
-entry_train.grid(row=0, column=1, padx=5, pady=4)
-entry_train.insert(0, "12951:NDLS,12952:MB")
+    tk.Label(root, text="Station Name (optional):").grid(row=2, column=0, sticky="e", padx=5, pady=4)
+    entry_name = tk.Entry(root, width=50)
+    entry_name.grid(row=2, column=1, padx=5, pady=4)
+    entry_name.bind("<KeyRelease>", on_name_typed)
+    lbl_name_hint = tk.Label(root, text="", fg="gray")
+    lbl_name_hint.grid(row=2, column=2, sticky="w", padx=5, pady=4)
 
-tk.Label(root, text="Station Code (optional):").grid(row=1, column=0, sticky="e", padx=5, pady=4)
-entry_station = tk.Entry(root, width=25)
-entry_station.grid(row=1, column=1, sticky="w", padx=5, pady=4)
+    tk.Label(root, text="City(s) for weather [comma separated, optional]:").grid(row=3, column=0, sticky="e", padx=5, pady=4)
+    entry_city = tk.Entry(root, width=50)
+    entry_city.grid(row=3, column=1, padx=5, pady=4)
+    entry_city.insert(0, "Delhi,Mumbai")
 
-tk.Label(root, text="Station Name (optional):").grid(row=2, column=0, sticky="e", padx=5, pady=4)
-entry_name = tk.Entry(root, width=50)
-entry_name.grid(row=2, column=1, padx=5, pady=4)
+    tk.Label(root, text="Speed(s) [km/h, comma separated, optional]:").grid(row=4, column=0, sticky="e", padx=5, pady=4)
+    entry_speed = tk.Entry(root, width=25)
+    entry_speed.grid(row=4, column=1, sticky="w", padx=5, pady=4)
+    entry_speed.insert(0, "80,60")
 
-tk.Label(root, text="City(s) for weather [comma separated, optional]:").grid(row=3, column=0, sticky="e", padx=5, pady=4)
-entry_city = tk.Entry(root, width=50)
-entry_city.grid(row=3, column=1, padx=5, pady=4)
-entry_city.insert(0, "Delhi,Mumbai")
+    btn_predict = tk.Button(root, text="Predict & Decide", command=on_predict)
+    btn_predict.grid(row=5, column=0, sticky="e", padx=5, pady=8)
+    btn_cancel = tk.Button(root, text="Cancel", command=on_cancel, state=tk.DISABLED)
+    btn_cancel.grid(row=5, column=1, sticky="w", padx=5, pady=8)
 
-tk.Label(root, text="Speed(s) [km/h, comma separated, optional]:").grid(row=4, column=0, sticky="e", padx=5, pady=4)
-entry_speed = tk.Entry(root, width=25)
-entry_speed.grid(row=4, column=1, sticky="w", padx=5, pady=4)
-entry_speed.insert(0, "80,60")
+    txt_output = scrolledtext.ScrolledText(root, width=85, height=22)
+    txt_output.grid(row=6, column=0, columnspan=2, padx=8, pady=8)
 
-btn_predict = tk.Button(root, text="Predict & Decide", command=on_predict)
-btn_predict.grid(row=5, column=0, columnspan=2, pady=8)
+    progress = ttk.Progressbar(root, length=400, mode="determinate")
+    progress.grid(row=7, column=0, columnspan=2, sticky="w", padx=8, pady=4)
+    lbl_status = tk.Label(root, text="")
+    lbl_status.grid(row=7, column=1, sticky="e", padx=8, pady=4)
 
-txt_output = scrolledtext.ScrolledText(root, width=85, height=22)
-txt_output.grid(row=6, column=0, columnspan=2, padx=8, pady=8)
+    root.after(50, poll_results)
 
-root.mainloop()
+    root.mainloop()
@@ -0,0 +1,264 @@
+# metrics.py
+"""
+Lightweight in-process metrics: stage latency histograms and counters,
+exported as Prometheus text or JSON.
+
+    RAILOPTIMUS_METRICS=1               turn collection on
+    RAILOPTIMUS_METRICS_FILE=out.prom   also write everything at exit
+                                        (.json -> JSON, anything else -> Prometheus)
+    RAILOPTIMUS_PROFILE=out.prof        cProfile every thread, pstats file at exit
+
+When collection is off, timer() hands back a shared no-op and hot call sites
+skip their bookkeeping behind `if metrics.ENABLED`, so the cost is a flag
+check. Objects that already count things (the LRU caches) are registered as
+collectors and read only when metrics are rendered.
+"""
+import atexit
+import bisect
+import json
+import os
+import threading
+import time
+import weakref
+
+_TRUE = ("1", "true", "yes", "on")
+
+ENABLED = os.environ.get("RAILOPTIMUS_METRICS", "").strip().lower() in _TRUE
+METRICS_FILE = os.environ.get("RAILOPTIMUS_METRICS_FILE")
+PROFILE_FILE = os.environ.get("RAILOPTIMUS_PROFILE")
+
+PREFIX = "railoptimus_"
+
+# Latency buckets in seconds (upper bounds; +Inf is implicit)
+BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+           0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+HELP = {
+    "stage_seconds": "Latency of pipeline stages",
+    "fallback_tier_total": "Predictions served per fallback tier",
+    "weather_requests_total": "Weather API calls by outcome",
+    "weather_fallback_total": "Weather answers served from DEFAULT_WEATHER",
+    "weather_stale_total": "Weather answers served stale from cache",
+    "cache_hits_total": "Cache hits",
+    "cache_misses_total": "Cache misses",
+    "cache_hit_ratio": "Cache hit ratio since start",
+    "cache_size": "Entries currently cached",
+}
+
+_lock = threading.Lock()
+_counters = {}     # (name, labels) -> float
+_histograms = {}   # (name, labels) -> [bucket counts..., +Inf count, sum]
+_collectors = weakref.WeakSet()
+
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+
+# ------------------------
+# Recording
+# ------------------------
+def enable(on: bool = True):
+    global ENABLED
+    ENABLED = on
+
+
+def inc(name: str, amount: float = 1, **labels):
+    if not ENABLED:
+        return
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + amount
+
+
+def count_values(name: str, label: str, values):
+    """inc(name, {label: v}) once per distinct value, e.g. the tiers of a batch."""
+    if not ENABLED:
+        return
+    tally = {}
+    for v in values:
+        tally[v] = tally.get(v, 0) + 1
+    with _lock:
+        for v, n in tally.items():
+            key = _key(name, {label: v})
+            _counters[key] = _counters.get(key, 0) + n
+
+
+def observe(name: str, value: float, **labels):
+    if not ENABLED:
+        return
+    key = _key(name, labels)
+    with _lock:
+        h = _histograms.get(key)
+        if h is None:
+            h = _histograms[key] = [0] * (len(BUCKETS) + 1) + [0.0]
+        h[bisect.bisect_left(BUCKETS, value)] += 1
+        h[-1] += value
+
+
+class _Timer:
+    __slots__ = ("stage", "start")
+
+    def __init__(self, stage):
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        observe("stage_seconds", time.perf_counter() - self.start, stage=self.stage)
+        return False
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+def timer(stage: str):
+    """`with metrics.timer("model"): ...` records the block in stage_seconds{stage=...}."""
+    return _Timer(stage) if ENABLED else _NULL_TIMER
+
+
+def register(obj):
+    """
+    Add an object whose collect_metrics() returns [(name, labels, value), ...]
+    at render time. Held weakly.
+    """
+    _collectors.add(obj)
+
+
+def reset():
+    with _lock:
+        _counters.clear()
+        _histograms.clear()
+
+
+# ------------------------
+# Export
+# ------------------------
+def _collected():
+    out = []
+    for obj in list(_collectors):
+        try:
+            out.extend(obj.collect_metrics())
+        except Exception:
+            continue
+    return out
+
+
+def snapshot() -> dict:
+    """All metrics as plain data (the JSON export)."""
+    with _lock:
+        counters = dict(_counters)
+        histograms = {k: list(v) for k, v in _histograms.items()}
+    out = {"counters": [], "gauges": [], "histograms": []}
+    for (name, labels), value in sorted(counters.items()):
+        out["counters"].append({"name": name, "labels": dict(labels), "value": value})
+    for name, labels, value in _collected():
+        kind = "counters" if name.endswith("_total") else "gauges"
+        out[kind].append({"name": name, "labels": labels, "value": value})
+    for (name, labels), h in sorted(histograms.items()):
+        counts, total = h[:-1], h[-1]
+        n = sum(counts)
+        out["histograms"].append({
+            "name": name, "labels": dict(labels), "count": n, "sum": total,
+            "mean": total / n if n else 0.0,
+            "buckets": {str(b): c for b, c in zip(list(BUCKETS) + ["+Inf"], counts)},
+        })
+    return out
+
+
+def _fmt_labels(labels: dict, extra: str = "") -> str:
+    parts = [f'{k}="{str(v)}"' for k, v in sorted(labels.items())]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def render_prometheus() -> str:
+    snap = snapshot()
+    lines = []
+    seen = set()
+
+    def head(name, kind):
+        if name not in seen:
+            seen.add(name)
+            if name in HELP:
+                lines.append(f"# HELP {PREFIX}{name} {HELP[name]}")
+            lines.append(f"# TYPE {PREFIX}{name} {kind}")
+
+    for kind, key in (("counter", "counters"), ("gauge", "gauges")):
+        for m in sorted(snap[key], key=lambda m: m["name"]):
+            head(m["name"], kind)
+            lines.append(f"{PREFIX}{m['name']}{_fmt_labels(m['labels'])} {m['value']}")
+    for m in snap["histograms"]:
+        head(m["name"], "histogram")
+        cumulative = 0
+        for bound, c in m["buckets"].items():
+            cumulative += c
+            le = 'le="%s"' % bound
+            lines.append(f"{PREFIX}{m['name']}_bucket{_fmt_labels(m['labels'], le)} {cumulative}")
+        lines.append(f"{PREFIX}{m['name']}_sum{_fmt_labels(m['labels'])} {m['sum']}")
+        lines.append(f"{PREFIX}{m['name']}_count{_fmt_labels(m['labels'])} {m['count']}")
+    return "\n".join(lines) + "\n"
+
+
+def render_json() -> str:
+    return json.dumps(snapshot(), indent=2)
+
+
+def write(path: str):
+    text = render_json() if path.endswith(".json") else render_prometheus()
+    with open(path, "w", encoding="utf-8") as fh:
+        fh.write(text)
+
+
+# ------------------------
+# Profiling hook
+# ------------------------
+_profiles = []
+
+
+def _start_profiling():
+    import cProfile
+    import sys
+
+    def bootstrap(*_args):
+        # First profiler event in a new thread: swap in a real profiler
+        sys.setprofile(None)
+        p = cProfile.Profile()
+        _profiles.append(p)
+        p.enable()
+
+    threading.setprofile(bootstrap)
+    main = cProfile.Profile()
+    _profiles.append(main)
+    main.enable()
+
+
+def _dump_profile():
+    import pstats
+
+    for p in _profiles:
+        p.disable()
+    try:
+        pstats.Stats(*_profiles).dump_stats(PROFILE_FILE)
+    except (TypeError, OSError) as e:  # TypeError: nothing was recorded
+        print("[metrics] Could not write profile:", e)
+
+
+if PROFILE_FILE:
+    _start_profiling()
+    atexit.register(_dump_profile)
+if ENABLED and METRICS_FILE:
+    atexit.register(write, METRICS_FILE)
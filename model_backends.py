@@ -0,0 +1,119 @@
+# model_backends.py
+"""
+Regressors the delay model can be built from, selected by name:
+
+    RAILOPTIMUS_MODEL_BACKEND=hgb python train_model.py
+    python train_model.py --compare rf,hgb,linear
+
+rf      RandomForestRegressor (default). The only backend with a per-tree
+        spread for predict_interval(s), a flat NumPy export (flat_forest.py)
+        and warm-started refits.
+hgb     HistGradientBoostingRegressor: much faster to fit and to score in
+        bulk on network-sized data. Intervals collapse to the prediction.
+linear  Ridge regression on standardized features; the baseline to beat.
+
+The backend decides how a model is trained; a saved model is always used as
+it is, whatever the configuration says (see backend_of).
+"""
+import os
+
+# Backend DelayPredictor and train_model.py train with unless told otherwise
+BACKEND = os.environ.get("RAILOPTIMUS_MODEL_BACKEND", "rf")
+
+SEED = 42
+
+
+class Backend:
+    """How to build one kind of regressor, and what the predictor can do with it."""
+
+    name = ""
+    # Averaging forest of trees: per-tree spread, flat export, warm-start refits
+    forest = False
+    defaults = {}
+    # Randomized search space for train_model.py --search
+    space = {}
+
+    def make(self, params: dict = None, seed: int = SEED, n_jobs: int = -1):
+        """A fresh, unfitted estimator with the defaults overridden by `params`."""
+        raise NotImplementedError
+
+    def owns(self, model) -> bool:
+        """True if `model` was built by this backend."""
+        raise NotImplementedError
+
+
+class RandomForestBackend(Backend):
+    name = "rf"
+    forest = True
+    defaults = {"n_estimators": 100}
+    # max_samples bounds the cost on full-network data
+    space = {
+        "n_estimators": [100, 200, 300],
+        "max_depth": [None, 12, 20, 30],
+        "min_samples_leaf": [1, 2, 5, 10],
+        "max_features": [1.0, 0.75, 0.5],
+        "max_samples": [None, 0.5, 0.25],
+    }
+
+    def make(self, params=None, seed=SEED, n_jobs=-1):
+        from sklearn.ensemble import RandomForestRegressor
+        return RandomForestRegressor(random_state=seed, n_jobs=n_jobs, **{**self.defaults, **(params or {})})
+
+    def owns(self, model):
+        return type(model).__name__ == "RandomForestRegressor"
+
+
+class HistGradientBoostingBackend(Backend):
+    name = "hgb"
+    defaults = {"max_iter": 200, "learning_rate": 0.1}
+    space = {
+        "max_iter": [100, 200, 400],
+        "learning_rate": [0.03, 0.1, 0.3],
+        "max_leaf_nodes": [15, 31, 63],
+        "min_samples_leaf": [10, 20, 50],
+        "l2_regularization": [0.0, 0.1, 1.0],
+    }
+
+    def make(self, params=None, seed=SEED, n_jobs=-1):
+        # Threads come from OpenMP; there is no n_jobs
+        from sklearn.ensemble import HistGradientBoostingRegressor
+        return HistGradientBoostingRegressor(random_state=seed, **{**self.defaults, **(params or {})})
+
+    def owns(self, model):
+        return type(model).__name__ == "HistGradientBoostingRegressor"
+
+
+class LinearBackend(Backend):
+    name = "linear"
+    defaults = {"ridge__alpha": 1.0}
+    space = {"ridge__alpha": [0.01, 0.1, 1.0, 10.0, 100.0]}
+
+    def make(self, params=None, seed=SEED, n_jobs=-1):
+        from sklearn.linear_model import Ridge
+        from sklearn.pipeline import make_pipeline
+        from sklearn.preprocessing import StandardScaler
+        return make_pipeline(StandardScaler(), Ridge()).set_params(**{**self.defaults, **(params or {})})
+
+    def owns(self, model):
+        steps = getattr(model, "steps", None)
+        return bool(steps) and type(steps[-1][1]).__name__ == "Ridge"
+
+
+BACKENDS = {b.name: b for b in (RandomForestBackend(), HistGradientBoostingBackend(), LinearBackend())}
+
+
+def get_backend(name: str = None) -> Backend:
+    """The backend called `name` (default: BACKEND); ValueError for unknown names."""
+    name = (name or BACKEND).strip().lower()
+    try:
+        return BACKENDS[name]
+    except KeyError:
+        raise ValueError(f"Unknown model backend {name!r}; choose from {', '.join(BACKENDS)}") from None
+
+
+def backend_of(model) -> Backend:
+    """The backend a fitted model came from; the plain Backend() for anything else."""
+    for backend in BACKENDS.values():
+        if backend.owns(model):
+            return backend
+    return Backend()
@@ -0,0 +1,119 @@
+# model_registry.py
+"""
+Local registry of trained delay models.
+
+    model_registry/              (RAILOPTIMUS_MODEL_REGISTRY)
+        v0001/model.pkl
+        v0001/meta.json     data hash, features, params, metrics, training time
+        v0002/...
+        CURRENT             version the predictor loads
+
+Versions are never overwritten; promoting a version only rewrites CURRENT.
+"""
+import hashlib
+import json
+import os
+import re
+import shutil
+import time
+from typing import List, Optional
+
+REGISTRY_DIR = os.environ.get("RAILOPTIMUS_MODEL_REGISTRY", "model_registry")
+MODEL_NAME = "model.pkl"
+META_NAME = "meta.json"
+
+_VERSION_RE = re.compile(r"^v(\d+)$")
+
+
+def dataset_hash(df, columns) -> str:
+    """Order-sensitive content hash of the given dataset columns."""
+    import pandas as pd
+
+    h = hashlib.sha1()
+    for col in columns:
+        h.update(col.encode("utf-8"))
+        h.update(pd.util.hash_pandas_object(df[col], index=False).to_numpy().tobytes())
+    return "sha1:" + h.hexdigest()
+
+
+class ModelRegistry:
+    def __init__(self, root: str = None):
+        self.root = root or REGISTRY_DIR
+
+    # ------------------------
+    # Queries
+    # ------------------------
+    def versions(self) -> List[str]:
+        if not os.path.isdir(self.root):
+            return []
+        found = [d for d in os.listdir(self.root)
+                 if _VERSION_RE.match(d) and os.path.isfile(os.path.join(self.root, d, META_NAME))]
+        return sorted(found, key=lambda v: int(v[1:]))
+
+    def current(self) -> Optional[str]:
+        """The promoted version, or None when nothing has been promoted yet."""
+        try:
+            with open(os.path.join(self.root, "CURRENT"), "r", encoding="utf-8") as fh:
+                version = fh.read().strip()
+        except OSError:
+            return None
+        return version if os.path.isfile(self.model_file(version)) else None
+
+    def model_file(self, version: str) -> str:
+        return os.path.join(self.root, version, MODEL_NAME)
+
+    def meta(self, version: str) -> dict:
+        with open(os.path.join(self.root, version, META_NAME), "r", encoding="utf-8") as fh:
+            return json.load(fh)
+
+    # ------------------------
+    # Updates
+    # ------------------------
+    def register(self, model, meta: dict, promote: bool = True) -> str:
+        """Save model + metadata as the next version. Returns the version name."""
+        import joblib
+
+        os.makedirs(self.root, exist_ok=True)
+        existing = [int(_VERSION_RE.match(d).group(1)) for d in os.listdir(self.root) if _VERSION_RE.match(d)]
+        version = "v%04d" % (max(existing, default=0) + 1)
+
+        # Write into a temp dir and rename, so readers never see half a version
+        tmp = os.path.join(self.root, f".{version}.tmp")
+        shutil.rmtree(tmp, ignore_errors=True)
+        os.makedirs(tmp)
+        joblib.dump(model, os.path.join(tmp, MODEL_NAME))
+        meta = dict(meta, version=version, registered_at=time.strftime("%Y-%m-%dT%H:%M:%S"))
+        with open(os.path.join(tmp, META_NAME), "w", encoding="utf-8") as fh:
+            json.dump(meta, fh, indent=2, default=str)
+        os.rename(tmp, os.path.join(self.root, version))
+
+        if promote:
+            self.promote(version)
+        return version
+
+    def promote(self, version: str):
+        if not os.path.isfile(self.model_file(version)):
+            raise ValueError(f"Unknown model version: {version}")
+        tmp = os.path.join(self.root, "CURRENT.tmp")
+        with open(tmp, "w", encoding="utf-8") as fh:
+            fh.write(version + "\n")
+        os.replace(tmp, os.path.join(self.root, "CURRENT"))
+
+
+if __name__ == "__main__":
+    # python model_registry.py            list versions (* = current)
+    # python model_registry.py v0003      make v0003 the current version
+    import sys
+
+    reg = ModelRegistry()
+    if len(sys.argv) > 1:
+        reg.promote(sys.argv[1])
+    cur = reg.current()
+    for v in reg.versions():
+        m = reg.meta(v)
+        metrics = m.get("metrics", {})
+        print(("* " if v == cur else "  ") + v,
+              m.get("registered_at", ""),
+              f"MAE {metrics.get('cv_mae', float('nan')):.3f}",
+              f"R2 {metrics.get('cv_r2', float('nan')):.3f}",
+              f"rows {m.get('n_rows', '?')}")
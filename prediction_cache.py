@@ -0,0 +1,222 @@
+# prediction_cache.py
+"""
+Bounded LRU/TTL memoization for the delay predictor and the RL agent.
+
+Keys are the normalized inputs. Each cache remembers the version of what it
+wraps (DelayPredictor.version, the agent's model object) and clears itself
+when that changes. CachedPredictor also polls the model and dataset files
+every `check_interval` seconds and reloads the predictor when another
+process (e.g. dataset_refresh.py) has rewritten them.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+import metrics
+from supervised_model import QUANTILES, _normalize_key, quantile_label
+
+CACHE_SIZE = int(os.environ.get("RAILOPTIMUS_CACHE_SIZE", "4096"))
+CACHE_TTL = float(os.environ.get("RAILOPTIMUS_CACHE_TTL", "0")) or None  # seconds; 0 = no expiry
+
+_MISSING = object()
+
+
+class LRUCache:
+    def __init__(self, maxsize: int = CACHE_SIZE, ttl: float = CACHE_TTL, name: str = "cache"):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.name = name
+        self.version = None
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = self.expirations = self.invalidations = 0
+        metrics.register(self)
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING:
+                self.misses += 1
+                return default
+            value, stamp = entry
+            if self.ttl is not None and time.monotonic() - stamp > self.ttl:
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = (value, time.monotonic())
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def check_version(self, version):
+        """Clear the cache if `version` differs from the one it was filled under."""
+        if version != self.version:
+            with self._lock:
+                if self._data:
+                    self.invalidations += 1
+                self._data.clear()
+                self.version = version
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+        }
+
+    def collect_metrics(self):
+        s = self.stats()
+        labels = {"cache": self.name}
+        return [
+            ("cache_hits_total", labels, s["hits"]),
+            ("cache_misses_total", labels, s["misses"]),
+            ("cache_hit_ratio", labels, s["hit_rate"]),
+            ("cache_size", labels, s["size"]),
+        ]
+
+
+class CachedPredictor:
+    """Memoizing front for a DelayPredictor; same predict_delay / predict_delays API."""
+
+    def __init__(self, predictor, maxsize: int = CACHE_SIZE, ttl: float = CACHE_TTL,
+                 check_interval: float = 2.0):
+        self.predictor = predictor
+        self.cache = LRUCache(maxsize, ttl, name="prediction")
+        self.check_interval = check_interval
+        self._disk_sig = None
+        self._next_check = 0.0
+
+    def _sync(self):
+        self.predictor.ensure_loaded()
+        now = time.monotonic()
+        if self.check_interval is not None and now >= self._next_check:
+            self._next_check = now + self.check_interval
+            sig = self.predictor.disk_signature()
+            # This process's own upserts are already live; only reload for other writers
+            if (self._disk_sig is not None and sig != self._disk_sig
+                    and sig != self.predictor.written_signature):
+                self.predictor.reload()
+                sig = self.predictor.disk_signature()
+            self._disk_sig = sig
+        self.cache.check_version(self.predictor.version)
+
+    def predict_delay(self, train_no: str, station_code: str, station_name: str = None) -> float:
+        return float(self.predict_delays([(train_no, station_code, station_name)])[0][0])
+
+    def predict_delays(self, pairs):
+        """Like DelayPredictor.predict_delays; only cache misses reach the model."""
+        self._sync()
+        keys = [_normalize_key(*p) for p in pairs]
+        delays = np.empty(len(keys), dtype=float)
+        tiers = [None] * len(keys)
+
+        missing = {}
+        for i, key in enumerate(keys):
+            hit = self.cache.get(key)
+            if hit is None:
+                missing.setdefault(key, []).append(i)
+            else:
+                delays[i], tiers[i] = hit
+
+        if missing:
+            fresh, fresh_tiers = self.predictor.predict_delays(list(missing))
+            for (key, idxs), d, t in zip(missing.items(), fresh, fresh_tiers):
+                self.cache.put(key, (float(d), t))
+                delays[idxs] = d
+                for i in idxs:
+                    tiers[i] = t
+        return delays, tiers
+
+    def predict_intervals(self, pairs, quantiles=None):
+        """Like DelayPredictor.predict_intervals; cached per key and set of quantiles."""
+        self._sync()
+        quantiles = QUANTILES if quantiles is None else tuple(dict.fromkeys(quantiles))
+        names = ["delay", "std"] + [quantile_label(q) for q in quantiles]
+        keys = [(_normalize_key(*p), quantiles) for p in pairs]
+        values = np.empty((len(keys), len(names)))
+        tiers = [None] * len(keys)
+
+        missing = {}
+        for i, key in enumerate(keys):
+            hit = self.cache.get(key)
+            if hit is None:
+                missing.setdefault(key, []).append(i)
+            else:
+                values[i], tiers[i] = hit
+
+        if missing:
+            fresh, fresh_tiers = self.predictor.predict_intervals([k for k, _ in missing], quantiles)
+            fresh = np.column_stack([fresh[n] for n in names])
+            for (key, idxs), row, t in zip(missing.items(), fresh, fresh_tiers):
+                self.cache.put(key, (row, t))
+                values[idxs] = row
+                for i in idxs:
+                    tiers[i] = t
+        return {n: values[:, j] for j, n in enumerate(names)}, tiers
+
+    def predict_route(self, train_no: str, from_station: str = None, current_delay: float = None,
+                      recovery: float = None):
+        """DelayPredictor.predict_route on the current model and dataset (profiles are not cached)."""
+        self._sync()
+        return self.predictor.predict_route(train_no, from_station, current_delay, recovery)
+
+    def get_train_station_row(self, train_no: str, station_code: str):
+        return self.predictor.get_train_station_row(train_no, station_code)
+
+    def resolve_station(self, text: str, limit: int = 5) -> list:
+        return self.predictor.resolve_station(text, limit)
+
+    def stats(self) -> dict:
+        return self.cache.stats()
+
+
+class CachedAgent:
+    """Memoizing front for SimpleRLAgent.get_action."""
+
+    def __init__(self, agent, maxsize: int = CACHE_SIZE, ttl: float = CACHE_TTL):
+        self.agent = agent
+        self.cache = LRUCache(maxsize, ttl, name="action")
+
+    @property
+    def delay_quantile(self):
+        return self.agent.delay_quantile
+
+    def planning_delay(self, interval: dict):
+        return self.agent.planning_delay(interval)
+
+    def get_action(self, predicted_delay, visibility, speed, weather_desc="Clear"):
+        # A retrained/reloaded agent model invalidates everything
+        self.cache.check_version(id(self.agent.model))
+        key = (float(predicted_delay), float(visibility), float(speed), weather_desc.lower())
+        action = self.cache.get(key)
+        if action is None:
+            action = self.agent.get_action(predicted_delay, visibility, speed, weather_desc)
+            self.cache.put(key, action)
+        return action
+
+    def stats(self) -> dict:
+        return self.cache.stats()
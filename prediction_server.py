@@ -0,0 +1,416 @@
+# prediction_server.py
+"""
+Headless HTTP/JSON prediction service (asyncio, standard library only).
+
+    python prediction_server.py --port 8080 --workers 4
+
+Endpoints
+    GET  /health
+    POST /predict        {"train_no": "12951", "station_code": "NDLS", "station_name": null}
+    POST /predict/batch  {"pairs": [["12951", "NDLS"], ["12952", "MB", "MUMBAI CENTRAL"]]}
+                         Both accept "quantiles": [0.1, 0.9] (or true for the defaults)
+                         to add the std and quantiles across the forest's trees
+    POST /predict/route  {"train_no": "12951", "from_station": "BRC", "current_delay": 25}
+    POST /stations/resolve {"query": "kharagpur jn", "limit": 5}
+                         Ranked station codes for free text (codes, names, misspellings);
+                         every predict endpoint already resolves through the same index
+    POST /decide         {"train_no": "12951", "station_code": "NDLS", "speed": 80,
+                          "city": "Delhi"}            (or "weather" + "visibility")
+    GET  /stats
+    GET  /metrics        Prometheus text (RAILOPTIMUS_METRICS=1; per worker process)
+
+The model is loaded once before the workers fork, so every worker process
+shares it read-only. Concurrent /predict and /decide calls in a worker are
+coalesced into one predict_delays call per MAX_DELAY window (micro-batching).
+When the RL agent plans on a delay quantile (RAILOPTIMUS_RL_DELAY_QUANTILE),
+/decide scores through predict_intervals instead.
+"""
+import argparse
+import asyncio
+import gc
+import json
+import multiprocessing
+import os
+import signal
+import socket
+from concurrent.futures import ThreadPoolExecutor
+
+import metrics
+from prediction_cache import CachedAgent, CachedPredictor
+from rl_agent import SimpleRLAgent
+from supervised_model import QUANTILES, predictor
+from weather_api import get_client
+
+MAX_BATCH = 512
+MAX_DELAY = 0.002  # seconds to wait for more requests before scoring a batch
+MAX_BODY = 8 * 1024 * 1024
+
+# The RL agent warm_up() loads before forking; workers share it instead of loading their own
+agent = None
+
+
+class MicroBatcher:
+    """
+    Collects single items from concurrent coroutines and runs `fn(items)` once
+    per window (or as soon as MAX_BATCH items are waiting) on a worker thread.
+    `fn` returns one result per item.
+    """
+
+    def __init__(self, fn, max_batch: int = MAX_BATCH, max_delay: float = MAX_DELAY):
+        self.fn = fn
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self._pending = []
+        self._flush_handle = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="batch")
+        self.batches = 0
+        self.items = 0
+
+    async def submit(self, item):
+        loop = asyncio.get_running_loop()
+        fut = loop.create_future()
+        self._pending.append((item, fut))
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.max_delay, self._flush)
+        return await fut
+
+    def _flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        batch, self._pending = self._pending, []
+        if batch:
+            asyncio.ensure_future(self._run(batch))
+
+    async def _run(self, batch):
+        loop = asyncio.get_running_loop()
+        items = [item for item, _ in batch]
+        self.batches += 1
+        self.items += len(items)
+        try:
+            results = await loop.run_in_executor(self._executor, self.fn, items)
+        except Exception as e:
+            for _, fut in batch:
+                if not fut.done():
+                    fut.set_exception(e)
+            return
+        for (_, fut), res in zip(batch, results):
+            if not fut.done():
+                fut.set_result(res)
+
+
+class HTTPError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+            413: "Payload Too Large", 500: "Internal Server Error"}
+
+
+class PredictionService:
+    def __init__(self, max_batch: int = MAX_BATCH, max_delay: float = MAX_DELAY):
+        self.predictor = CachedPredictor(predictor)
+        self.agent = CachedAgent(agent or SimpleRLAgent())
+        self.weather = get_client()
+        self.batcher = MicroBatcher(self._score, max_batch, max_delay)
+        self.interval_batcher = MicroBatcher(self._score_intervals, max_batch, max_delay)
+        self.routes = {
+            ("GET", "/health"): self.health,
+            ("GET", "/stats"): self.stats,
+            ("GET", "/metrics"): self.metrics,
+            ("POST", "/predict"): self.predict,
+            ("POST", "/predict/batch"): self.predict_batch,
+            ("POST", "/predict/route"): self.predict_route,
+            ("POST", "/stations/resolve"): self.resolve_station,
+            ("POST", "/decide"): self.decide,
+        }
+
+    def _score(self, keys):
+        delays, tiers = self.predictor.predict_delays(keys)
+        return [(float(d), t) for d, t in zip(delays, tiers)]
+
+    def _score_intervals(self, items):
+        # items are (key, quantiles); one predict_intervals call per distinct quantile set
+        groups = {}
+        for i, (_, quantiles) in enumerate(items):
+            groups.setdefault(quantiles, []).append(i)
+        results = [None] * len(items)
+        for quantiles, idxs in groups.items():
+            out, tiers = self.predictor.predict_intervals([items[i][0] for i in idxs], quantiles)
+            for j, i in enumerate(idxs):
+                results[i] = dict({k: float(v[j]) for k, v in out.items()}, tier=tiers[j])
+        return results
+
+    # ------------------------
+    # Handlers
+    # ------------------------
+    @staticmethod
+    def _key(body: dict):
+        if not body.get("train_no"):
+            raise HTTPError(400, "train_no is required")
+        return (body["train_no"], body.get("station_code") or "", body.get("station_name"))
+
+    @staticmethod
+    def _pairs(body: dict):
+        """The batch's keys; each item is [train_no, station_code] or [train_no, station_code, station_name]."""
+        pairs = body.get("pairs")
+        if not isinstance(pairs, list):
+            raise HTTPError(400, "pairs must be a list of [train_no, station_code, station_name?]")
+        for i, p in enumerate(pairs):
+            if (not isinstance(p, list) or len(p) not in (2, 3)
+                    or not all(isinstance(v, str) for v in p[:2])
+                    or not (len(p) == 2 or p[2] is None or isinstance(p[2], str))):
+                raise HTTPError(400, f"pairs[{i}] must be [train_no, station_code, station_name?] strings")
+        return [tuple(p) for p in pairs]
+
+    @staticmethod
+    def _quantiles(body: dict):
+        """None (plain prediction), or the requested quantiles as a tuple."""
+        q = body.get("quantiles")
+        if q is None or q is False:
+            return None
+        if q is True:
+            return QUANTILES
+        try:
+            q = tuple(float(v) for v in q)
+        except (TypeError, ValueError):
+            raise HTTPError(400, "quantiles must be true or a list of numbers")
+        if not all(0.0 <= v <= 1.0 for v in q):
+            raise HTTPError(400, "quantiles must lie in [0, 1]")
+        return q
+
+    async def health(self, body):
+        return {"status": "ok", "pid": os.getpid(), "model_version": predictor.version}
+
+    async def stats(self, body):
+        return {
+            "pid": os.getpid(),
+            "batches": self.batcher.batches,
+            "items": self.batcher.items,
+            "interval_batches": self.interval_batcher.batches,
+            "interval_items": self.interval_batcher.items,
+            "prediction_cache": self.predictor.stats(),
+            "action_cache": self.agent.stats(),
+        }
+
+    async def metrics(self, body):
+        return metrics.render_prometheus()
+
+    async def predict(self, body):
+        key, quantiles = self._key(body), self._quantiles(body)
+        if quantiles is not None:
+            return await self.interval_batcher.submit((key, quantiles))
+        delay, tier = await self.batcher.submit(key)
+        return {"delay": delay, "tier": tier}
+
+    async def predict_batch(self, body):
+        pairs, quantiles = self._pairs(body), self._quantiles(body)
+        loop = asyncio.get_running_loop()
+        if quantiles is not None:
+            out, tiers = await loop.run_in_executor(None, self.predictor.predict_intervals, pairs, quantiles)
+            result = {"delays" if k == "delay" else k: v.tolist() for k, v in out.items()}
+            result["tiers"] = tiers
+            return result
+        delays, tiers = await loop.run_in_executor(None, self.predictor.predict_delays, pairs)
+        return {"delays": [float(d) for d in delays], "tiers": tiers}
+
+    async def predict_route(self, body):
+        if not body.get("train_no"):
+            raise HTTPError(400, "train_no is required")
+        current = body.get("current_delay")
+        loop = asyncio.get_running_loop()
+        try:
+            profile = await loop.run_in_executor(
+                None, self.predictor.predict_route, body["train_no"], body.get("from_station"),
+                None if current is None else float(current),
+            )
+        except ValueError as e:
+            raise HTTPError(404, str(e))
+        return {"train_no": body["train_no"], "stops": profile.to_dict(orient="records")}
+
+    async def resolve_station(self, body):
+        query = body.get("query")
+        if not isinstance(query, str) or not query.strip():
+            raise HTTPError(400, "query is required")
+        try:
+            limit = int(body.get("limit", 5))
+        except (TypeError, ValueError):
+            raise HTTPError(400, "limit must be an integer")
+        return {"query": query, "candidates": self.predictor.resolve_station(query, max(limit, 0))}
+
+    async def decide(self, body):
+        key = self._key(body)
+        try:
+            speed = float(body.get("speed", 80.0))
+        except (TypeError, ValueError):
+            raise HTTPError(400, "speed must be a number")
+        if speed < 0:
+            speed = 80.0
+        weather = None
+        if body.get("weather") is not None and body.get("visibility") is not None:
+            try:
+                weather = (str(body["weather"]), float(body["visibility"]), True)
+            except (TypeError, ValueError):
+                raise HTTPError(400, "visibility must be a number")
+
+        q = self.agent.delay_quantile
+        scored = (self.batcher.submit(key) if q is None
+                  else self.interval_batcher.submit((key, (q,))))
+        if weather is not None:
+            scored = await scored
+        else:
+            scored, weather = await asyncio.gather(scored, self.weather.fetch(body.get("city") or "Delhi"))
+        if q is None:
+            delay, tier = scored
+            planned = delay
+        else:
+            delay, tier, planned = scored["delay"], scored["tier"], self.agent.planning_delay(scored)
+        weather_desc, visibility_km, ok = weather
+        action = self.agent.get_action(planned, visibility_km, speed, weather_desc)
+        return {
+            "delay": delay, "tier": tier, "planned_delay": planned, "action": action, "speed": speed,
+            "weather": weather_desc, "visibility_km": visibility_km, "weather_ok": ok,
+        }
+
+    # ------------------------
+    # HTTP/1.1 plumbing
+    # ------------------------
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b"\r\n\r\n")
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+                    break
+                request_line, *header_lines = head.decode("latin-1").split("\r\n")
+                try:
+                    method, target, version = request_line.split(" ", 2)
+                except ValueError:
+                    await self._respond(writer, 400, {"error": "malformed request line"}, False)
+                    break
+                headers = {}
+                for line in header_lines:
+                    if ":" in line:
+                        k, v = line.split(":", 1)
+                        headers[k.strip().lower()] = v.strip()
+                keep_alive = (version == "HTTP/1.1" and headers.get("connection", "").lower() != "close")
+
+                length = int(headers.get("content-length") or 0)
+                if length > MAX_BODY:
+                    await self._respond(writer, 413, {"error": "body too large"}, False)
+                    break
+                raw = await reader.readexactly(length) if length else b""
+
+                status, payload = await self._dispatch(method, target.split("?", 1)[0], raw)
+                await self._respond(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        finally:
+            writer.close()
+
+    async def _dispatch(self, method: str, path: str, raw: bytes):
+        handler = self.routes.get((method, path))
+        if handler is None:
+            known = any(p == path for _, p in self.routes)
+            return (405, {"error": "method not allowed"}) if known else (404, {"error": "not found"})
+        try:
+            body = json.loads(raw) if raw else {}
+            if not isinstance(body, dict):
+                raise HTTPError(400, "JSON body must be an object")
+            with metrics.timer("http " + path):
+                return 200, await handler(body)
+        except HTTPError as e:
+            return e.status, {"error": str(e)}
+        except ValueError as e:
+            return 400, {"error": f"invalid JSON: {e}"}
+        except Exception as e:
+            return 500, {"error": str(e)}
+
+    @staticmethod
+    async def _respond(writer, status: int, payload, keep_alive: bool):
+        # Handlers return dicts (JSON) or text (the Prometheus exposition)
+        if isinstance(payload, str):
+            body, ctype = payload.encode("utf-8"), "text/plain; version=0.0.4"
+        else:
+            body, ctype = json.dumps(payload).encode("utf-8"), "application/json"
+        head = (
+            f"HTTP/1.1 {status} {_REASONS.get(status, '')}\r\n"
+            f"Content-Type: {ctype}\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+        ).encode("latin-1")
+        writer.write(head + body)
+        await writer.drain()
+
+
+# ------------------------
+# Process management
+# ------------------------
+def _serve(sock: socket.socket, max_batch: int, max_delay: float):
+    async def main():
+        service = PredictionService(max_batch, max_delay)
+        server = await asyncio.start_server(service.handle, sock=sock, backlog=1024)
+        async with server:
+            await server.serve_forever()
+
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # the parent handles Ctrl+C
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
+
+
+def warm_up():
+    """Load dataset, model and RL agent before forking so workers share them."""
+    global agent
+    predictor.load()
+    agent = SimpleRLAgent()
+    # Keep the collector from touching (and so copying) the loaded objects in workers
+    gc.freeze()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Train delay prediction HTTP service")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--workers", type=int, default=1, help="worker processes (fork-based)")
+    parser.add_argument("--max-batch", type=int, default=MAX_BATCH)
+    parser.add_argument("--max-delay-ms", type=float, default=MAX_DELAY * 1000)
+    args = parser.parse_args(argv)
+
+    warm_up()
+    sock = socket.create_server((args.host, args.port), backlog=1024, reuse_port=False)
+    sock.setblocking(False)
+    max_delay = args.max_delay_ms / 1000.0
+    print(f"[prediction_server] Listening on http://{args.host}:{args.port} with {args.workers} worker(s)")
+
+    if args.workers <= 1 or "fork" not in multiprocessing.get_all_start_methods():
+        asyncio.run(_serve_inline(sock, args.max_batch, max_delay))
+        return
+
+    ctx = multiprocessing.get_context("fork")
+    procs = [ctx.Process(target=_serve, args=(sock, args.max_batch, max_delay), daemon=True)
+             for _ in range(args.workers)]
+    for p in procs:
+        p.start()
+    try:
+        for p in procs:
+            p.join()
+    except KeyboardInterrupt:
+        for p in procs:
+            p.terminate()
+
+
+async def _serve_inline(sock, max_batch, max_delay):
+    service = PredictionService(max_batch, max_delay)
+    server = await asyncio.start_server(service.handle, sock=sock, backlog=1024)
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
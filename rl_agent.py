@@ -1,23 +1,47 @@
 # rl_agent.py
 import numpy as np
-from sklearn.linear_model import LogisticRegression
 import joblib
 import os
 
+import metrics
+
+RL_MODEL_FILE = os.environ.get("RAILOPTIMUS_RL_MODEL_FILE", "rl_agent_model.pkl")
+# Plan speed actions on this quantile of the predicted delay (e.g. 0.9 to act
+# on the pessimistic case) instead of the mean; empty = the mean
+RL_DELAY_QUANTILE = float(os.environ.get("RAILOPTIMUS_RL_DELAY_QUANTILE") or 0) or None
+
 class SimpleRLAgent:
-    def __init__(self, model_file="rl_agent_model.pkl"):
+    def __init__(self, model_file=RL_MODEL_FILE, delay_quantile=RL_DELAY_QUANTILE):
         self.actions = ["decrease", "maintain", "increase"]
         self.weather_map = {"clear":0, "clouds":1, "rain":2, "fog":3}
         self.model_file = model_file
+        self.delay_quantile = delay_quantile
 
         if os.path.isfile(model_file):
             self.model = joblib.load(model_file)
         else:
-            self.model = LogisticRegression(multi_class="multinomial", max_iter=500)
+            from sklearn.linear_model import LogisticRegression
+            # lbfgs fits a multinomial model for 3 classes by default
+            self.model = LogisticRegression(max_iter=500)
             X, y = self._generate_training_data()
             self.model.fit(X, y)
             joblib.dump(self.model, model_file)
 
+        self._export_policy()
+
+    # ------------------------
+    # Closed-form policy
+    # ------------------------
+    def _export_policy(self):
+        """
+        The policy is linear in the encoded state: action = argmax(S @ W.T + b).
+        Copy the fitted weights out so decisions are plain NumPy, no sklearn call.
+        """
+        self.coef = np.asarray(self.model.coef_, dtype=float)
+        self.intercept = np.asarray(self.model.intercept_, dtype=float)
+        self.classes = np.asarray(self.model.classes_)
+        self._scale = np.array([300.0, 10.0, 160.0])
+
     # ------------------------
     # Encode features
     # ------------------------
@@ -25,6 +49,20 @@ class SimpleRLAgent:
         w = self.weather_map.get(weather_desc.lower(), 0)
         return [predicted_delay/300.0, visibility/10.0, speed/160.0, w]
 
+    def _encode_states(self, delays, visibilities, speeds, weathers):
+        """Vectorized _encode_state; weathers may be strings or integer weather codes."""
+        raw = np.column_stack([
+            np.asarray(delays, dtype=float),
+            np.asarray(visibilities, dtype=float),
+            np.asarray(speeds, dtype=float),
+        ])
+        weathers = np.asarray(weathers)
+        if weathers.dtype.kind in "iuf":
+            codes = weathers.astype(float)
+        else:
+            codes = np.array([self.weather_map.get(w.lower(), 0) for w in weathers.tolist()], dtype=float)
+        return np.column_stack([raw / self._scale, np.broadcast_to(codes, len(raw))])
+
     # ------------------------
     # Generate synthetic training data
     # ------------------------
@@ -61,9 +99,38 @@ class SimpleRLAgent:
     # ------------------------
     # Predict action
     # ------------------------
+    def _decide(self, states: np.ndarray) -> np.ndarray:
+        scores = states @ self.coef.T + self.intercept
+        if scores.shape[1] == 1:  # binary model: one score column
+            return self.classes[(scores[:, 0] > 0).astype(int)]
+        return self.classes[scores.argmax(axis=1)]
+
+    def planning_delay(self, interval: dict):
+        """
+        The delay to act on from a predict_interval(s) result: the
+        delay_quantile entry when one is set (and was predicted), else the mean.
+        """
+        if self.delay_quantile is not None:
+            from supervised_model import quantile_label
+            label = quantile_label(self.delay_quantile)
+            if label in interval:
+                return interval[label]
+        return interval["delay"]
+
     def get_action(self, predicted_delay, visibility, speed, weather_desc="Clear"):
-        state = np.array([self._encode_state(predicted_delay, visibility, speed, weather_desc)])
-        return self.model.predict(state)[0]
+        with metrics.timer("rl_decide"):
+            state = np.array([self._encode_state(predicted_delay, visibility, speed, weather_desc)])
+            return self._decide(state)[0]
+
+    def get_actions(self, delays, visibilities, speeds, weathers="Clear"):
+        """
+        Batch get_action for a whole fleet. Inputs are arrays or single
+        values, broadcast against each other; returns an array of action names.
+        """
+        delays, visibilities, speeds, weathers = np.broadcast_arrays(
+            *(np.atleast_1d(np.asarray(v)) for v in (delays, visibilities, speeds, weathers)))
+        with metrics.timer("rl_decide_batch"):
+            return self._decide(self._encode_states(delays, visibilities, speeds, weathers))
 
 # ------------------------
 # Quick test
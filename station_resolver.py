@@ -0,0 +1,216 @@
+# station_resolver.py
+"""
+Free-text station lookup: resolves what a user typed ("kharagpur", "KGP",
+"Kharagpur Jn.", "bhuvaneshwar") to canonical station codes, best first.
+
+Built once from the dataset's (Station, Station_Name) pairs:
+- every code and every normalized name is a key; codes sharing a
+  normalized name are aliases of each other (KGP, KGP2, KGP3 -> KHARAGPUR)
+- a name typed in full ("KHARAGPUR JN") ranks its own station above
+  stations whose names only normalize to the same key
+- prefix matches are a binary search over the sorted keys (a flattened trie)
+- a trigram index over the keys catches misspellings and word-order slips
+"""
+import bisect
+import re
+
+import numpy as np
+
+# Name tokens that do not tell two stations apart ("KHARAGPUR JN" is "KHARAGPUR")
+GENERIC_TOKENS = {"JN", "JNC", "JCT", "JUNCTION", "RLY", "STN"}
+
+# Scores by kind of match; candidates are ranked by score, then by how
+# many dataset rows use the station
+SCORE_CODE = 1.0
+SCORE_NAME = 0.95  # the name exactly as listed
+SCORE_NAME_KEY = 0.93  # the same name once generic tokens are dropped
+SCORE_ALIAS = 0.9
+SCORE_PREFIX = 0.6  # up to SCORE_PREFIX + 0.3 as the prefix covers more of the key
+SCORE_TRIGRAM = 0.8  # times the trigram similarity
+
+MIN_SCORE = 0.5  # weakest candidate resolve() will pick
+MIN_SIMILARITY = 0.5  # trigram Dice coefficient below this is not a candidate
+MIN_PREFIX_LEN = 3  # one or two letters prefix too many stations to mean any of them
+MIN_TRIGRAM_LEN = 5  # shorter text is a code: exact, prefix or alias matches only
+PREFIX_KEYS = 16  # prefix matches looked at per query
+TRIGRAM_KEYS = 16  # most similar keys looked at per query
+MAX_CANDIDATES = 16  # candidates kept per query
+MEMO_SIZE = 16384
+
+_NON_ALNUM = re.compile(r"[^0-9A-Z]+")
+
+
+def _words(text) -> str:
+    """Uppercase, punctuation to spaces: "Kharagpur Jn." -> "KHARAGPUR JN"."""
+    return " ".join(_NON_ALNUM.sub(" ", str(text).upper()).split())
+
+
+def normalize(text) -> str:
+    """_words with generic tokens dropped: "Kharagpur Jn." -> "KHARAGPUR"."""
+    tokens = _words(text).split()
+    kept = [t for t in tokens if t not in GENERIC_TOKENS]
+    return " ".join(kept or tokens)
+
+
+def _trigrams(key: str) -> set:
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class StationResolver:
+    """
+    Ranked station candidates for free text. Construct with parallel
+    sequences of station codes, station names (None when unknown) and the
+    number of dataset rows using each pair.
+    """
+
+    def __init__(self, codes, names, counts=None):
+        counts = np.ones(len(codes), dtype=np.int64) if counts is None else np.asarray(counts)
+        self.codes = []
+        self.names = []
+        self.weight = []
+        ids = {}
+        name_weight = {}
+        members = {}  # key -> {code id, ...}
+        name_keys = {}  # code id -> its normalized names
+        full_names = {}  # name as listed (_words) -> {code id, ...}
+
+        for code, name, n in zip(codes, names, counts):
+            code = str(code).strip().upper()
+            if not code:
+                continue
+            i = ids.get(code)
+            if i is None:
+                i = ids[code] = len(self.codes)
+                self.codes.append(code)
+                self.names.append(None)
+                self.weight.append(0)
+                name_keys[i] = []
+                members.setdefault(code, set()).add(i)
+            self.weight[i] += int(n)
+            if name is None or name != name or not str(name).strip():
+                continue
+            # Display the name the station is most often listed under
+            if name_weight.get(i, -1) < n:
+                name_weight[i] = n
+                self.names[i] = str(name).strip()
+            key = normalize(name)
+            members.setdefault(key, set()).add(i)
+            full_names.setdefault(_words(name), set()).add(i)
+            if key not in name_keys[i]:
+                name_keys[i].append(key)
+
+        self.ids = ids
+        self.weight = np.asarray(self.weight, dtype=np.int64)
+        self.keys = sorted(members)
+        key_ids = {k: j for j, k in enumerate(self.keys)}
+        self.members = [np.fromiter(sorted(members[k]), dtype=np.int64) for k in self.keys]
+        self.name_keys = [[key_ids[k] for k in name_keys[i]] for i in range(len(self.codes))]
+        self.key_ids = key_ids
+        self.full_names = {w: np.fromiter(sorted(ids), dtype=np.int64) for w, ids in full_names.items()}
+
+        postings = {}
+        self.key_trigrams = np.zeros(len(self.keys), dtype=np.int64)
+        for j, key in enumerate(self.keys):
+            grams = _trigrams(key)
+            self.key_trigrams[j] = len(grams)
+            for g in grams:
+                postings.setdefault(g, []).append(j)
+        self.postings = {g: np.asarray(js, dtype=np.int64) for g, js in postings.items()}
+        self._memo = {}
+
+    def __len__(self):
+        return len(self.codes)
+
+    def knows(self, code, name=None) -> bool:
+        """True if `code` (listed under `name`, when given) is already resolvable."""
+        i = self.ids.get(str(code).strip().upper())
+        if i is None:
+            return False
+        return not name or i in self.full_names.get(_words(name), ())
+
+    def aliases(self, code) -> np.ndarray:
+        """Ids of `code` and of the codes sharing one of its names, `code` first."""
+        i = self.ids.get(str(code).strip().upper())
+        if i is None:
+            return np.empty(0, dtype=np.int64)
+        ids = {int(k) for j in self.name_keys[i] for k in self.members[j]} - {i}
+        return np.array([i] + sorted(ids, key=lambda k: (-self.weight[k], self.codes[k])), dtype=np.int64)
+
+    # ------------------------
+    # Lookups
+    # ------------------------
+    def _match(self, text) -> tuple:
+        """((code id, score, kind), ...) for `text`, best first (memoized)."""
+        hit = self._memo.get(text)
+        if hit is not None:
+            return hit
+
+        raw = str(text).strip().upper()
+        query = normalize(text)
+        best = {}
+
+        def offer(ids, score, kind):
+            for i in ids:
+                if score > best.get(i, (0.0,))[0]:
+                    best[i] = (score, kind)
+
+        if raw in self.ids:
+            i = self.ids[raw]
+            offer([i], SCORE_CODE, "code")
+            for j in self.name_keys[i]:
+                offer(self.members[j], SCORE_ALIAS, "alias")
+        words = _words(text)
+        if words in self.full_names:
+            offer(self.full_names[words], SCORE_NAME, "name")
+        if query in self.key_ids:
+            offer(self.members[self.key_ids[query]], SCORE_NAME_KEY, "name")
+
+        if len(query) >= MIN_PREFIX_LEN:
+            lo = bisect.bisect_left(self.keys, query)
+            hi = bisect.bisect_left(self.keys, query + "\uffff", lo, min(lo + PREFIX_KEYS, len(self.keys)))
+            for j in range(lo, hi):
+                offer(self.members[j], SCORE_PREFIX + 0.3 * len(query) / len(self.keys[j]), "prefix")
+
+        # Misspellings: only needed when nothing matched the text as typed
+        exact = any(kind in ("code", "name") for _, kind in best.values())
+        grams = _trigrams(query) if len(query) >= MIN_TRIGRAM_LEN and not exact else ()
+        postings = [self.postings[g] for g in grams if g in self.postings]
+        if postings:
+            shared = np.bincount(np.concatenate(postings), minlength=len(self.keys))
+            similarity = 2 * shared / (len(grams) + self.key_trigrams)
+            top = np.flatnonzero(similarity >= MIN_SIMILARITY)
+            if len(top) > TRIGRAM_KEYS:
+                top = top[np.argpartition(-similarity[top], TRIGRAM_KEYS)[:TRIGRAM_KEYS]]
+            for j in top:
+                offer(self.members[j], SCORE_TRIGRAM * float(similarity[j]), "trigram")
+
+        ranked = sorted(best.items(), key=lambda kv: (-kv[1][0], -self.weight[kv[0]], self.codes[kv[0]]))
+        hit = tuple((i, score, kind) for i, (score, kind) in ranked[:MAX_CANDIDATES])
+        if len(self._memo) >= MEMO_SIZE:
+            self._memo.clear()
+        self._memo[text] = hit
+        return hit
+
+    def ranked(self, text, limit: int = None, min_score: float = 0.0) -> np.ndarray:
+        """Ids (positions in `codes`) of the candidates scoring at least min_score, best first."""
+        return np.array([i for i, score, _ in self._match(text)[:limit] if score >= min_score],
+                        dtype=np.int64)
+
+    def codes_for(self, text, limit: int = None, min_score: float = 0.0) -> list:
+        """Candidate station codes for `text` scoring at least min_score, best first."""
+        return [self.codes[i] for i in self.ranked(text, limit, min_score)]
+
+    def candidates(self, text, limit: int = 5) -> list:
+        """
+        Ranked candidates for `text` as dicts:
+        {"code": ..., "name": ..., "score": 0..1, "match": "code" | "name" |
+        "alias" | "prefix" | "trigram"}
+        """
+        return [{"code": self.codes[i], "name": self.names[i], "score": round(score, 4), "match": kind}
+                for i, score, kind in self._match(text)[:limit]]
+
+    def resolve(self, text, min_score: float = MIN_SCORE):
+        """The best candidate's code, or None when nothing scores min_score."""
+        hit = self._match(text)
+        return self.codes[hit[0][0]] if hit and hit[0][1] >= min_score else None
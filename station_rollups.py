@@ -0,0 +1,140 @@
+# station_rollups.py
+"""
+Network-wide per-station aggregates across every train that calls there.
+
+    python station_rollups.py                  # top 10 stations by total delay
+    python station_rollups.py --top 20 --by p90_delay
+
+The table is built in one groupby, saved next to the dataset cache
+(train_dataset.stations.feather) and patched per station when routes are
+upserted or removed, so dashboards read it without touching the raw rows.
+"""
+import argparse
+from typing import Iterable, Optional
+
+import pandas as pd
+
+TARGET = "avg_delay"
+PROB_COLS = ["p_on_time", "p_slight", "p_significant", "p_cancelled"]
+QUANTILES = {"p50_delay": 0.5, "p90_delay": 0.9, "p95_delay": 0.95}
+ROLLUP_VERSION = 1
+
+COLUMNS = (["Station_Name", "trains", "stops", "total_delay", "mean_delay", "max_delay"]
+           + list(QUANTILES) + PROB_COLS)
+
+
+def aggregate(df: pd.DataFrame) -> pd.DataFrame:
+    """Per-station rollup of the given rows, indexed by Station."""
+    if df.empty:
+        return pd.DataFrame(columns=COLUMNS, index=pd.Index([], name="Station"))
+    frame = pd.DataFrame({
+        "Station": df["Station"].astype(str).to_numpy(),
+        "Station_Name": (df["Station_Name"].astype(str).to_numpy()
+                         if "Station_Name" in df.columns else df["Station"].astype(str).to_numpy()),
+        "TrainNo": df["TrainNo"].astype(str).to_numpy(),
+        TARGET: df[TARGET].astype(float).to_numpy(),
+        **{c: df[c].astype(float).to_numpy() for c in PROB_COLS},
+    })
+    g = frame.groupby("Station", sort=False)
+    out = g.agg(
+        Station_Name=("Station_Name", "first"),
+        trains=("TrainNo", "nunique"),
+        stops=(TARGET, "size"),
+        total_delay=(TARGET, "sum"),
+        mean_delay=(TARGET, "mean"),
+        max_delay=(TARGET, "max"),
+        **{c: (c, "mean") for c in PROB_COLS},
+    )
+    q = g[TARGET].quantile(list(QUANTILES.values())).unstack()
+    q.columns = list(QUANTILES)
+    return out.join(q)[COLUMNS]
+
+
+class StationRollups:
+    def __init__(self, table: pd.DataFrame):
+        self.table = table
+
+    @classmethod
+    def build(cls, df: pd.DataFrame) -> "StationRollups":
+        return cls(aggregate(df))
+
+    def update(self, df: pd.DataFrame, stations: Iterable[str]):
+        """Recompute only `stations` from the current dataset `df` (e.g. after a route upsert)."""
+        stations = {str(s) for s in stations}
+        if not stations:
+            return
+        rows = df[df["Station"].astype(str).isin(stations)]
+        kept = self.table[~self.table.index.isin(stations)]
+        fresh = aggregate(rows)
+        self.table = pd.concat([kept, fresh]) if len(kept) else fresh
+
+    # ------------------------
+    # Queries
+    # ------------------------
+    def top(self, k: int = 10, by: str = "total_delay") -> pd.DataFrame:
+        """The k stations with the highest `by` (any rollup column)."""
+        if by not in self.table.columns:
+            raise ValueError(f"Unknown rollup column: {by}")
+        return self.table.nlargest(k, by)
+
+    def get(self, station: str) -> Optional[dict]:
+        station = str(station).strip().upper()
+        if station not in self.table.index:
+            return None
+        return dict(self.table.loc[station], Station=station)
+
+    # ------------------------
+    # Persistence
+    # ------------------------
+    def save(self, path: str, key: str):
+        from dataset_cache import write_derived
+        write_derived(self.table.reset_index(), path, f"v{ROLLUP_VERSION}:{key}")
+
+    @classmethod
+    def load(cls, path: str, key: Optional[str] = None) -> Optional["StationRollups"]:
+        """
+        Read a saved table. With `key`, only if it was saved for that dataset;
+        without, whatever is on disk (for read-only dashboards).
+        """
+        from dataset_cache import read_derived, read_frame
+
+        if key is not None:
+            table = read_derived(path, f"v{ROLLUP_VERSION}:{key}")
+        else:
+            try:
+                table = read_frame(path)
+            except (OSError, ValueError):
+                table = None
+        if table is None:
+            return None
+        return cls(table.set_index("Station"))
+
+
+def load_rollups(df: pd.DataFrame, path: Optional[str], key: str) -> StationRollups:
+    """Saved rollups for this dataset, or build and save them."""
+    rollups = StationRollups.load(path, key) if path else None
+    if rollups is None:
+        rollups = StationRollups.build(df)
+        if path:
+            rollups.save(path, key)
+    return rollups
+
+
+def main(argv=None):
+    from dataset_cache import DEFAULT_CACHE_FILE, derived_file
+    from supervised_model import DATA_FILE, predictor
+
+    parser = argparse.ArgumentParser(description="Station delay hotspots")
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--by", default="total_delay", choices=COLUMNS[2:])
+    args = parser.parse_args(argv)
+
+    rollups = StationRollups.load(derived_file(DATA_FILE or DEFAULT_CACHE_FILE, "stations"))
+    if rollups is None:
+        rollups = predictor.load().rollups
+    with pd.option_context("display.width", 160, "display.max_columns", None):
+        print(rollups.top(args.top, args.by).round(2))
+
+
+if __name__ == "__main__":
+    main()
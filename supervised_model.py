@@ -1,132 +1,727 @@
 # supervised_model.py
-import glob, os
-import pandas as pd
+import os
+import threading
 import numpy as np
-from sklearn.model_selection import train_test_split
-from sklearn.ensemble import RandomForestRegressor
-import joblib
 import warnings
 
+import metrics
+
 warnings.filterwarnings("ignore")
 
-# Edit this folder if your CSVs are somewhere else
-CSV_FOLDER = r"C:\DATA\Joseph Jisso\SIH\SL_Logistic Regression\Train_Route"
-
-MODEL_FILE = "delay_model.pkl"
-DATA_FILE = "train_dataset.csv"
-
-def _load_dataset():
-    files = glob.glob(os.path.join(CSV_FOLDER, "*.csv"))
-    if len(files) == 0:
-        raise SystemExit("❌ No CSV files found in folder: " + CSV_FOLDER)
-
-    df_list = []
-    for f in files:
-        tmp = pd.read_csv(f, engine="python", skip_blank_lines=True)
-        train_no = os.path.splitext(os.path.basename(f))[0]
-        tmp["TrainNo"] = str(train_no).strip().upper()
-        df_list.append(tmp)
-
-    df = pd.concat(df_list, ignore_index=True)
-    df.columns = [c.strip() for c in df.columns]
-
-    # Standardize columns
-    df = df.rename(
-        columns={
-            "Average_Delay(min)": "avg_delay",
-            "Right Time (0-15 min's)": "p_on_time",
-            "Slight Delay (15-60 min's)": "p_slight",
-            "Significant Delay (>1 Hour)": "p_significant",
-            "Cancelled/Unknown": "p_cancelled",
-        },
-        errors="ignore",
-    )
-
-    for col in ["TrainNo", "Station", "Station_Name"]:
-        if col in df.columns:
-            df[col] = df[col].astype(str).str.strip().str.upper()
-
-    return df
-
-# Load dataset (always load so we can query rows)
-if os.path.isfile(DATA_FILE):
-    df = pd.read_csv(DATA_FILE)
-    # ensure uppercase keys present
-    for col in ["TrainNo", "Station", "Station_Name"]:
-        if col in df.columns:
-            df[col] = df[col].astype(str).str.strip().str.upper()
-else:
-    df = _load_dataset()
-    df.to_csv(DATA_FILE, index=False)
-
-# Feature columns used for the model
-feature_cols = ["p_on_time", "p_slight", "p_significant", "p_cancelled"]
+# Paths can be overridden with environment variables; edit the defaults
+# if your CSVs are somewhere else. CSV_FOLDER may also name route ZIP
+# archives, separated by os.pathsep
+CSV_FOLDER = os.environ.get(
+    "RAILOPTIMUS_CSV_FOLDER",
+    r"C:\DATA\Joseph Jisso\SIH\SL_Logistic Regression\Train_Route",
+)
 
-# Try load model; if missing, train from CSV and save
-if os.path.isfile(MODEL_FILE):
-    model = joblib.load(MODEL_FILE)
-else:
-    print("[supervised_model] No saved model found — training now (this may take a moment)...")
-    X = df[feature_cols].fillna(0).astype(float)
-    y = df["avg_delay"].astype(float)
-    X_train, X_test, y_train, y_test = train_test_split(
-        X, y, test_size=0.2, random_state=42
-    )
-    model = RandomForestRegressor(n_estimators=100, random_state=42)
-    model.fit(X_train, y_train)
-    joblib.dump(model, MODEL_FILE)
-    print("[supervised_model] Model trained and saved to", MODEL_FILE)
-    print("Test R2:", model.score(X_test, y_test))
+# An explicit model file wins; otherwise the model registry's current
+# version (see train_model.py), falling back to delay_model.pkl. Models
+# trained here use model_backends.BACKEND (RAILOPTIMUS_MODEL_BACKEND), or
+# the backend the registry version was trained with
+MODEL_FILE = os.environ.get("RAILOPTIMUS_MODEL_FILE")
+DEFAULT_MODEL_FILE = "delay_model.pkl"
+# Columnar dataset cache (.feather, .parquet or .pkl), refreshed per changed
+# route file; None picks dataset_cache.DEFAULT_CACHE_FILE
+DATA_FILE = os.environ.get("RAILOPTIMUS_DATA_FILE")
 
-def predict_delay(train_no: str, station_code: str, station_name: str = None) -> float:
+# Incremental refresh: refit once this fraction of rows changed since the
+# last fit, by growing the forest with extra warm-started trees
+REFIT_THRESHOLD = float(os.environ.get("RAILOPTIMUS_REFIT_THRESHOLD", "0.05"))
+REFIT_EXTRA_TREES = int(os.environ.get("RAILOPTIMUS_REFIT_EXTRA_TREES", "10"))
+MAX_TREES = 300  # past this a refit retrains from scratch instead
+
+# Flattened NumPy copy of the forest (see flat_forest.py), memory-mapped at
+# load; None means "<model file without extension>.flat". Batches larger
+# than FLAT_MAX_ROWS go to the sklearn model, which is faster in bulk
+FLAT_MODEL_DIR = os.environ.get("RAILOPTIMUS_FLAT_MODEL")
+FLAT_MAX_ROWS = 512
+
+# predict_route: share of a known excess delay still carried at each
+# following stop (the rest is recovered from schedule slack)
+DELAY_RECOVERY = float(os.environ.get("RAILOPTIMUS_DELAY_RECOVERY", "0.97"))
+
+# predict_interval(s): quantiles of the per-tree predictions reported
+# alongside the mean when the caller does not ask for others
+QUANTILES = (0.1, 0.9)
+
+# Feature columns used by models without registry metadata (delay_model.pkl);
+# registered models list their own (see features.py)
+feature_cols = ["p_on_time", "p_slight", "p_significant", "p_cancelled"]
+
+def _load_dataset(csv_folder: str = None):
     """
-    Returns predicted average delay in minutes (float).
-    - train_no: train number string
-    - station_code: station code string
-    - station_name: optional station name
+    Read every route CSV from csv_folder. The value may be a folder, a ZIP
+    archive or several of either separated by os.pathsep.
     """
+    from ingest import load_routes
+
+    return load_routes(csv_folder or CSV_FOLDER)
+
+def quantile_label(q: float) -> str:
+    """0.9 -> "p90", 0.975 -> "p97.5" (the key a quantile is reported under)."""
+    return "p%g" % round(q * 100, 6)
+
+def _normalize_key(train_no, station_code, station_name=None):
     train_no = str(train_no).strip().upper()
     station_code = str(station_code).strip().upper() if station_code else ""
+    station_name = str(station_name).strip().upper() if station_name else None
+    return train_no, station_code, station_name
+
+# What DelayPredictor.reload() replaces; the lock, version and configuration stay
+_LOADED_STATE = ("registry", "model_version", "model_file", "feature_cols", "backend_name",
+                 "flat_dir", "index", "rollups", "flat", "_model")
+
+class DelayPredictor:
+    """
+    Owns the route dataset, its lookup index and the delay model.
+    Nothing is read from disk until load() is called or the first
+    prediction is requested.
+    """
+
+    def __init__(self, csv_folder: str = None, model_file: str = None, data_file: str = None,
+                 flat_dir: str = None, backend: str = None):
+        self.csv_folder = csv_folder or CSV_FOLDER
+        self._backend = backend
+        self._model_file = model_file or MODEL_FILE
+        self._flat_dir = flat_dir or FLAT_MODEL_DIR
+        self.data_file = data_file or DATA_FILE
+        self.feature_cols = list(feature_cols)
+        self._resolve_model_file()
+
+        self.index = None
+        self.rollups = None
+        self.flat = None
+        self._model = None
+        self._lock = threading.Lock()
+        # Per-train baseline stop predictions for predict_route(s)
+        self._routes = {}
+        self._routes_version = None
+        # Bumped whenever predictions may change (load, fit, dataset edit)
+        self.version = 0
+        # disk_signature() right after this process last wrote the model or
+        # dataset, so CachedPredictor does not reload on its own writes
+        self.written_signature = None
+
+    def _resolve_model_file(self):
+        """Pick the model file: explicit, else the registry's current version, else the default."""
+        from model_backends import BACKEND
+        from model_registry import ModelRegistry
+
+        self.registry = ModelRegistry()
+        self.model_version = None
+        self.model_file = self._model_file
+        self.feature_cols = list(feature_cols)
+        meta = {}
+        if self.model_file is None:
+            self.model_version = self.registry.current()
+            self.model_file = (self.registry.model_file(self.model_version) if self.model_version
+                               else DEFAULT_MODEL_FILE)
+            if self.model_version:
+                meta = self.registry.meta(self.model_version)
+                self.feature_cols = list(meta.get("features", feature_cols))
+        # Backend for (re)training; a loaded model is used whatever it is
+        self.backend_name = self._backend or meta.get("backend") or BACKEND
+        self.flat_dir = self._flat_dir or os.path.splitext(self.model_file)[0] + ".flat"
+
+    # ------------------------
+    # Lifecycle
+    # ------------------------
+    @property
+    def loaded(self) -> bool:
+        return self.index is not None and (self.flat is not None or self._model is not None)
+
+    def disk_signature(self) -> tuple:
+        """Size/mtime of the model and dataset files, to notice edits by other processes."""
+        sig = []
+        for path in (self.model_file, self.data_file or self.cache().cache_file,
+                     os.path.join(self.registry.root, "CURRENT")):
+            try:
+                st = os.stat(path)
+                sig.append((st.st_size, st.st_mtime_ns))
+            except OSError:
+                sig.append(None)
+        return tuple(sig)
+
+    def reload(self):
+        """
+        Load everything again from disk (picking up a newly promoted registry
+        version), then swap it in; predictions keep using the old state until then.
+        """
+        fresh = type(self)(self.csv_folder, self._model_file, self.data_file, self._flat_dir, self._backend)
+        fresh.load()
+        with self._lock:
+            # One update, so readers see the old state or the new one, never a half-loaded mix
+            self.__dict__.update({k: fresh.__dict__[k] for k in _LOADED_STATE})
+            self.version += 1
+        return self
+
+    @property
+    def backend(self):
+        """The model_backends.Backend that train() and full refits fit with."""
+        from model_backends import get_backend
+        return get_backend(self.backend_name)
+
+    @property
+    def model(self):
+        """The sklearn model; only unpickled when something needs it."""
+        if self._model is None and os.path.isfile(self.model_file):
+            import joblib
+            self._model = joblib.load(self.model_file)
+        return self._model
+
+    @property
+    def df(self):
+        """The live dataset (reflects upsert_train / remove_train)."""
+        return self.index.live_frame() if self.index is not None else None
+
+    def cache(self):
+        from dataset_cache import DEFAULT_CACHE_FILE, DatasetCache
+        return DatasetCache(self.data_file or DEFAULT_CACHE_FILE, self.csv_folder)
+
+    def load_dataset(self):
+        """
+        Load the dataset (columnar cache, refreshed from the route files), add
+        the engineered features and station rollups (both cached alongside)
+        and build the lookup index.
+        """
+        from dataset_cache import dataset_key, derived_file
+        from dataset_index import DatasetIndex
+        from features import ROUTE_FEATURES, load_features
+        from station_rollups import load_rollups
+
+        cache = self.cache()
+        raw = cache.load()
+        key = dataset_key(raw)
+        df = load_features(raw, derived_file(cache.cache_file, "features"), key)
+        self.rollups = load_rollups(raw, derived_file(cache.cache_file, "stations"), key)
+
+        # Lookup tables for predict_delay's fallback chain (built once);
+        # the engineered columns are kept only as the index's feature matrix
+        self.index = DatasetIndex(df, self.feature_cols, drop_cols=ROUTE_FEATURES)
+        return df
+
+    def load(self):
+        """Load dataset and model; trains and saves a model if none is found."""
+        with self._lock:
+            if self.loaded:
+                return self
+            if self.index is None:
+                with metrics.timer("load_dataset"):
+                    self.load_dataset()
+            from flat_forest import FlatForest
+            if FlatForest.is_fresh(self.flat_dir, self.model_file):
+                with metrics.timer("load_model"):
+                    self.flat = FlatForest.load(self.flat_dir)
+            elif os.path.isfile(self.model_file):
+                with metrics.timer("load_model"):
+                    self._export_flat(self.model)
+            else:
+                print("[supervised_model] No saved model found — training now (this may take a moment)...")
+                self._train()
+            n_features = self.flat.n_features if self.flat is not None else self.model.n_features_in_
+            if n_features != len(self.feature_cols):
+                raise ValueError(f"{self.model_file} expects {n_features} features, "
+                                 f"configured for {len(self.feature_cols)}: {self.feature_cols}")
+            self.version += 1
+        return self
+
+    def train(self, save: bool = True):
+        """Fit a fresh model on the loaded dataset (loading it first if needed)."""
+        with self._lock:
+            if self.index is None:
+                self.load_dataset()
+            return self._train(save)
+
+    def _train(self, save: bool = True):
+        from sklearn.model_selection import train_test_split
+
+        df = self.df
+        X = self._live_features()
+        y = df["avg_delay"].astype(float)
+        X_train, X_test, y_train, y_test = train_test_split(
+            X, y, test_size=0.2, random_state=42
+        )
+        model = self.backend.make(seed=42, n_jobs=-1)
+        with metrics.timer("train"):
+            model.fit(X_train, y_train)
+        self._model = model
+        self.flat = None
+        self.version += 1
+        if save:
+            self._save_model(model, "full")
+            print(f"[supervised_model] Model ({self.backend.name}) trained and saved to", self.model_file)
+            self._write_drift({"rows_at_fit": len(df), "rows_changed": 0})
+        print("Test R2:", model.score(X_test, y_test))
+        return model
+
+    def _live_features(self):
+        import pandas as pd
+        return pd.DataFrame(self.index.live_X(), columns=self.feature_cols)
+
+    def _save_model(self, model, refit: str = "full"):
+        """
+        Save a newly fitted model. Registry versions are never overwritten: a
+        model loaded from the registry is replaced by registering (and
+        promoting) the new fit as the next version, which is then the one served.
+        """
+        if self.model_version is not None:
+            self._register_refit(model, refit)
+        else:
+            import joblib
+            joblib.dump(model, self.model_file)
+        self._export_flat(model)
+        self.written_signature = self.disk_signature()
+
+    def _register_refit(self, model, refit: str):
+        from features import BASE_FEATURES, TARGET
+        from model_registry import dataset_hash
+
+        df = self.df
+        meta = self.registry.meta(self.model_version)
+        current = model.get_params()
+        meta.update(
+            data_hash=dataset_hash(df, ["TrainNo", "Station"] + BASE_FEATURES + [TARGET]),
+            n_rows=int(len(df)),
+            n_trains=int(df["TrainNo"].nunique()),
+            params={k: current.get(k, v) for k, v in meta.get("params", {}).items()},
+            # The parent's cross-validation scores do not describe this fit
+            metrics={},
+            search=None,
+            refit={"from": self.model_version, "kind": refit},
+        )
+        self.model_version = self.registry.register(model, meta, promote=True)
+        self.model_file = self.registry.model_file(self.model_version)
+        self.flat_dir = self._flat_dir or os.path.splitext(self.model_file)[0] + ".flat"
+
+    def _export_flat(self, model):
+        from flat_forest import FlatForest
+        if not hasattr(model, "estimators_") and not hasattr(model, "tree_"):
+            return
+        flat = FlatForest.from_model(model)
+        try:
+            flat.save(self.flat_dir, source=self.model_file)
+        except OSError as e:
+            print("[supervised_model] Could not export flat model:", e)
+        self.flat = flat
+
+    def _predict_matrix(self, X) -> np.ndarray:
+        if self.flat is not None and len(X) <= FLAT_MAX_ROWS:
+            return self.flat.predict(X)
+        return np.asarray(self.model.predict(X), dtype=float)
+
+    def _predict_trees(self, X) -> np.ndarray:
+        """Every tree's prediction, shape (n_rows, n_trees); a single column for non-forest models."""
+        if self.flat is not None and len(X) <= FLAT_MAX_ROWS:
+            return self.flat.predict_trees(X)
+        trees = getattr(self.model, "estimators_", None)
+        if trees is None:
+            return np.asarray(self.model.predict(X), dtype=float).reshape(-1, 1)
+        # Validate once instead of once per tree
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        out = np.empty((len(X), len(trees)))
+        for j, tree in enumerate(trees):
+            out[:, j] = tree.predict(X, check_input=False)
+        return out
+
+    @staticmethod
+    def _summarize(trees: np.ndarray, quantiles) -> dict:
+        """Mean, spread and quantiles across trees, all rows at once."""
+        out = {"delay": trees.mean(axis=1), "std": trees.std(axis=1)}
+        if len(quantiles):
+            for q, values in zip(quantiles, np.quantile(trees, quantiles, axis=1)):
+                out[quantile_label(q)] = values
+        return out
+
+    # ------------------------
+    # Incremental refresh
+    # ------------------------
+    @property
+    def _drift_file(self) -> str:
+        # Next to the dataset cache it counts edits of; registry versions stay untouched
+        return self.cache().cache_file + ".refresh.json"
+
+    def _read_drift(self) -> dict:
+        """Rows at the last fit and rows changed since, for the model being served."""
+        import json
+        try:
+            with open(self._drift_file, "r", encoding="utf-8") as fh:
+                state = json.load(fh)
+        except (OSError, ValueError):
+            state = {}
+        # Counted for another model (e.g. a newly promoted version): start from its fit
+        if state.get("model") != os.path.abspath(self.model_file):
+            return {"rows_at_fit": self.index.global_count, "rows_changed": 0}
+        return state
 
-    # try exact train+station match
-    match = df[(df["TrainNo"] == train_no) & (df["Station"] == station_code)]
-    if not match.empty:
-        X_row = match[feature_cols].iloc[0].fillna(0).values.reshape(1, -1)
-        return float(model.predict(X_row)[0])
-
-    # try station name match if provided
-    if station_name:
-        station_name = str(station_name).strip().upper()
-        match2 = df[(df["TrainNo"] == train_no) & (df["Station_Name"] == station_name)]
-        if not match2.empty:
-            X_row = match2[feature_cols].iloc[0].fillna(0).values.reshape(1, -1)
-            return float(model.predict(X_row)[0])
-
-    # try average across the train
-    train_rows = df[df["TrainNo"] == train_no]
-    if not train_rows.empty:
-        X_avg = train_rows[feature_cols].fillna(0).mean().values.reshape(1, -1)
-        return float(model.predict(X_avg)[0])
-
-    # try average across the station
-    if station_code:
-        station_rows = df[df["Station"] == station_code]
-        if not station_rows.empty:
-            X_avg = station_rows[feature_cols].fillna(0).mean().values.reshape(1, -1)
-            return float(model.predict(X_avg)[0])
-
-    # global fallback: mean features
-    X_mean = df[feature_cols].fillna(0).mean().values.reshape(1, -1)
-    return float(model.predict(X_mean)[0])
+    def _write_drift(self, state: dict):
+        import json
+        with open(self._drift_file, "w", encoding="utf-8") as fh:
+            json.dump(dict(state, model=os.path.abspath(self.model_file)), fh)
+
+    def upsert_train(self, train_no: str, rows, refit: bool = True, persist: bool = True,
+                     source=None) -> dict:
+        """
+        Replace (or add) one train's route rows in the live dataset and its
+        lookup tables, without reloading anything. `rows` is a DataFrame with
+        the canonical columns (see ingest.read_route); `source` is the route
+        file it came from, recorded in the cache manifest.
+        """
+        from features import add_features, station_stats
+
+        self.ensure_loaded()
+        train_no = _normalize_key(train_no, "")[0]
+        rows = rows.copy()
+        for col in ["Station", "Station_Name"]:
+            if col in rows.columns:
+                rows[col] = rows[col].astype(str).str.strip().str.upper()
+        rows["TrainNo"] = train_no
+        # Station encodings come from the current dataset; other trains'
+        # encodings catch up on the next full load
+        rows = add_features(rows, station_stats(self.df))
+        with self._lock:
+            stations = self._train_stations(train_no) | set(rows["Station"])
+            removed = self.index.upsert_train(train_no, rows)
+        return self._after_change(train_no, removed, len(rows), refit, persist, source, stations)
+
+    def remove_train(self, train_no: str, refit: bool = True, persist: bool = True) -> dict:
+        """Remove one train's rows from the live dataset and its lookup tables."""
+        self.ensure_loaded()
+        train_no = _normalize_key(train_no, "")[0]
+        with self._lock:
+            stations = self._train_stations(train_no)
+            removed = self.index.remove_train(train_no)
+        return self._after_change(train_no, removed, 0, refit, persist, stations=stations)
+
+    def _train_stations(self, train_no: str) -> set:
+        rows = self.index.rows_of(train_no)
+        return set() if rows is None else set(self.index.values("Station", rows))
+
+    def _after_change(self, train_no, removed, added, refit, persist, source=None, stations=()) -> dict:
+        self.version += 1
+        state = self._read_drift()
+        state["rows_changed"] = state.get("rows_changed", 0) + removed + added
+        self._write_drift(state)
+        df = self.df
+        self.rollups.update(df, stations)
+        if persist:
+            from dataset_cache import dataset_key, derived_file
+
+            cache = self.cache()
+            cache.save_upsert(df, source)
+            self.rollups.save(derived_file(cache.cache_file, "stations"), dataset_key(df))
+            self.written_signature = self.disk_signature()
+
+        result = {"train": train_no, "rows_removed": removed, "rows_added": added,
+                  "drift": self.drift(), "refit": None}
+        if refit:
+            result["refit"] = self.refit_if_drifted()
+        return result
+
+    def drift(self) -> float:
+        """Fraction of rows changed since the model was last fitted."""
+        state = self._read_drift()
+        return state.get("rows_changed", 0) / max(state.get("rows_at_fit", 0), 1)
+
+    def refit_if_drifted(self, threshold: float = None, extra_trees: int = None):
+        """
+        Refit once drift() crosses the threshold: warm-start extra trees on
+        the live dataset, or retrain from scratch past MAX_TREES (and always
+        for backends that are not forests).
+        Returns None, "warm_start" or "full".
+        """
+        from model_backends import backend_of
+
+        threshold = REFIT_THRESHOLD if threshold is None else threshold
+        extra_trees = REFIT_EXTRA_TREES if extra_trees is None else extra_trees
+        if self.drift() < threshold:
+            return None
+
+        with self._lock:
+            n_trees = getattr(self.model, "n_estimators", 0) + extra_trees
+            if not backend_of(self.model).forest or n_trees > MAX_TREES:
+                self._train()
+                return "full"
+
+            df = self.df
+            X = self._live_features()
+            y = df["avg_delay"].astype(float)
+            self.model.set_params(warm_start=True, n_estimators=n_trees)
+            try:
+                self.model.fit(X, y)
+            finally:
+                # Saved (and later refit) like any other model
+                self.model.set_params(warm_start=False)
+            self._save_model(self.model, "warm_start")
+            self.version += 1
+            self._write_drift({"rows_at_fit": len(df), "rows_changed": 0})
+            print(f"[supervised_model] Warm-started {extra_trees} extra trees ({n_trees} total)")
+        return "warm_start"
+
+    def ensure_loaded(self):
+        if not self.loaded:
+            self.load()
+        return self
+
+    # ------------------------
+    # Predictions
+    # ------------------------
+    def predict_delay(self, train_no: str, station_code: str, station_name: str = None) -> float:
+        """
+        Returns predicted average delay in minutes (float).
+        - train_no: train number string
+        - station_code: station code string
+        - station_name: optional station name
+        """
+        self.ensure_loaded()
+        train_no, station_code, station_name = _normalize_key(train_no, station_code, station_name)
+
+        # exact -> name -> train avg -> station avg -> global, all O(1) lookups
+        with metrics.timer("resolve"):
+            X_row, tier = self.index.resolve(train_no, station_code, station_name)
+        if metrics.ENABLED:
+            metrics.inc("fallback_tier_total", tier=tier)
+        with metrics.timer("model"):
+            return float(self._predict_matrix(X_row.reshape(1, -1))[0])
+
+    def predict_delays(self, pairs):
+        """
+        Batch version of predict_delay: one model.predict call for all rows.
+        - pairs: iterable of (train_no, station_code) or (train_no, station_code, station_name)
+        Returns (delays: np.ndarray of float, tiers: list of fallback tier names).
+        """
+        X, tiers = self._resolve_pairs(pairs)
+        if X is None:
+            return np.empty(0, dtype=float), tiers
+        with metrics.timer("model_batch"):
+            return self._predict_matrix(X), tiers
+
+    def _resolve_pairs(self, pairs):
+        self.ensure_loaded()
+        rows = []
+        tiers = []
+        with metrics.timer("resolve_batch"):
+            for p in pairs:
+                key = _normalize_key(*p)
+                X_row, tier = self.index.resolve(*key)
+                rows.append(X_row)
+                tiers.append(tier)
+        metrics.count_values("fallback_tier_total", "tier", tiers)
+        return (np.vstack(rows) if rows else None), tiers
+
+    def predict_interval(self, train_no: str, station_code: str, station_name: str = None,
+                         quantiles=None) -> dict:
+        """
+        predict_delay plus the spread of the forest's trees:
+        {"delay": mean, "std": ..., "p10": ..., "p90": ..., "tier": ...}
+        with one pNN entry per quantile (default QUANTILES). Models that are
+        not forests (hgb, linear backends) report std 0 and every quantile
+        equal to the delay.
+        """
+        out, tiers = self.predict_intervals([(train_no, station_code, station_name)], quantiles)
+        result = {k: float(v[0]) for k, v in out.items()}
+        result["tier"] = tiers[0]
+        return result
+
+    def predict_intervals(self, pairs, quantiles=None):
+        """
+        Batch predict_interval: every tree scores the whole batch once and the
+        mean, standard deviation and quantiles are taken across trees.
+        Returns (dict of np.ndarray keyed "delay", "std", "pNN"..., tiers).
+        """
+        quantiles = QUANTILES if quantiles is None else tuple(dict.fromkeys(quantiles))
+        X, tiers = self._resolve_pairs(pairs)
+        if X is None:
+            return self._summarize(np.empty((0, 1)), quantiles), tiers
+        with metrics.timer("model_batch"):
+            return self._summarize(self._predict_trees(X), quantiles), tiers
+
+    def predict_columns(self, train_nos, station_codes, station_names=None):
+        """
+        Column-wise predict_delays for bulk scoring: keys are normalized and
+        resolved with vectorized index joins instead of one lookup per row.
+        Returns (delays: np.ndarray of float, tiers: np.ndarray of tier names).
+        """
+        X, tiers = self._resolve_columns(train_nos, station_codes, station_names)
+        if not len(X):
+            return np.empty(0, dtype=float), tiers
+        # Timetables repeat the same train/station many times: score each
+        # distinct feature row once
+        with metrics.timer("model_batch"):
+            uniq, inverse = np.unique(X, axis=0, return_inverse=True)
+            return self._predict_matrix(uniq)[inverse.ravel()], tiers
+
+    def predict_interval_columns(self, train_nos, station_codes, station_names=None, quantiles=None):
+        """
+        Column-wise predict_intervals for bulk scoring.
+        Returns (dict of np.ndarray keyed "delay", "std", "pNN"..., tiers array).
+        """
+        quantiles = QUANTILES if quantiles is None else tuple(dict.fromkeys(quantiles))
+        X, tiers = self._resolve_columns(train_nos, station_codes, station_names)
+        with metrics.timer("model_batch"):
+            uniq, inverse = np.unique(X, axis=0, return_inverse=True)
+            trees = self._predict_trees(uniq) if len(uniq) else np.empty((0, 1))
+            out = self._summarize(trees, quantiles)
+        return {k: v[inverse.ravel()] for k, v in out.items()}, tiers
+
+    def _resolve_columns(self, train_nos, station_codes, station_names=None):
+        import pandas as pd
+
+        self.ensure_loaded()
+
+        def norm(values):
+            s = pd.Series(values, dtype=object)
+            missing = s.isna()
+            s = s.astype(str).str.strip().str.upper()
+            s[missing] = ""
+            return s.to_numpy(dtype=object)
+
+        train_nos, station_codes = norm(train_nos), norm(station_codes)
+        if station_names is not None:
+            station_names = norm(station_names)
+        with metrics.timer("resolve_batch"):
+            X, tiers = self.index.resolve_frame(train_nos, station_codes, station_names)
+        if metrics.ENABLED:
+            for tier, n in zip(*np.unique(tiers.astype(str), return_counts=True)):
+                metrics.inc("fallback_tier_total", int(n), tier=tier)
+        return X, tiers
+
+    # ------------------------
+    # Route profiles
+    # ------------------------
+    def _route_delays(self, trains) -> dict:
+        """Baseline prediction for every stop of each train, cached until the next version bump."""
+        with self._lock:
+            if self._routes_version != self.version:
+                self._routes = {}
+                self._routes_version = self.version
+            missing = [t for t in dict.fromkeys(trains) if t not in self._routes]
+            rows = [self.index.rows_of(t) for t in missing]
+            missing = [t for t, r in zip(missing, rows) if r is not None]
+            rows = [r for r in rows if r is not None]
+            if missing:
+                pred = self._predict_matrix(self.index.X[np.concatenate(rows)])
+                for t, part in zip(missing, np.split(pred, np.cumsum([len(r) for r in rows])[:-1])):
+                    self._routes[t] = part
+            return self._routes
+
+    def predict_route(self, train_no: str, from_station: str = None, current_delay: float = None,
+                      recovery: float = None):
+        """
+        Delay profile for every remaining stop of a train, in route order.
+        - from_station: station code or name to start from (default: origin);
+          free text is matched through the station resolver
+        - current_delay: delay observed now at from_station, in minutes; the
+          gap to the model's prediction there is carried forward, shrinking
+          by `recovery` (default DELAY_RECOVERY) per stop
+        Returns a DataFrame: stop_index, Station, Station_Name,
+        predicted_delay, projected_delay.
+        """
+        positions = [(train_no, from_station, current_delay)]
+        return self.predict_routes(positions, recovery).drop(columns="TrainNo")
+
+    def predict_routes(self, positions, recovery: float = None):
+        """
+        predict_route for many trains at once (e.g. the whole fleet every
+        minute): one model call for routes not yet cached, then pure array work.
+        - positions: iterable of train_no or (train_no, from_station, current_delay)
+        Returns one DataFrame with a TrainNo column; unknown trains or
+        stations raise ValueError.
+        """
+        import pandas as pd
+
+        self.ensure_loaded()
+        recovery = DELAY_RECOVERY if recovery is None else recovery
+        positions = [tuple(p) + (None,) * (3 - len(p)) if isinstance(p, (tuple, list)) else (str(p), None, None)
+                     for p in positions]
+        trains = [_normalize_key(p[0], "")[0] for p in positions]
+        baseline = self._route_delays(trains)
+
+        starts, sel, preds, excess = [], [], [], []
+        for train, (_, from_station, current_delay) in zip(trains, positions):
+            rows = self.index.rows_of(train)
+            if rows is None:
+                raise ValueError(f"Unknown train: {train}")
+            start = 0
+            if from_station:
+                key = str(from_station).strip().upper()
+                hit = self.index.find_stop(rows, key)
+                if not len(hit):
+                    raise ValueError(f"{key} is not on the route of train {train}")
+                start = int(hit[0])
+            pred = baseline[train][start:]
+            starts.append(start)
+            sel.append(rows[start:])
+            preds.append(pred)
+            excess.append(np.nan if current_delay is None or not len(pred)
+                          else float(current_delay) - pred[0])
+
+        lengths = np.array([len(r) for r in sel], dtype=np.int64)
+        rows = np.concatenate(sel) if sel else np.empty(0, dtype=np.int64)
+        pred = np.concatenate(preds) if preds else np.empty(0)
+        # Stops since from_station, for every output row
+        offset = np.arange(len(rows)) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        carried = np.repeat(np.asarray(excess, dtype=float), lengths) * recovery ** offset
+        projected = np.where(np.isnan(carried), pred, np.maximum(pred + carried, 0.0))
+        stations = self.index.values("Station", rows)
+        names = (self.index.values("Station_Name", rows) if "Station_Name" in self.index.df.columns
+                 else stations)
+        return pd.DataFrame({
+            "TrainNo": np.repeat(np.asarray(trains, dtype=object), lengths),
+            "stop_index": offset + np.repeat(np.asarray(starts, dtype=np.int64), lengths),
+            "Station": stations,
+            "Station_Name": names,
+            "predicted_delay": pred,
+            "projected_delay": projected,
+        })
+
+    def get_train_station_row(self, train_no: str, station_code: str):
+        """Return the raw dataset row for train+station if available, else None."""
+        self.ensure_loaded()
+        train_no, station_code, _ = _normalize_key(train_no, station_code)
+        return self.index.row(train_no, station_code)
+
+    def resolve_station(self, text: str, limit: int = 5) -> list:
+        """
+        Ranked station candidates for free text (a code, a name or a
+        misspelling of either), best first:
+        [{"code": "KGP", "name": "KHARAGPUR JN", "score": 1.0, "match": "code"}, ...]
+        """
+        self.ensure_loaded()
+        return self.index.stations.candidates(text, limit)
+
+# ------------------------
+# Module-level API (shared default predictor, loaded on first use)
+# ------------------------
+predictor = DelayPredictor()
+
+def predict_delay(train_no: str, station_code: str, station_name: str = None) -> float:
+    return predictor.predict_delay(train_no, station_code, station_name)
+
+def predict_delays(pairs):
+    return predictor.predict_delays(pairs)
+
+def predict_interval(train_no: str, station_code: str, station_name: str = None, quantiles=None) -> dict:
+    return predictor.predict_interval(train_no, station_code, station_name, quantiles)
+
+def predict_intervals(pairs, quantiles=None):
+    return predictor.predict_intervals(pairs, quantiles)
 
 def get_train_station_row(train_no: str, station_code: str):
-    """Return the raw dataset row for train+station if available, else None."""
-    train_no = str(train_no).strip().upper()
-    station_code = str(station_code).strip().upper() if station_code else ""
-    match = df[(df["TrainNo"] == train_no) & (df["Station"] == station_code)]
-    if not match.empty:
-        return match.iloc[0].to_dict()
-    return None
+    return predictor.get_train_station_row(train_no, station_code)
+
+def predict_route(train_no: str, from_station: str = None, current_delay: float = None):
+    return predictor.predict_route(train_no, from_station, current_delay)
+
+def resolve_station(text: str, limit: int = 5) -> list:
+    return predictor.resolve_station(text, limit)
+
+def __getattr__(name):
+    # Keep supervised_model.df / .model / .index working for older callers
+    if name in ("df", "model", "index"):
+        return getattr(predictor.ensure_loaded(), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 if __name__ == "__main__":
     # quick test
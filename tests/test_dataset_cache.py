@@ -0,0 +1,72 @@
+# tests/test_dataset_cache.py
+import os
+
+import pytest
+
+from dataset_cache import DEFAULT_CACHE_FILE
+from ingest import read_route
+from supervised_model import DelayPredictor
+
+HEADER = ("Station,Station_Name,Average_Delay(min),Right Time (0-15 min's),"
+          "Slight Delay (15-60 min's),Significant Delay (>1 Hour),Cancelled/Unknown\n")
+
+
+def write_route(path, stops, delay=10):
+    with open(path, "w", encoding="utf-8") as fh:
+        fh.write(HEADER)
+        for k, code in enumerate(stops):
+            fh.write(f"{code},{code} JN ,{delay + 5 * k},80.00,10.00,8.00,2.00\n")
+
+
+@pytest.fixture
+def network(tmp_path):
+    routes = tmp_path / "routes"
+    routes.mkdir()
+    write_route(routes / "100.csv", ["HWH", "KGP", "BBS"])
+    write_route(routes / "200.csv", ["KGP", "RNC", "BSP"])
+    write_route(routes / "300.csv", ["NDLS", "CNB"])
+    external = tmp_path / "ext"
+    external.mkdir()
+    write_route(external / "77777.csv", ["PURI", "KUR", "CTC"], delay=40)
+
+    def predictor():
+        return DelayPredictor(csv_folder=str(routes), model_file=str(tmp_path / "delay_model.pkl"),
+                              data_file=str(tmp_path / DEFAULT_CACHE_FILE), backend="linear").load()
+
+    return routes, str(external / "77777.csv"), predictor
+
+
+def test_external_upsert_survives_reload(network):
+    routes, external, predictor = network
+    p = predictor()
+    p.upsert_train("77777", read_route((external, None)), refit=False, source=(external, None))
+
+    assert predictor().predict_delays([("77777", "KUR")])[1] == ["exact"]
+
+    # Re-ingesting other, changed routes keeps the pinned train too
+    write_route(routes / "300.csv", ["NDLS", "CNB", "ALD"], delay=20)
+    q = predictor()
+    assert q.predict_delays([("77777", "KUR"), ("300", "ALD")])[1] == ["exact", "exact"]
+
+
+def test_folder_route_replaces_pinned_upsert(network):
+    routes, external, predictor = network
+    predictor().upsert_train("77777", read_route((external, None)), refit=False, source=(external, None))
+
+    write_route(os.path.join(routes, "77777.csv"), ["PURI", "BBS"])
+    q = predictor()
+    assert q.predict_delays([("77777", "BBS"), ("77777", "KUR")])[1] == ["exact", "train_avg"]
+
+
+def test_drift_state_lives_with_the_dataset_cache(network, tmp_path):
+    _, external, predictor = network
+    p = predictor()
+    p.upsert_train("77777", read_route((external, None)), refit=False, source=(external, None))
+
+    assert os.path.isfile(str(tmp_path / DEFAULT_CACHE_FILE) + ".refresh.json")
+    assert not os.path.exists(str(tmp_path / "delay_model.pkl") + ".refresh.json")
+    assert predictor().drift() == p.drift() > 0
+
+    # Counts made against another model do not carry over to this one
+    p.model_file = str(tmp_path / "other.pkl")
+    assert p.drift() == 0
@@ -0,0 +1,72 @@
+# tests/test_dataset_index.py
+import numpy as np
+import pandas as pd
+import pytest
+
+from dataset_index import DatasetIndex
+
+FEATURES = ["p_on_time", "avg_delay"]
+
+ROUTES = {
+    # train: [(code, name), ...] in route order
+    "100": [("KGP", "KHARAGPUR JN"), ("RNC", "RANCHI"), ("CNB", "KANPUR CENTRAL")],
+    "200": [("KGP2", "KHARAGPUR"), ("CNB", "KANPUR CENTRAL"), ("PUI", "PURULIA JN")],
+    "300": [("KAN", "KANTABANJI"), ("RNC", "RANCHI")],
+}
+
+
+@pytest.fixture
+def index():
+    rows = []
+    for train, stops in ROUTES.items():
+        for k, (code, name) in enumerate(stops):
+            rows.append({"TrainNo": train, "Station": code, "Station_Name": name,
+                         "p_on_time": 50.0 + k, "avg_delay": float(len(rows))})
+    return DatasetIndex(pd.DataFrame(rows), FEATURES)
+
+
+def delay(index, *key):
+    """(avg_delay, tier) for one lookup; avg_delay of a stop is its row number."""
+    x, tier = index.resolve(*key)
+    return float(x[1]), tier
+
+
+def test_fallback_chain(index):
+    assert delay(index, "100", "RNC") == (1.0, "exact")
+    assert delay(index, "100", "ZZZ", "KANPUR CENTRAL") == (2.0, "name")
+    assert delay(index, "100", "ZZZ", "KANPUR CENTRL") == (2.0, "fuzzy")
+    assert delay(index, "100", "ZZZ") == (1.0, "train_avg")
+    assert delay(index, "NOPE", "CNB") == (3.0, "station_avg")
+    assert delay(index, "NOPE", "ZZZ") == (index.global_mean[1], "global")
+
+
+def test_one_letter_code_is_not_a_prefix_match(index):
+    # "R" would prefix RANCHI, "K" KANPUR CENTRAL and KHARAGPUR
+    assert delay(index, "100", "R") == (1.0, "train_avg")
+    assert delay(index, "200", "K") == (4.0, "train_avg")
+
+
+def test_known_code_off_route_only_matches_aliases(index):
+    # KAN is a real station (not on 200's route); it must not stand for KANPUR CENTRAL
+    assert delay(index, "200", "KAN") == (4.0, "train_avg")
+    # KGP is not on 200's route either, but its alias KGP2 (KHARAGPUR) is
+    assert delay(index, "200", "KGP") == (3.0, "fuzzy")
+
+
+def test_resolve_frame_matches_resolve(index):
+    keys = [("100", "RNC", None), ("100", "ZZZ", "KANPUR CENTRL"), ("100", "R", None),
+            ("200", "K", None), ("200", "KAN", None), ("200", "KGP", None),
+            ("NOPE", "CNB", None), ("NOPE", "ZZZ", None)]
+    X, tiers = index.resolve_frame(*(np.array(col, dtype=object) for col in zip(*keys)))
+    for key, x, tier in zip(keys, X, tiers):
+        expected, expected_tier = index.resolve(*key)
+        assert tier == expected_tier
+        np.testing.assert_allclose(x, expected)
+
+
+def test_find_stop(index):
+    rows = index.rows_of("200")
+    assert list(index.find_stop(rows, "CNB")) == [1]
+    assert list(index.find_stop(rows, "KGP")) == [0]
+    assert len(index.find_stop(rows, "K")) == 0
+    assert len(index.find_stop(rows, "KAN")) == 0
@@ -0,0 +1,54 @@
+# tests/test_flat_forest.py
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.tree import DecisionTreeRegressor
+
+from flat_forest import FlatForest
+
+
+@pytest.fixture(scope="module")
+def data():
+    rng = np.random.default_rng(0)
+    X = rng.uniform(0.0, 100.0, size=(400, 4))
+    y = 0.3 * X[:, 0] - 0.2 * X[:, 1] + np.where(X[:, 2] > 50, 15.0, 0.0) + rng.normal(0, 2, size=400)
+    return X[:300], y[:300], X[300:]
+
+
+@pytest.fixture(scope="module")
+def forest(data):
+    X, y, _ = data
+    return RandomForestRegressor(n_estimators=12, max_depth=8, random_state=0).fit(X, y)
+
+
+@pytest.mark.parametrize("mmap", [True, False])
+def test_saved_forest_predicts_like_sklearn(forest, data, tmp_path, mmap):
+    _, _, X_test = data
+    FlatForest.from_model(forest).save(str(tmp_path / "flat"))
+    flat = FlatForest.load(str(tmp_path / "flat"), mmap=mmap)
+    assert flat.n_estimators == len(forest.estimators_)
+    assert np.allclose(flat.predict(X_test), forest.predict(X_test))
+
+
+def test_per_tree_predictions_match_estimators(forest, data):
+    # The quantile endpoints read quantiles off these per-tree values
+    _, _, X_test = data
+    trees = FlatForest.from_model(forest).predict_trees(X_test)
+    expected = np.column_stack([est.predict(X_test) for est in forest.estimators_])
+    assert np.allclose(trees, expected)
+    assert np.allclose(np.quantile(trees, [0.1, 0.9], axis=1), np.quantile(expected, [0.1, 0.9], axis=1))
+
+
+def test_single_tree(data):
+    X, y, X_test = data
+    tree = DecisionTreeRegressor(max_depth=6, random_state=0).fit(X, y)
+    assert np.allclose(FlatForest.from_model(tree).predict(X_test), tree.predict(X_test))
+
+
+def test_is_fresh_tracks_the_source_file(forest, tmp_path):
+    source = tmp_path / "delay_model.pkl"
+    source.write_bytes(b"v1")
+    FlatForest.from_model(forest).save(str(tmp_path / "flat"), source=str(source))
+    assert FlatForest.is_fresh(str(tmp_path / "flat"), str(source))
+    source.write_bytes(b"v2 changed")
+    assert not FlatForest.is_fresh(str(tmp_path / "flat"), str(source))
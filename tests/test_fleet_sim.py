@@ -0,0 +1,37 @@
+# tests/test_fleet_sim.py
+import multiprocessing
+
+import numpy as np
+import pytest
+
+from fleet_sim import Fleet, WeatherTrace, simulate, station_zone
+from rl_agent import SimpleRLAgent
+
+
+@pytest.fixture(scope="module")
+def fleet():
+    """Six services over two short routes; built directly, no dataset needed."""
+    rng = np.random.default_rng(0)
+    stations = np.array(["KGP", "RNC", "CNB", "PUI", "HWH", "BBS", "PURI"], dtype=object)
+    pred = np.array([5.0, 12.0, 20.0, 35.0, 0.0, 8.0, 15.0])
+    return Fleet(
+        route_of=np.array([0, 0, 0, 1, 1, 1]), depart_tick=np.array([0, 3, 10, 1, 6, 20]),
+        stop_start=np.array([0, 4]), n_stops=np.array([4, 3]), pred=pred, plan=pred,
+        zone=station_zone(stations, 4), seg_km=rng.uniform(20.0, 80.0, size=len(stations)),
+        trains=np.array(["100", "200"], dtype=object),
+    )
+
+
+@pytest.mark.skipif("fork" not in multiprocessing.get_all_start_methods(), reason="workers need fork")
+def test_workers_do_not_change_kpis(fleet, tmp_path):
+    policy = SimpleRLAgent(model_file=str(tmp_path / "rl_agent_model.pkl")).get_actions
+    trace = WeatherTrace.synthetic(ticks=60, zones=4, seed=1)
+    one = simulate(fleet, trace, policy, ticks=120, workers=1, seed=3)
+    two = simulate(fleet, trace, policy, ticks=120, workers=2, seed=3)
+    assert two["shards"] == 2
+    assert one["stop_arrivals"] > 0
+    assert two.pop("actions") == one.pop("actions")
+    for key in ("seconds", "service_ticks_per_s", "shards"):
+        one.pop(key), two.pop(key)
+    # Shard sums are merged in a different order; the KPIs may differ in the last bit
+    assert two == pytest.approx(one)
@@ -0,0 +1,47 @@
+# tests/test_rl_agent.py
+import numpy as np
+import pytest
+
+from rl_agent import SimpleRLAgent
+
+
+@pytest.fixture(scope="module")
+def agent(tmp_path_factory):
+    return SimpleRLAgent(model_file=str(tmp_path_factory.mktemp("rl") / "rl_agent_model.pkl"))
+
+
+def expected(agent, delays, visibilities, speeds, weathers):
+    return [agent.get_action(d, v, s, w) for d, v, s, w in zip(delays, visibilities, speeds, weathers)]
+
+
+def test_get_actions_broadcasts_mixed_inputs(agent):
+    speeds = np.array([20.0, 80.0, 150.0])
+    actions = agent.get_actions(90.0, 5.0, speeds, "Fog")
+    assert list(actions) == expected(agent, [90.0] * 3, [5.0] * 3, speeds, ["Fog"] * 3)
+
+    weathers = np.array(["Clear", "Rain", "Fog"])
+    actions = agent.get_actions([10.0, 150.0, 60.0], np.array([2.0, 10.0, 2.0]), 100.0, weathers)
+    assert list(actions) == expected(agent, [10.0, 150.0, 60.0], [2.0, 10.0, 2.0], [100.0] * 3, weathers)
+
+
+def test_get_actions_scalars(agent):
+    assert list(agent.get_actions(120, 10.0, 80, "Clear")) == [agent.get_action(120, 10.0, 80, "Clear")]
+
+
+def test_get_actions_rejects_mismatched_lengths(agent):
+    with pytest.raises(ValueError):
+        agent.get_actions([10.0, 20.0], [5.0, 5.0, 5.0], 80.0)
+
+
+def test_closed_form_policy_matches_model(agent):
+    grid = np.meshgrid([0.0, 15.0, 45.0, 119.0, 121.0, 300.0, 450.0], [0.5, 1.0, 2.9, 5.0, 10.0],
+                       np.arange(0.0, 181.0, 10.0), np.arange(4), indexing="ij")
+    delays, visibilities, speeds, codes = (g.ravel() for g in grid)
+    weathers = np.array(["Clear", "Clouds", "Rain", "Fog"])[codes]
+
+    states = agent._encode_states(delays, visibilities, speeds, weathers)
+    expected = agent.model.predict(states)
+    np.testing.assert_array_equal(agent.get_actions(delays, visibilities, speeds, weathers), expected)
+    np.testing.assert_array_equal(agent.get_actions(delays, visibilities, speeds, codes), expected)
+    for k in range(0, len(delays), 97):
+        assert agent.get_action(delays[k], visibilities[k], speeds[k], weathers[k]) == expected[k]
@@ -0,0 +1,61 @@
+# tests/test_station_resolver.py
+from station_resolver import StationResolver, normalize
+
+STATIONS = [
+    # code, name, rows
+    ("KGP", "KHARAGPUR JN", 12),
+    ("KGP2", "KHARAGPUR", 1),
+    ("KGP3", "KHARAGPUR", 1),
+    ("CNB", "KANPUR CENTRAL", 8),
+    ("KAN", "KANTABANJI", 2),
+    ("RNC", "RANCHI", 6),
+]
+
+
+def make_resolver():
+    codes, names, counts = zip(*STATIONS)
+    return StationResolver(codes, names, counts)
+
+
+def test_normalize_drops_generic_tokens():
+    assert normalize("Kharagpur Jn.") == "KHARAGPUR"
+    assert normalize("jn") == "JN"
+
+
+def test_code_then_aliases():
+    r = make_resolver()
+    assert r.resolve("kgp") == "KGP"
+    assert r.codes_for("KGP") == ["KGP", "KGP2", "KGP3"]
+    assert list(r.aliases("KGP2")) == [r.ids["KGP2"], r.ids["KGP"], r.ids["KGP3"]]
+    assert len(r.aliases("NOPE")) == 0
+
+
+def test_full_name_outranks_generic_variant():
+    r = make_resolver()
+    # KGP has more rows, but only KGP2/KGP3 are listed as plain "KHARAGPUR"
+    plain = r.candidates("kharagpur")
+    assert [c["code"] for c in plain] == ["KGP2", "KGP3", "KGP"]
+    assert plain[0]["score"] > plain[2]["score"]
+    assert r.resolve("Kharagpur Jn.") == "KGP"
+
+
+def test_short_prefix_is_not_a_candidate():
+    r = make_resolver()
+    for text in ("K", "R", "KA"):
+        assert r.codes_for(text) == []
+        assert r.resolve(text) is None
+    assert "CNB" in r.codes_for("KANP")
+
+
+def test_misspelling():
+    r = make_resolver()
+    assert r.resolve("ranchee") == "RNC"
+    assert r.resolve("kharagpr") in ("KGP", "KGP2", "KGP3")
+    assert r.resolve("kanpur centrl") == "CNB"
+
+
+def test_knows_new_names():
+    r = make_resolver()
+    assert r.knows("KGP", "Kharagpur Jn")
+    assert not r.knows("KGP", "KHARAGPUR")
+    assert not r.knows("NEW")
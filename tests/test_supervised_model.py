@@ -0,0 +1,28 @@
+# tests/test_supervised_model.py
+import pytest
+
+from dataset_cache import DEFAULT_CACHE_FILE
+from supervised_model import DelayPredictor
+
+HEADER = ("Station,Station_Name,Average_Delay(min),Right Time (0-15 min's),"
+          "Slight Delay (15-60 min's),Significant Delay (>1 Hour),Cancelled/Unknown\n")
+
+
+@pytest.fixture
+def predictor(tmp_path):
+    routes = tmp_path / "routes"
+    routes.mkdir()
+    for train, stops in {"12301": ["HWH", "KGP", "BBS"], "200": ["KGP", "RNC"]}.items():
+        with open(routes / f"{train}.csv", "w", encoding="utf-8") as fh:
+            fh.write(HEADER)
+            for k, code in enumerate(stops):
+                fh.write(f"{code},{code} JN ,{10 + 5 * k},80.00,10.00,8.00,2.00\n")
+    return DelayPredictor(csv_folder=str(routes), model_file=str(tmp_path / "delay_model.pkl"),
+                          data_file=str(tmp_path / DEFAULT_CACHE_FILE), backend="linear").load()
+
+
+def test_predict_routes_accepts_bare_train_numbers(predictor):
+    by_str = predictor.predict_routes(["12301", ("200", "RNC")])
+    by_int = predictor.predict_routes([12301, ["200", "RNC"]])
+    assert by_int.equals(by_str)
+    assert list(by_int["TrainNo"]) == ["12301"] * 3 + ["200"]
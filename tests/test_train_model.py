@@ -0,0 +1,34 @@
+# tests/test_train_model.py
+import numpy as np
+import pandas as pd
+
+from features import ALL_FEATURES, add_features
+from train_model import _folds, _split
+
+
+def make_dataset(seed=0):
+    rng = np.random.default_rng(seed)
+    stations = ["KGP", "RNC", "CNB", "PUI", "HWH", "BBS"]
+    rows = []
+    for t in range(12):
+        for code in rng.choice(stations, size=4, replace=False):
+            p = rng.dirichlet([4, 2, 1, 0.2]) * 100
+            rows.append({"TrainNo": str(100 + t), "Station": code, "avg_delay": float(rng.uniform(0, 60)),
+                         "p_on_time": p[0], "p_slight": p[1], "p_significant": p[2], "p_cancelled": p[3]})
+    return add_features(pd.DataFrame(rows))
+
+
+def test_station_features_do_not_see_held_out_targets():
+    df = make_dataset()
+    X, y, groups, cv = _split(df, 3, ALL_FEATURES)
+    folds = _folds(df, X, y, groups, cv, ALL_FEATURES)
+    te = ALL_FEATURES.index("station_te")
+    for k, (train_idx, test_idx, X_train, X_test) in enumerate(folds):
+        # Change only the held-out trains' targets: nothing the fold sees may move
+        changed = df.copy()
+        changed.loc[test_idx, "avg_delay"] += 1000.0
+        _, _, X_train2, X_test2 = _folds(changed, X, y, groups, cv, ALL_FEATURES)[k]
+        np.testing.assert_array_equal(X_train2[:, te], X_train[:, te])
+        np.testing.assert_array_equal(X_test2[:, te], X_test[:, te])
+    # The full-data encoding, by contrast, uses every train's targets
+    assert not np.array_equal(add_features(changed)["station_te"].to_numpy(), df["station_te"].to_numpy())
@@ -0,0 +1,249 @@
+# train_model.py
+"""
+Reproducible, all-cores training of the delay model.
+
+    python train_model.py                       # 5-fold grouped CV, default forest
+    python train_model.py --search 20           # + randomized search over 20 candidates
+    python train_model.py --backend hgb         # gradient boosting (see model_backends.py)
+    python train_model.py --folds 3 --no-promote
+    python train_model.py --compare rf,hgb,linear   # evaluate only, register nothing
+
+Folds are grouped by TrainNo so stations of one route never sit on both
+sides of a split. The station features (features.STATION_FEATURES) pool
+targets across trains, so each fold recomputes them from its training rows
+only, as a train added later would get them. Candidates x folds run in
+parallel (--n-jobs, default all cores); the best setting is refit on the
+whole dataset and saved as a new version in the model registry (see
+model_registry.py), which DelayPredictor loads from.
+"""
+import argparse
+import platform
+import time
+
+import numpy as np
+
+from features import ALL_FEATURES, BASE_FEATURES, STATION_FEATURES, station_features, station_stats
+from model_backends import BACKENDS, SEED, get_backend
+from model_registry import ModelRegistry, dataset_hash
+from supervised_model import DelayPredictor
+
+TARGET = "avg_delay"
+
+# Rows scored per batch when --compare times prediction
+PREDICT_BATCH = 512
+
+
+def _scores(y_true, y_pred) -> dict:
+    from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
+
+    return {
+        "mae": float(mean_absolute_error(y_true, y_pred)),
+        "rmse": float(np.sqrt(mean_squared_error(y_true, y_pred))),
+        "r2": float(r2_score(y_true, y_pred)),
+    }
+
+
+def _split(df, folds: int, features):
+    """Features, target, TrainNo groups and the grouped CV splitter shared by train and evaluate."""
+    from sklearn.model_selection import GroupKFold
+
+    X = df[features].fillna(0).to_numpy(dtype=float)
+    y = df[TARGET].astype(float).to_numpy()
+    groups = df["TrainNo"].astype(str).to_numpy()
+    folds = max(2, min(folds, len(np.unique(groups))))
+    return X, y, groups, GroupKFold(n_splits=folds)
+
+
+def _folds(df, X, y, groups, cv, features) -> list:
+    """
+    (train rows, test rows, X_train, X_test) per CV fold, with the station
+    features of both sides computed from the fold's training rows alone
+    (leave-one-out on the training side). The full-data values would leak
+    the held-out trains' targets into the training rows.
+    """
+    cols = {c: features.index(c) for c in STATION_FEATURES if c in features}
+    folds = []
+    for train_idx, test_idx in cv.split(X, y, groups):
+        # Fancy indexing copies, so X itself keeps the full-data values
+        X_train, X_test = X[train_idx], X[test_idx]
+        if cols:
+            fit = df.iloc[train_idx]
+            for X_part, values in ((X_train, station_features(fit)),
+                                   (X_test, station_features(df.iloc[test_idx], station_stats(fit)))):
+                for c, v in zip(STATION_FEATURES, values):
+                    if c in cols:
+                        X_part[:, cols[c]] = v
+        folds.append((train_idx, test_idx, X_train, X_test))
+    return folds
+
+
+def _fit_predict(backend, params, seed, X_train, y_train, X_test):
+    return backend.make(params, seed, n_jobs=1).fit(X_train, y_train).predict(X_test)
+
+
+def _cross_val(backend, candidates, seed, y, folds, n_jobs: int = -1, verbose: int = 0) -> list:
+    """Out-of-fold predictions for each parameter candidate; candidates x folds fit in parallel."""
+    from joblib import Parallel, delayed
+
+    preds = Parallel(n_jobs=n_jobs, verbose=verbose)(
+        delayed(_fit_predict)(backend, params, seed, X_train, y[train_idx], X_test)
+        for params in candidates for train_idx, _, X_train, X_test in folds
+    )
+    out = []
+    for i in range(len(candidates)):
+        oof = np.empty(len(y))
+        for (_, test_idx, _, _), pred in zip(folds, preds[i * len(folds):(i + 1) * len(folds)]):
+            oof[test_idx] = pred
+        out.append(oof)
+    return out
+
+
+def train(df, folds: int = 5, n_iter: int = 0, n_jobs: int = -1, seed: int = SEED,
+          features=None, verbose: int = 0, backend: str = None):
+    """
+    Cross-validate (and optionally search) a regressor from `backend`
+    (default model_backends.BACKEND) grouped by TrainNo, then refit the best
+    parameters on all rows.
+    Returns (model, meta dict).
+    """
+    from sklearn.model_selection import ParameterSampler
+
+    backend = get_backend(backend)
+    features = list(features or ALL_FEATURES)
+    X, y, groups, cv = _split(df, folds, features)
+
+    start = time.perf_counter()
+    fold_data = _folds(df, X, y, groups, cv, features)
+    params = dict(backend.defaults)
+    search_results = None
+    if n_iter > 0:
+        # Ranked by out-of-fold MAE; the best candidate's predictions are reused below
+        sampled = list(ParameterSampler(backend.space, n_iter, random_state=seed))
+        oofs = _cross_val(backend, [{**params, **p} for p in sampled], seed, y, fold_data, n_jobs, verbose)
+        ranked = sorted(zip(sampled, oofs), key=lambda po: _scores(y, po[1])["mae"])
+        search_results = [{"params": p, "mae": _scores(y, oof)["mae"]} for p, oof in ranked]
+        params = {**params, **ranked[0][0]}
+        oof = ranked[0][1]
+    else:
+        oof = _cross_val(backend, [params], seed, y, fold_data, n_jobs, verbose)[0]
+    cv_time = time.perf_counter() - start
+
+    fit_start = time.perf_counter()
+    model = backend.make(params, seed, n_jobs)
+    model.fit(X, y)
+    fit_time = time.perf_counter() - fit_start
+
+    import sklearn
+    meta = {
+        "data_hash": dataset_hash(df, ["TrainNo", "Station"] + BASE_FEATURES + [TARGET]),
+        "n_rows": int(len(df)),
+        "n_trains": int(len(np.unique(groups))),
+        "features": features,
+        "target": TARGET,
+        "backend": backend.name,
+        "params": params,
+        "seed": seed,
+        "cv": {"scheme": "GroupKFold", "group": "TrainNo", "folds": cv.n_splits, "search_iter": n_iter,
+               # Recomputed from each fold's training rows (see _folds)
+               "fold_features": [c for c in STATION_FEATURES if c in features]},
+        "metrics": {"cv_" + k: v for k, v in _scores(y, oof).items()},
+        "search": search_results,
+        "training_time_s": {"cv": round(cv_time, 2), "fit": round(fit_time, 2)},
+        "versions": {"python": platform.python_version(), "sklearn": sklearn.__version__},
+    }
+    return model, meta
+
+
+def evaluate(df, backends=None, folds: int = 5, n_jobs: int = -1, seed: int = SEED, features=None) -> list:
+    """
+    Score each backend (default: all of them) with its default parameters on
+    the same TrainNo-grouped folds: out-of-fold MAE/RMSE/R2, the time to fit
+    on every row and to predict in PREDICT_BATCH-row batches.
+    Returns one dict per backend, best MAE first.
+    """
+    features = list(features or ALL_FEATURES)
+    X, y, groups, cv = _split(df, folds, features)
+    fold_data = _folds(df, X, y, groups, cv, features)
+    rows = []
+    for name in backends or BACKENDS:
+        backend = get_backend(name)
+        start = time.perf_counter()
+        oof = _cross_val(backend, [dict(backend.defaults)], seed, y, fold_data, n_jobs)[0]
+        cv_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        model = backend.make(seed=seed, n_jobs=n_jobs).fit(X, y)
+        fit_time = time.perf_counter() - start
+
+        batch = X[:PREDICT_BATCH]
+        model.predict(batch)  # first call pays one-off setup
+        start = time.perf_counter()
+        n = 0
+        while n < 20 or time.perf_counter() - start < 0.5:
+            model.predict(batch)
+            n += 1
+        batch_time = (time.perf_counter() - start) / n
+
+        rows.append({
+            "backend": backend.name,
+            **_scores(y, oof),
+            "cv_s": round(cv_time, 2),
+            "fit_s": round(fit_time, 2),
+            "predict_us_per_row": round(batch_time / len(batch) * 1e6, 2),
+        })
+    return sorted(rows, key=lambda r: r["mae"])
+
+
+def _print_comparison(rows: list):
+    cols = ["backend", "mae", "rmse", "r2", "cv_s", "fit_s", "predict_us_per_row"]
+    print("  ".join(f"{c:>10}" if i else f"{c:<8}" for i, c in enumerate(cols)))
+    for r in rows:
+        print("  ".join(f"{r[c]:>10.3f}" if i else f"{r[c]:<8}" for i, c in enumerate(cols)))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Train and register the delay model")
+    parser.add_argument("--folds", type=int, default=5, help="GroupKFold splits (default %(default)s)")
+    parser.add_argument("--search", type=int, default=0, metavar="N",
+                        help="randomized search over N parameter candidates (default: off)")
+    parser.add_argument("--backend", choices=list(BACKENDS), default=None,
+                        help="model family (default: RAILOPTIMUS_MODEL_BACKEND or rf)")
+    parser.add_argument("--compare", default=None, metavar="B1,B2",
+                        help="only evaluate these backends on the same folds and print a table")
+    parser.add_argument("--n-jobs", type=int, default=-1, help="parallel jobs (default: all cores)")
+    parser.add_argument("--features", choices=["all", "base"], default="all",
+                        help="route features (features.py) or only the four percentages")
+    parser.add_argument("--seed", type=int, default=SEED)
+    parser.add_argument("--registry", default=None, help="registry directory")
+    parser.add_argument("--no-promote", action="store_true",
+                        help="register without making it the version the predictor loads")
+    parser.add_argument("-v", "--verbose", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    predictor = DelayPredictor()
+    df = predictor.load_dataset()
+    print(f"[train_model] {len(df):,} rows from {df['TrainNo'].nunique():,} trains")
+
+    features = ALL_FEATURES if args.features == "all" else BASE_FEATURES
+    if args.compare:
+        backends = [b.strip() for b in args.compare.split(",") if b.strip()]
+        unknown = [b for b in backends if b.lower() not in BACKENDS]
+        if unknown:
+            parser.error(f"unknown backend(s) {', '.join(unknown)}; choose from {', '.join(BACKENDS)}")
+        _print_comparison(evaluate(df, backends, args.folds, args.n_jobs, args.seed, features))
+        return
+
+    model, meta = train(df, args.folds, args.search, args.n_jobs, args.seed, features, args.verbose,
+                        args.backend)
+    registry = ModelRegistry(args.registry)
+    version = registry.register(model, meta, promote=not args.no_promote)
+
+    m = meta["metrics"]
+    print(f"[train_model] {meta['backend']} params: {meta['params']}")
+    print(f"[train_model] grouped CV: MAE {m['cv_mae']:.3f}  RMSE {m['cv_rmse']:.3f}  R2 {m['cv_r2']:.3f}")
+    print(f"[train_model] registered {version}" + ("" if args.no_promote else " (current)")
+          + f" in {registry.root}, {sum(meta['training_time_s'].values()):.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,30 @@
 # weather_api.py
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeout
+from typing import Dict, List, Tuple
+
 import requests
-from typing import Tuple
+from requests.adapters import HTTPAdapter
+
+import metrics
 
-# === Set your API key here ===
-API_KEY = "c9ca6b018ef6d2f8fe093cd27b45ef2a"  # Replace with your actual key
-BASE_URL = "https://api.openweathermap.org/data/2.5/weather"  # HTTPS
+# === Set your API key here (or OPENWEATHER_API_KEY) ===
+API_KEY = os.environ.get("OPENWEATHER_API_KEY", "c9ca6b018ef6d2f8fe093cd27b45ef2a")  # Replace with your actual key
+BASE_URL = os.environ.get("OPENWEATHER_URL", "https://api.openweathermap.org/data/2.5/weather")  # HTTPS
+
+# Cache policy (seconds): fresh results are reused for CACHE_TTL; after that
+# they are served stale (while a refresh runs) for up to STALE_TTL if the
+# provider does not answer within STALE_WAIT. Failures are remembered for
+# ERROR_TTL so a dead API does not stall every call for the full timeout
+CACHE_TTL = 600.0
+STALE_TTL = 3600.0
+STALE_WAIT = 0.5
+ERROR_TTL = 30.0
+TIMEOUT = 6.0
+MAX_CONNECTIONS = 8
 
 # Default city weather (used if API key missing or network fails)
 DEFAULT_WEATHER = {
@@ -26,46 +46,218 @@ def _map_weather_main(main_str: str) -> str:
         return "Fog"
     return main_str.title()
 
+def _fallback(city: str) -> Tuple[str, float, bool]:
+    w = DEFAULT_WEATHER.get(city, {"main": "Clear (default)", "visibility_km": 10.0})
+    return w["main"], w["visibility_km"], False
+
+def _normalize_city(city: str) -> str:
+    return (city or "").strip().title()
+
+def _served(result: Tuple[str, float, bool], stale: bool) -> Tuple[str, float, bool]:
+    """Count what a lookup hands back (fallback / stale) when metrics are on."""
+    if metrics.ENABLED:
+        if not result[2]:
+            metrics.inc("weather_fallback_total")
+        elif stale:
+            metrics.inc("weather_stale_total")
+    return result
+
+class WeatherClient:
+    """
+    Weather lookups over one pooled HTTP session.
+
+    - per-city TTL cache, with stale-while-revalidate when the provider is slow
+    - concurrent requests for the same city share one HTTP call
+    - get_many() / fetch_many() fetch a list of cities concurrently
+
+    Results keep get_weather's (description, visibility_km, ok) shape and its
+    DEFAULT_WEATHER fallback.
+    """
+
+    def __init__(self, api_key: str = API_KEY, base_url: str = BASE_URL, ttl: float = CACHE_TTL,
+                 stale_ttl: float = STALE_TTL, stale_wait: float = STALE_WAIT,
+                 error_ttl: float = ERROR_TTL, timeout: float = TIMEOUT,
+                 max_connections: int = MAX_CONNECTIONS):
+        self.api_key = api_key
+        self.base_url = base_url
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.stale_wait = stale_wait
+        self.error_ttl = error_ttl
+        self.timeout = timeout
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=max_connections, pool_maxsize=max_connections)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._pool = ThreadPoolExecutor(max_workers=max_connections, thread_name_prefix="weather")
+
+        self._lock = threading.Lock()
+        self._cache: Dict[str, Tuple[Tuple[str, float, bool], float]] = {}
+        self._inflight: Dict[str, Future] = {}
+        self._failed_at: Dict[str, float] = {}
+
+    # ------------------------
+    # HTTP
+    # ------------------------
+    def _fetch(self, city: str) -> Tuple[str, float, bool]:
+        with metrics.timer("weather_fetch"):
+            result = self._fetch_once(city)
+        if metrics.ENABLED:
+            metrics.inc("weather_requests_total", outcome="ok" if result[2] else "error")
+        return result
+
+    def _fetch_once(self, city: str) -> Tuple[str, float, bool]:
+        try:
+            params = {"q": city, "appid": self.api_key, "units": "metric"}
+            r = self.session.get(self.base_url, params=params, timeout=self.timeout)
+            r.raise_for_status()  # Raises exception for HTTP errors
+            data = r.json()
+
+            # Parse response
+            main = data["weather"][0]["main"]
+            desc = _map_weather_main(main)
+
+            # Correct handling of visibility
+            visibility_m = data.get("visibility")
+            if visibility_m is None:
+                visibility_km = 10.0  # fallback default
+            else:
+                visibility_km = float(visibility_m) / 1000.0
+
+            return desc, visibility_km, True
+        except Exception as e:
+            # HTTP errors quote the request URL; keep the key out of the log
+            print(f"Weather API error for {city}:", str(e).replace(self.api_key, "***"))
+            return _fallback(city)
+
+    def _refresh(self, city: str) -> Tuple[str, float, bool]:
+        result = self._fetch(city)
+        with self._lock:
+            now = time.monotonic()
+            old = self._cache.get(city)
+            if result[2]:
+                self._failed_at.pop(city, None)
+                self._cache[city] = (result, now)
+            else:
+                self._failed_at[city] = now
+                # Keep the last good answer; it stays usable while stale
+                if old is None or not old[0][2]:
+                    self._cache[city] = (result, now)
+            self._inflight.pop(city, None)
+        return result
+
+    def _start(self, city: str) -> Future:
+        # Caller holds self._lock; one fetch per city at a time
+        fut = self._inflight.get(city)
+        if fut is None:
+            fut = self._pool.submit(self._refresh, city)
+            self._inflight[city] = fut
+        return fut
+
+    # ------------------------
+    # Lookups
+    # ------------------------
+    def _lookup(self, city: str):
+        """Returns (cached_result_or_None, future_or_None)."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._cache.get(city)
+            if entry is not None:
+                result, stamp = entry
+                ttl = self.ttl if result[2] else self.error_ttl
+                age = now - stamp
+                if age <= ttl:
+                    return result, None
+                if result[2] and age <= self.stale_ttl:
+                    failed = self._failed_at.get(city)
+                    if failed is not None and now - failed <= self.error_ttl:
+                        return result, None  # provider just failed; don't retry yet
+                    return result, self._start(city)
+            return None, self._start(city)
+
+    def _resolve(self, city: str, cached, fut: Future) -> Tuple[str, float, bool]:
+        if fut is None:
+            return _served(cached, False)
+        try:
+            result = fut.result(timeout=self.stale_wait if cached is not None else None)
+        except FutureTimeout:
+            return _served(cached, True)  # slow provider: serve stale, refresh keeps running
+        if cached is not None and not result[2]:
+            return _served(cached, True)
+        return _served(result, False)
+
+    def get(self, city: str = "Delhi") -> Tuple[str, float, bool]:
+        if not self.api_key:
+            return _served(_fallback(_normalize_city(city)), False)
+        city = _normalize_city(city)
+        cached, fut = self._lookup(city)
+        return self._resolve(city, cached, fut)
+
+    def get_many(self, cities: List[str]) -> List[Tuple[str, float, bool]]:
+        """Fetch several cities concurrently; duplicates share one request."""
+        names = [_normalize_city(c) for c in cities]
+        if not self.api_key:
+            return [_served(_fallback(c), False) for c in names]
+        pending = {c: self._lookup(c) for c in dict.fromkeys(names)}
+        results = {c: self._resolve(c, cached, fut) for c, (cached, fut) in pending.items()}
+        return [results[c] for c in names]
+
+    async def fetch(self, city: str = "Delhi") -> Tuple[str, float, bool]:
+        return (await self.fetch_many([city]))[0]
+
+    async def fetch_many(self, cities: List[str]) -> List[Tuple[str, float, bool]]:
+        """asyncio flavour of get_many; the HTTP calls run on the client's pool."""
+        names = [_normalize_city(c) for c in cities]
+        if not self.api_key:
+            return [_served(_fallback(c), False) for c in names]
+        pending = {c: self._lookup(c) for c in dict.fromkeys(names)}
+        results = {}
+        for c, (cached, fut) in pending.items():
+            if fut is None:
+                results[c] = _served(cached, False)
+                continue
+            try:
+                wait = self.stale_wait if cached is not None else None
+                result = await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(fut)), wait)
+            except asyncio.TimeoutError:
+                results[c] = _served(cached, True)
+                continue
+            stale = cached is not None and not result[2]
+            results[c] = _served(cached if stale else result, stale)
+        return [results[c] for c in names]
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+            self._failed_at.clear()
+
+    def close(self):
+        self._pool.shutdown(wait=False)
+        self.session.close()
+
+# Shared client behind the module-level helpers
+_client = None
+_client_lock = threading.Lock()
+
+def get_client() -> WeatherClient:
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = WeatherClient()
+    return _client
+
 def get_weather(city: str = "Delhi") -> Tuple[str, float, bool]:
     """
     Returns: (weather_description:str, visibility_km:float, ok:bool)
     ok==True means API returned a valid response; False means default/fallback used.
     """
-    city = city.strip().title()
-
-    # Debug prints
-    print("Requested city:", city)
-    print("Using API key:", API_KEY)
-
-    # If no API key, use default
-    if not API_KEY:
-        w = DEFAULT_WEATHER.get(city, {"main": "Clear (default)", "visibility_km": 10.0})
-        return w["main"], w["visibility_km"], False
-
-    # Try API call
-    try:
-        params = {"q": city, "appid": API_KEY, "units": "metric"}
-        r = requests.get(BASE_URL, params=params, timeout=6.0)
-        r.raise_for_status()  # Raises exception for HTTP errors
-        data = r.json()
-
-        # Parse response
-        main = data["weather"][0]["main"]
-        desc = _map_weather_main(main)
-
-        # Correct handling of visibility
-        visibility_m = data.get("visibility")
-        if visibility_m is None:
-            visibility_km = 10.0  # fallback default
-        else:
-            visibility_km = float(visibility_m) / 1000.0
-
-        return desc, visibility_km, True
-    except Exception as e:
-        print("Weather API error:", e)
-        # fallback if network/API fails
-        w = DEFAULT_WEATHER.get(city, {"main": "Clear (default)", "visibility_km": 10.0})
-        return w["main"], w["visibility_km"], False
+    return get_client().get(city)
+
+def get_weather_many(cities: List[str]) -> List[Tuple[str, float, bool]]:
+    """get_weather for a list of cities, fetched concurrently."""
+    return get_client().get_many(cities)
 
 # Optional: test
 if __name__ == "__main__":